@@ -8,7 +8,6 @@ RemoteGamepad GUI launcher
     или
     flet run gui_main.py
 """
-import asyncio
 import logging
 import sys
 from pathlib import Path
@@ -18,23 +17,13 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from src.gui.app import run_gui_app
 from src.config.settings import settings
-
-
-def setup_logging() -> None:
-    """Настройка логирования"""
-    logging.basicConfig(
-        level=getattr(logging, settings.server.log_level),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(settings.logs_dir / settings.log_file)
-        ]
-    )
+from src.core import runtime
+from src.utils.logging_utils import setup_logging
 
 
 async def main() -> None:
     """Главная функция"""
-    setup_logging()
+    setup_logging("gui")
     logger = logging.getLogger(__name__)
     
     try:
@@ -52,4 +41,4 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    runtime.run(main())
\ No newline at end of file
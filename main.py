@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
 RemoteGamepad - Main launcher
-Запуск сервера для виртуального геймпада
+Запуск сервера для виртуального геймпада без GUI
+
+Устаревший Flask-сервер по-прежнему запускается через: python server.py
 """
 
 if __name__ == "__main__":
     print("🎮 Запуск RemoteGamepad сервера...")
     print("Для остановки нажмите Ctrl+C")
     try:
-        import server
-        server.run_flask()
+        from src.api.process import main as run_server
+        run_server()
     except KeyboardInterrupt:
         print("\n🛑 Сервер остановлен")
     except Exception as e:
         print(f"❌ Ошибка запуска: {e}")
-        print("💡 Попробуйте: python server.py")
+        print("💡 Попробуйте: python -m src.api.process")
@@ -65,7 +65,7 @@ class VirtualJoystick:
         self.DPAD_RIGHT = 4
 
     def set_value(self, name, value, is_pressed=None):
-        logger.info(f"set_value called: name='{name}', value={value} (type: {type(value)}), is_pressed={is_pressed}")
+        logger.debug("set_value called: name={!r}, value={!r}, is_pressed={}", name, value, is_pressed)
         
         axis_map = {
             'AxisLx': e.ABS_X,
@@ -94,7 +94,7 @@ class VirtualJoystick:
                 # Если пришло число 0.0-1.0, конвертируем в 0-255
                 trigger_value = int(value * 255)
             
-            logger.info(f"Trigger {name}: value={value} -> trigger_value={trigger_value}")
+            logger.debug("Trigger {}: value={} -> trigger_value={}", name, value, trigger_value)
             self.device.write(e.EV_ABS, trigger_map[name], trigger_value)
             self.device.syn()
         elif name == "Dpad":
@@ -116,7 +116,7 @@ class VirtualJoystick:
                     else:
                         trigger_value = int(value * 255)
                     
-                    logger.info(f"Processing trigger {name} as axis: value={value} -> {trigger_value}")
+                    logger.debug("Processing trigger {} as axis: value={} -> {}", name, value, trigger_value)
                     self.device.write(e.EV_ABS, trigger_code, trigger_value)
                     self.device.syn()
                 else:
@@ -128,10 +128,10 @@ class VirtualJoystick:
 
 def process_btn_data(data):
     if "buttons" in data:
-        logger.info(f"Received buttons data: {data['buttons']}")
+        logger.debug("Received buttons data: {}", data['buttons'])
         for btn in data["buttons"]:
             if not btn["name"].startswith("Dpad"):
-                logger.info(f"Processing button: {btn['name']} = {btn['pressed']} (type: {type(btn['pressed'])})")
+                logger.debug("Processing button: {} = {!r}", btn['name'], btn['pressed'])
                 set_btn_state(btn["name"], btn["pressed"])
 
         button_dict = {button['name']: button for button in data['buttons']}
@@ -144,19 +144,19 @@ def process_btn_data(data):
         dpad_x = dpad_right_value - dpad_left_value
         dpad_y = dpad_up_value - dpad_down_value
 
-        print(f"dpad_x: {dpad_x}, dpad_y: {dpad_y}")
+        logger.debug("dpad_x: {}, dpad_y: {}", dpad_x, dpad_y)
 
         controller.device.write(e.EV_ABS, e.ABS_HAT0X, dpad_x)
         controller.device.write(e.EV_ABS, e.ABS_HAT0Y, dpad_y)
         controller.device.syn()
 
 def set_btn_state(button_name, is_pressed):
-        logger.info(f"set_btn_state: {button_name} = {is_pressed} (type: {type(is_pressed)})")
+        logger.debug("set_btn_state: {} = {!r}", button_name, is_pressed)
         if button_name in BUTTON_MAP:
-            logger.info(f"Button {button_name} found in BUTTON_MAP, calling set_value")
+            logger.debug("Button {} found in BUTTON_MAP, calling set_value", button_name)
             controller.set_value(button_name, is_pressed)
         else:
-            logger.warning(f"Button {button_name} NOT found in BUTTON_MAP")
+            logger.warning("Button {} NOT found in BUTTON_MAP", button_name)
 
 # Flask
 
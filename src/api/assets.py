@@ -0,0 +1,219 @@
+"""
+Статические ресурсы веб-клиента: загрузка при старте, сжатие и условные запросы
+
+index.html, script.js и style.css читаются один раз, заранее сжимаются
+gzip (и brotli, если установлен пакет brotli) и отдаются со строгими ETag.
+Скрипт и стили доступны также по адресам с отпечатком содержимого
+(/static/script.<hash>.js), на которые ссылается отданный index.html:
+такие ответы кэшируются браузером навсегда, а сама страница проверяется
+запросом с If-None-Match и в ответ получает 304 без тела.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from ..config.settings import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# (адрес, каталог, файл); адрес страницы - корень сайта
+ASSETS = (
+    ("/", "templates", "index.html"),
+    ("/static/script.js", "static", "script.js"),
+    ("/static/style.css", "static", "style.css"),
+)
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Сжатие не окупается на очень маленьких файлах
+MIN_COMPRESS_SIZE = 512
+
+
+@dataclass
+class Asset:
+    """Один ресурс во всех вариантах кодирования"""
+    url: str
+    path: Path
+    content_type: str
+    digest: str
+    mtime: float
+    # Кодирование ("identity", "br", "gzip") -> тело
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+    fingerprinted_url: Optional[str] = None
+
+    def etag(self, encoding: str) -> str:
+        # Строгий ETag различается для каждого варианта кодирования
+        if encoding == "identity":
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+
+def _find_dir(name: str) -> Path:
+    """Каталог ресурсов: сначала в текущей директории, затем в корне проекта"""
+    path = Path(os.getcwd()) / name
+    if path.is_dir():
+        return path
+    return settings.project_root / name
+
+
+def _fingerprint(url: str, digest: str) -> str:
+    stem, dot, ext = url.rpartition(".")
+    return f"{stem}.{digest[:12]}.{ext}"
+
+
+def _compress(body: bytes) -> Dict[str, bytes]:
+    """Варианты тела: без сжатия, gzip и brotli (только если они меньше)"""
+    bodies = {"identity": body}
+    if len(body) < MIN_COMPRESS_SIZE:
+        return bodies
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            bodies["br"] = compressed
+    # mtime=0: одинаковый вывод при каждом запуске
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        bodies["gzip"] = compressed
+    return bodies
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    """Кодирования из Accept-Encoding с ненулевым q"""
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if name:
+            accepted.append(name.strip().lower())
+    return accepted
+
+
+def etag_matches(header: str, etags: List[str]) -> bool:
+    """Слабое сравнение If-None-Match (RFC 9110, 13.1.2)"""
+    if header.strip() == "*":
+        return True
+    opaque = {etag[2:] if etag.startswith("W/") else etag for etag in etags}
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in opaque:
+            return True
+    return False
+
+
+class AssetStore:
+    """Загруженные ресурсы клиента и выдача ответов на запросы к ним"""
+
+    def __init__(self) -> None:
+        self._assets: Dict[str, Asset] = {}
+        # В режиме отладки файлы перечитываются при изменении на диске,
+        # а адреса с отпечатком не выдаются (набор маршрутов не меняется)
+        self._watch = settings.server.debug
+        self.load()
+
+    def load(self) -> None:
+        """Чтение, отпечатки и сжатие всех ресурсов"""
+        assets: Dict[str, Asset] = {}
+        rewrites: Dict[str, str] = {}
+
+        # Сначала скрипт и стили: их отпечатки подставляются в страницу
+        for url, directory, name in sorted(ASSETS, key=lambda a: a[0] == "/"):
+            path = _find_dir(directory) / name
+            try:
+                body = path.read_bytes()
+                mtime = path.stat().st_mtime
+            except OSError as e:
+                logger.warning(f"Asset not found: {path} ({e})")
+                continue
+
+            if url == "/":
+                text = body.decode("utf-8")
+                for original, fingerprinted in rewrites.items():
+                    text = text.replace(f'"{original}"', f'"{fingerprinted}"')
+                body = text.encode("utf-8")
+                content_type = "text/html; charset=utf-8"
+            else:
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type.endswith("javascript"):
+                    content_type += "; charset=utf-8"
+
+            digest = hashlib.sha256(body).hexdigest()[:32]
+            asset = Asset(url, path, content_type, digest, mtime, _compress(body))
+            if url != "/" and not self._watch:
+                asset.fingerprinted_url = _fingerprint(url, digest)
+                rewrites[url] = asset.fingerprinted_url
+                assets[asset.fingerprinted_url] = asset
+            assets[url] = asset
+
+        self._assets = assets
+        for url, asset in assets.items():
+            if url == asset.url:
+                sizes = ", ".join(f"{enc} {len(body)}" for enc, body in asset.bodies.items())
+                logger.info(f"Asset {url} loaded ({sizes})")
+
+    @property
+    def urls(self) -> List[str]:
+        """Все обслуживаемые адреса, включая адреса с отпечатком"""
+        return list(self._assets)
+
+    def _stale(self) -> bool:
+        for url, asset in self._assets.items():
+            try:
+                if asset.path.stat().st_mtime != asset.mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def response(self, url: str, request: Request) -> Response:
+        """Ответ на запрос ресурса с выбором кодирования и проверкой ETag"""
+        if self._watch and self._stale():
+            logger.info("Assets changed on disk, reloading")
+            self.load()
+
+        asset = self._assets.get(url)
+        if asset is None:
+            return Response(status_code=404)
+
+        encoding = "identity"
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for candidate in ("br", "gzip"):
+            if candidate in asset.bodies and candidate in accepted:
+                encoding = candidate
+                break
+
+        etag = asset.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE if url == asset.fingerprinted_url else REVALIDATE_CACHE,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, [etag]):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = b"" if request.method == "HEAD" else asset.bodies[encoding]
+        response = Response(content=body, headers=headers, media_type=asset.content_type)
+        if request.method == "HEAD":
+            response.headers["Content-Length"] = str(len(asset.bodies[encoding]))
+        return response
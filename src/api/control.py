@@ -0,0 +1,125 @@
+"""
+Локальный канал управления процессом сервера через Unix-сокет
+"""
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Протокол: одна строка JSON на запрос {"cmd": ..., ...params}
+# и одна строка JSON на ответ {"ok": true, "result": ...} или {"ok": false, "error": ...}
+MAX_LINE = 64 * 1024
+
+ControlHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class ControlError(RuntimeError):
+    """Ошибка выполнения команды управления"""
+
+
+class ControlServer:
+    """Сервер команд управления (работает в цикле событий процесса сервера)"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._handlers: Dict[str, ControlHandler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def register(self, cmd: str, handler: ControlHandler) -> None:
+        """Регистрация обработчика команды"""
+        self._handlers[cmd] = handler
+
+    async def start(self) -> None:
+        """Открытие сокета"""
+        if self.path.exists():
+            # Сокет остался от аварийно завершенного процесса
+            self.path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=str(self.path), limit=MAX_LINE)
+        os.chmod(self.path, 0o600)
+        logger.info(f"Control socket listening on {self.path}")
+
+    async def close(self) -> None:
+        """Закрытие сокета"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info("Control socket closed")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обработка запросов одного подключения"""
+        try:
+            while line := await reader.readline():
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Control connection error: {e}")
+        finally:
+            writer.close()
+
+    async def _dispatch(self, line: bytes) -> Dict[str, Any]:
+        """Выполнение одной команды"""
+        try:
+            request = json.loads(line)
+            cmd = request.pop("cmd")
+        except (ValueError, KeyError, AttributeError, TypeError):
+            return {"ok": False, "error": "Malformed control request"}
+
+        handler = self._handlers.get(cmd)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command: {cmd}"}
+
+        try:
+            return {"ok": True, "result": await handler(request)}
+        except Exception as e:
+            logger.error(f"Control command {cmd} failed: {e}")
+            return {"ok": False, "error": str(e)}
+
+
+class ControlClient:
+    """Клиент канала управления (используется процессом GUI)"""
+
+    def __init__(self, path: Path, timeout: float = 5.0) -> None:
+        self.path = Path(path)
+        self.timeout = timeout
+
+    async def request(self, cmd: str, timeout: Optional[float] = None, **params: Any) -> Any:
+        """Отправка команды и ожидание ответа (timeout - для долгих команд, по умолчанию self.timeout)"""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(str(self.path), limit=MAX_LINE), self.timeout
+        )
+        try:
+            writer.write(json.dumps({"cmd": cmd, **params}).encode() + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self.timeout if timeout is None else timeout)
+        finally:
+            writer.close()
+
+        if not line:
+            raise ControlError(f"No response to {cmd}")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise ControlError(response.get("error", "Unknown error"))
+        return response.get("result")
+
+    async def profile(self, seconds: float = 5.0, interval_ms: float = 5.0) -> str:
+        """Свернутые стеки процесса сервера: ответ приходит только после seconds профилирования"""
+        return await self.request("profile", timeout=seconds + self.timeout, seconds=seconds, interval_ms=interval_ms)
+
+    async def ping(self) -> bool:
+        """Проверка доступности процесса сервера"""
+        try:
+            return await self.request("ping") == "pong"
+        except (OSError, asyncio.TimeoutError, ControlError):
+            return False
@@ -50,6 +50,9 @@ class ConnectionResponse(BaseModel):
     client_id: str = Field(..., description="ID клиента")
     gamepad_id: Optional[int] = Field(None, description="ID назначенного геймпада")
     message: str = Field(..., description="Сообщение")
+    endpoint: Optional[str] = Field(None, description="Адрес шарда для ввода (если ввод шардирован)")
+    resume_token: Optional[str] = Field(None, description="Токен возобновления сессии")
+    resumed: bool = Field(False, description="Сессия возобновлена с прежним геймпадом")
 
 class ErrorResponse(BaseModel):
     """Стандартный ответ об ошибке"""
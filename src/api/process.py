@@ -0,0 +1,540 @@
+"""
+Процесс сервера: HTTP/WebSocket, виртуальные устройства, канал управления и снимок статуса
+
+Запуск без GUI:
+    python -m src.api.process [--host HOST] [--port PORT] [--loop auto|uvloop|asyncio]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import math
+from collections import Counter
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import HTTPException
+
+from ..config.settings import settings
+from ..core.events import EventBus, DeliveryMode, OverflowPolicy
+from ..core.client_manager import ClientManagerImpl
+from ..core.gamepad_manager import GamepadManagerImpl
+from ..core.status_shm import StatusSnapshotWriter, StatusSnapshotReader
+from ..core.tracing import STAGES
+from ..core.metrics import registry
+from ..core import runtime, profiler
+from ..api.server import FastAPIServer, parse_gamepad_id
+from ..api.models import ConnectionResponse
+from ..api.control import ControlServer, ControlClient, ControlError
+from ..utils.logging_utils import setup_logging
+from ..utils.types import ClientInfo, ClientStatus, Topic
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TIMEOUT = 10.0
+SHUTDOWN_TIMEOUT = 5.0
+
+# Номера геймпадов шарда i: i * SHARD_ID_STRIDE + 1 ...
+SHARD_ID_STRIDE = 1000
+SHARD_POLL_INTERVAL = 0.25
+
+
+def _client_to_dict(client: ClientInfo) -> Dict[str, Any]:
+    data = asdict(client)
+    data["status"] = client.status.value
+    return data
+
+
+class ServerProcess:
+    """
+    Сервер в собственном процессе
+
+    Процесс владеет всеми устройствами uinput и единственным циклом событий,
+    в котором работают менеджеры клиентов и геймпадов. GUI управляет им через
+    Unix-сокет и читает статус из разделяемой памяти, не касаясь его объектов.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        settings.server.host = host
+        settings.server.port = port
+
+        self.event_bus = EventBus(metrics=registry)
+        self.client_manager = ClientManagerImpl(
+            self.event_bus, settings.server.max_clients, settings.server.max_clients_per_ip
+        )
+        self.gamepad_manager = GamepadManagerImpl(self.event_bus)
+        self.server = FastAPIServer(self.event_bus, self.client_manager, self.gamepad_manager)
+
+        self.control = ControlServer(settings.control_socket)
+        self.status: Optional[StatusSnapshotWriter] = None
+        self._uvicorn: Optional[uvicorn.Server] = None
+
+        # Основной процесс при шардировании только распределяет клиентов
+        self.router: Optional[ShardRouter] = None
+        if settings.ingest_shards > 1:
+            self.router = ShardRouter(
+                settings.ingest_shards, host,
+                settings.shard_base_port or port + 1,
+                on_change=self._on_shards_changed
+            )
+            self.server.router = self.router
+
+        self.control.register("ping", self._cmd_ping)
+        self.control.register("status", self._cmd_status)
+        self.control.register("connect", self._cmd_connect)
+        self.control.register("profile", self._cmd_profile)
+        self.control.register("latency", self._cmd_latency)
+        self.control.register("disconnect_client", self._cmd_disconnect_client)
+        self.control.register("suspend_client", self._cmd_suspend_client)
+        self.control.register("shutdown", self._cmd_shutdown)
+
+    async def run(self) -> None:
+        """Работа процесса до сигнала или команды shutdown"""
+        config = uvicorn.Config(
+            app=self.server.app,
+            host=self.host,
+            port=self.port,
+            log_level=settings.server.log_level.lower(),
+            access_log=settings.server.debug,
+            # Циклом владеет runtime, uvicorn только обслуживает сокеты
+            loop="none"
+        )
+        self._uvicorn = uvicorn.Server(config)
+        self.server.server = self._uvicorn
+        self.server._server_instance = self._uvicorn
+        self.server._host = self.host
+
+        try:
+            self.status = StatusSnapshotWriter(settings.status_shm_name, settings.status_shm_size)
+        except Exception as e:
+            logger.error(f"Could not create status snapshot segment: {e}")
+
+        # Пачка событий клиентов сливается в одну перезапись снимка
+        for topic in (t for t in Topic if t.is_client):
+            self.event_bus.subscribe_client(
+                topic, self._on_client_event,
+                mode=DeliveryMode.QUEUED,
+                maxsize=1,
+                overflow=OverflowPolicy.COALESCE,
+                key=lambda *args: None
+            )
+
+        await self.control.start()
+        self.server.is_running = True
+        self.server.start_time = time.time()
+        self._publish_status()
+        logger.info(f"Server process {os.getpid()} serving on {self.host}:{self.port}")
+
+        try:
+            # Ping процесса не пройдет, пока не поднимутся шарды и HTTP
+            if self.router and not await self.router.start():
+                raise RuntimeError("Ingest shards failed to start")
+            await self._uvicorn.serve()
+        finally:
+            self.server.is_running = False
+            await self.control.close()
+            if self.router:
+                await self.router.stop()
+            await self.client_manager.cleanup_all_clients()
+            self._publish_status()
+            if self.status:
+                self.status.close()
+                self.status = None
+            logger.info("Server process stopped")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Снимок статуса для GUI"""
+        tracker = self.server.status_tracker
+        return {
+            "server": {
+                "running": self.server.is_running,
+                "host": self.host,
+                "port": self.port,
+                "pid": os.getpid(),
+                "start_time": self.server.start_time,
+                "max_clients": settings.server.max_clients,
+                "shards": len(self.router.shards) if self.router else 0,
+            },
+            "clients": [_client_to_dict(client) for client in tracker.clients()],
+            "gamepads": tracker.gamepad_count(),
+            "version": tracker.version,
+            "updated_at": time.time(),
+        }
+
+    def _publish_status(self) -> None:
+        if self.status:
+            self.status.publish(self.snapshot())
+
+    def _on_shards_changed(self) -> None:
+        self.server.status_tracker.invalidate()
+        self._publish_status()
+
+    async def _on_client_event(self, client_info: ClientInfo) -> None:
+        """Перезапись снимка статуса после изменения списка клиентов"""
+        self._publish_status()
+
+    async def _cmd_ping(self, params: Dict[str, Any]) -> str:
+        # Канал управления открывается раньше HTTP-сокета
+        if not (self._uvicorn and self._uvicorn.started):
+            raise RuntimeError("HTTP server is starting")
+        return "pong"
+
+    async def _cmd_status(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self.snapshot()
+
+    async def _cmd_connect(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Регистрация клиента по запросу роутера шардов
+        try:
+            response = await self.server.connect(params["client_info"])
+        except HTTPException as e:
+            raise RuntimeError(e.detail)
+        return response.model_dump()
+
+    async def _cmd_profile(self, params: Dict[str, Any]) -> str:
+        # Свернутые стеки процесса сервера (ControlClient.profile ждет ответа дольше seconds)
+        return await profiler.profile(float(params.get("seconds", 5.0)), float(params.get("interval_ms", 5.0)) / 1000.0)
+
+    async def _cmd_latency(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Задержки кадров: в режиме шардов кадры обрабатывают шарды
+        limit = int(params.get("limit", 32))
+        if self.router:
+            return await self.router.latency(limit)
+        return self.server.tracer.snapshot(limit)
+
+    async def _cmd_disconnect_client(self, params: Dict[str, Any]) -> bool:
+        if self.router:
+            return await self.router.disconnect(params["client_id"])
+        return await self.client_manager.remove_client(params["client_id"])
+
+    async def _cmd_suspend_client(self, params: Dict[str, Any]) -> bool:
+        if self.router:
+            return await self.router.suspend(params["client_id"], params.get("resume_token"))
+        return await self.server.suspend(params["client_id"], params.get("resume_token"))
+
+    async def _cmd_shutdown(self, params: Dict[str, Any]) -> bool:
+        if self._uvicorn:
+            self._uvicorn.should_exit = True
+        return True
+
+
+class ServerProcessHandle:
+    """Управление процессом сервера со стороны GUI (или процессом-шардом со стороны роутера)"""
+
+    def __init__(self, control_socket: Optional[Path] = None, status_shm_name: Optional[str] = None,
+                 env: Optional[Dict[str, str]] = None) -> None:
+        self.control = ControlClient(control_socket or settings.control_socket)
+        self.status_shm_name = status_shm_name or settings.status_shm_name
+        self._env = env
+        self._process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Жив ли процесс сервера"""
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self, host: str, port: int) -> bool:
+        """Запуск процесса и ожидание готовности канала управления"""
+        if self.is_running:
+            logger.warning("Server process is already running")
+            return False
+
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "src.api.process", "--host", host, "--port", str(port),
+            cwd=str(settings.project_root),
+            env=dict(os.environ, **self._env) if self._env else None
+        )
+        logger.info(f"Server process started with pid {self._process.pid}")
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if not self.is_running:
+                logger.error(f"Server process exited with code {self._process.returncode}")
+                return False
+            if await self.control.ping():
+                return True
+            await asyncio.sleep(0.1)
+
+        logger.error("Server process did not become ready in time")
+        await self.stop()
+        return False
+
+    async def stop(self) -> None:
+        """Корректная остановка процесса (с принудительным завершением по таймауту)"""
+        if not self.is_running:
+            self._process = None
+            return
+
+        try:
+            await self.control.request("shutdown")
+        except Exception as e:
+            logger.warning(f"Shutdown command failed, terminating process: {e}")
+            self._process.terminate()
+
+        try:
+            await asyncio.wait_for(self._process.wait(), SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Server process did not exit, killing it")
+            self._process.kill()
+            await self._process.wait()
+
+        logger.info(f"Server process exited with code {self._process.returncode}")
+        self._process = None
+
+    def open_status(self) -> Optional[StatusSnapshotReader]:
+        """Подключение к снимку статуса процесса сервера"""
+        try:
+            return StatusSnapshotReader(self.status_shm_name)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"Status snapshot is not available: {e}")
+            return None
+
+
+class _Shard:
+    """Процесс-шард и его последнее известное состояние"""
+
+    def __init__(self, index: int, port: int, handle: ServerProcessHandle) -> None:
+        self.index = index
+        self.port = port
+        self.handle = handle
+        self.reader: Optional[StatusSnapshotReader] = None
+        self.clients: List[Dict[str, Any]] = []
+        self.gamepads = 0
+        self.pending = 0  # Подключения, еще не попавшие в снимок шарда
+        self.ip_counts: Dict[str, int] = {}  # Клиенты шарда по адресам
+        self.status_counts: Dict[ClientStatus, int] = {}  # Клиенты шарда по статусам
+
+
+class ShardRouter:
+    """
+    Распределение клиентов по процессам-шардам
+
+    Каждый шард - полноценный ServerProcess со своим циклом событий,
+    блокировками и виртуальными геймпадами (номера геймпадов шарда i
+    начинаются с i * SHARD_ID_STRIDE + 1). Роутер выбирает наименее
+    загруженный шард при /connect, регистрирует клиента через канал
+    управления шарда и возвращает адрес шарда: дальше ввод и WebSocket
+    клиента идут в шард напрямую, минуя основной процесс.
+    """
+
+    def __init__(self, count: int, host: str, base_port: int,
+                 on_change: Optional[Callable[[], None]] = None) -> None:
+        self.host = host
+        self._on_change = on_change
+        self._client_shards: Dict[str, int] = {}
+        # Время маршрутизации (time.time()): снимок шарда старше него может еще не знать клиента
+        self._routed_at: Dict[str, float] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+
+        per_shard_clients = math.ceil(settings.server.max_clients / count)
+        per_shard_gamepads = math.ceil(settings.max_gamepads / count)
+        base = settings.control_socket
+        self.shards: List[_Shard] = []
+        for index in range(count):
+            status_name = f"{settings.status_shm_name}_shard{index}"
+            env = {
+                "RG_SHARDS": "0",
+                "RG_GAMEPAD_ID_OFFSET": str(index * SHARD_ID_STRIDE),
+                "RG_MAX_CLIENTS": str(per_shard_clients),
+                "RG_MAX_GAMEPADS": str(per_shard_gamepads),
+                "RG_CONTROL_SOCKET": str(base.with_name(f"{base.stem}.shard{index}{base.suffix}")),
+                "RG_STATUS_SHM": status_name,
+                "RG_SHM_EVENTS_NAME": f"{settings.shm_event_ring_name}_shard{index}",
+                "RG_LOG_NAME": f"shard{index}",
+            }
+            handle = ServerProcessHandle(Path(env["RG_CONTROL_SOCKET"]), status_name, env)
+            self.shards.append(_Shard(index, base_port + index, handle))
+
+    async def start(self) -> bool:
+        """Запуск всех шардов"""
+        results = await asyncio.gather(*(
+            shard.handle.start(self.host, shard.port) for shard in self.shards
+        ))
+        if not all(results):
+            logger.error("Not all ingest shards started, stopping")
+            await self.stop()
+            return False
+
+        for shard in self.shards:
+            shard.reader = shard.handle.open_status()
+        self._watch_task = asyncio.create_task(self._watch())
+        logger.info(f"{len(self.shards)} ingest shards running on ports "
+                    f"{self.shards[0].port}-{self.shards[-1].port}")
+        return True
+
+    async def stop(self) -> None:
+        """Остановка шардов"""
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+        await asyncio.gather(*(shard.handle.stop() for shard in self.shards))
+        for shard in self.shards:
+            if shard.reader:
+                shard.reader.close()
+                shard.reader = None
+        self._client_shards.clear()
+        self._routed_at.clear()
+
+    def _pick(self, gamepad_id: Optional[int], client_id: Optional[str] = None) -> _Shard:
+        """Шард для нового клиента"""
+        if client_id in self._client_shards:
+            # Возобновление сессии - в шарде, где остался геймпад клиента
+            return self.shards[self._client_shards[client_id]]
+        if gamepad_id is not None:
+            # Co-pilot идет в шард, которому принадлежит геймпад
+            index = (gamepad_id - 1) // SHARD_ID_STRIDE
+            if 0 <= index < len(self.shards):
+                return self.shards[index]
+        return min(self.shards, key=lambda shard: len(shard.clients) + shard.pending)
+
+    async def connect(self, client_info: dict, hostname: Optional[str]) -> ConnectionResponse:
+        """Подключение клиента через наименее загруженный шард"""
+        resume_id = client_info.get("client_id") if client_info.get("resume_token") else None
+        ip_address = client_info.get("ip_address")
+        limit = settings.server.max_clients_per_ip
+        if limit and resume_id not in self._client_shards and sum(
+                shard.ip_counts.get(ip_address, 0) for shard in self.shards) >= limit:
+            # Лимит на IP общий для всех шардов (каждый шард видит только своих клиентов)
+            raise HTTPException(status_code=429, detail="Cannot connect - too many clients from this address")
+        shard = self._pick(parse_gamepad_id(client_info.get("gamepad_id")), resume_id)
+        shard.pending += 1
+        try:
+            result = await shard.handle.control.request("connect", client_info=client_info)
+        except ControlError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.error(f"Shard {shard.index} is unreachable: {e}")
+            raise HTTPException(status_code=503, detail="Ingest shard unavailable")
+        finally:
+            shard.pending -= 1
+
+        self._client_shards[result["client_id"]] = shard.index
+        self._routed_at[result["client_id"]] = time.time()
+        if not result.get("resumed"):
+            shard.clients.append({"client_id": result["client_id"], "ip_address": ip_address})
+            shard.ip_counts[ip_address] = shard.ip_counts.get(ip_address, 0) + 1
+        result["endpoint"] = f"http://{hostname or self.host}:{shard.port}"
+        logger.info(f"Client {result['client_id']} routed to shard {shard.index}")
+        return ConnectionResponse(**result)
+
+    async def disconnect(self, client_id: str) -> bool:
+        """Отключение клиента в его шарде"""
+        index = self._client_shards.pop(client_id, None)
+        self._routed_at.pop(client_id, None)
+        if index is None:
+            return False
+        try:
+            return bool(await self.shards[index].handle.control.request("disconnect_client", client_id=client_id))
+        except (ControlError, OSError, asyncio.TimeoutError) as e:
+            logger.error(f"Could not disconnect {client_id} from shard {index}: {e}")
+            return False
+
+    async def suspend(self, client_id: str, resume_token: Optional[str]) -> bool:
+        """Парковка клиента в его шарде"""
+        index = self._client_shards.get(client_id)
+        if index is None:
+            return False
+        try:
+            return bool(await self.shards[index].handle.control.request(
+                "suspend_client", client_id=client_id, resume_token=resume_token))
+        except (ControlError, OSError, asyncio.TimeoutError) as e:
+            logger.error(f"Could not suspend {client_id} in shard {index}: {e}")
+            return False
+
+    async def latency(self, limit: int) -> Dict[str, Any]:
+        """Задержки кадров всех шардов: клиенты объединяются, медленные кадры сортируются"""
+        results = await asyncio.gather(*(
+            shard.handle.control.request("latency", limit=limit) for shard in self.shards
+        ), return_exceptions=True)
+
+        merged: Dict[str, Any] = {
+            "enabled": settings.frame_tracing, "stages": list(STAGES), "clients": {}, "slowest": []
+        }
+        for shard, result in zip(self.shards, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Could not read latency from shard {shard.index}: {result}")
+                continue
+            merged["clients"].update(result["clients"])
+            merged["slowest"].extend(result["slowest"])
+        merged["slowest"].sort(key=lambda frame: frame["stages_ms"]["total"], reverse=True)
+        merged["slowest"] = merged["slowest"][:limit]
+        return merged
+
+    def clients(self) -> List[ClientInfo]:
+        """Клиенты всех шардов по последним снимкам"""
+        result = []
+        for shard in self.shards:
+            for data in shard.clients:
+                if "status" in data:
+                    result.append(ClientInfo(**dict(data, status=ClientStatus(data["status"]))))
+        return result
+
+    def status_counts(self) -> Dict[ClientStatus, int]:
+        """Клиенты всех шардов по статусам (посчитаны при чтении снимков)"""
+        counts: Counter = Counter()
+        for shard in self.shards:
+            counts.update(shard.status_counts)
+        return dict(counts)
+
+    def gamepad_count(self) -> int:
+        """Количество геймпадов во всех шардах"""
+        return sum(shard.gamepads for shard in self.shards)
+
+    async def _watch(self) -> None:
+        """Опрос снимков статуса шардов"""
+        while True:
+            changed = False
+            for shard in self.shards:
+                if shard.reader is None:
+                    shard.reader = shard.handle.open_status()
+                    continue
+                if not shard.reader.changed():
+                    continue
+                snapshot = shard.reader.read()
+                if snapshot:
+                    shard.clients = snapshot["clients"]
+                    shard.ip_counts = Counter(client["ip_address"] for client in shard.clients)
+                    shard.status_counts = Counter(
+                        ClientStatus(client["status"]) for client in shard.clients if "status" in client)
+                    shard.gamepads = snapshot["gamepads"]
+                    # Клиенты, ушедшие из шарда сами (закрыли вкладку, таймаут). Снимок
+                    # мог быть записан до подключения клиента: такие записи не трогаем
+                    present = {client["client_id"] for client in shard.clients}
+                    updated_at = snapshot.get("updated_at", 0.0)
+                    for client_id in [c for c, i in self._client_shards.items() if i == shard.index and c not in present]:
+                        if self._routed_at.get(client_id, 0.0) < updated_at:
+                            del self._client_shards[client_id]
+                            self._routed_at.pop(client_id, None)
+                    changed = True
+            if changed and self._on_change:
+                self._on_change()
+            await asyncio.sleep(SHARD_POLL_INTERVAL)
+
+
+async def serve(host: str, port: int) -> None:
+    """Создание и работа процесса сервера внутри цикла runtime"""
+    await ServerProcess(host, port).run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RemoteGamepad server process")
+    parser.add_argument("--host", default=settings.server.host)
+    parser.add_argument("--port", type=int, default=settings.server.port)
+    parser.add_argument("--loop", choices=runtime.LOOP_KINDS, default=None)
+    args = parser.parse_args()
+
+    setup_logging(settings.log_name or "server")
+
+    try:
+        runtime.run(serve(args.host, args.port), args.loop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
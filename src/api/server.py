@@ -2,35 +2,74 @@
 FastAPI сервер для RemoteGamepad
 """
 import asyncio
+import hmac
+import ipaddress
 import logging
 import time
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
-import qrcode
-import io
-import base64
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
 import uvicorn
 
-from ..utils.types import GamepadEvent, GamepadEventType, ClientInfo, ClientStatus
+from ..utils.types import GamepadControl, GamepadEvent, GamepadEventType, ClientInfo, ClientStatus, Topic
+from ..api.assets import AssetStore, etag_matches
 from ..api.models import (
     GamepadInputData, ServerStatusResponse, ConnectionResponse, 
     ErrorResponse, WebSocketMessage, WebSocketMessageType, QRCodeRequest
 )
-from ..core.events import EventBus
+from ..core.events import EventBus, DeliveryMode, OverflowPolicy
 from ..core.client_manager import ClientManagerImpl
 from ..core.gamepad_manager import GamepadManagerImpl
+from ..core.motion import MOTION_FRAME_TYPE, decode_motion_frame
+from ..core.gyro_aim import GyroAimEngine, GyroAimConfig
+from ..core.shm_bus import SharedMemoryEventTransport
+from ..core.status import StatusTracker
+from ..core.tracing import FrameTracer
+from ..core.sessions import SessionStore
+from ..core.liveness import LivenessTracker
+from ..core import profiler
+from ..core.metrics import (
+    registry as metrics_registry, FRAMES_RECEIVED, FRAMES_REJECTED, FRAME_DECODE_SECONDS,
+    INPUT_TO_WRITE_SECONDS, WEBSOCKET_CONNECTIONS, WEBSOCKET_ACCEPTED, CLIENTS_SWEPT
+)
 from ..config.settings import settings
 from ..utils.dependency import container
+from ..utils.qr import get_qr
+from ..utils.logging_utils import log_throttled, forget_log_key
 
 logger = logging.getLogger(__name__)
 
+# Транспорты кадров ввода (метка transport в метриках)
+TRANSPORTS = ("http", "ws", "ws_binary")
+_HTTP_DECODE = FRAME_DECODE_SECONDS.labels("http")
+_WS_DECODE = FRAME_DECODE_SECONDS.labels("ws")
+_WS_BINARY_DECODE = FRAME_DECODE_SECONDS.labels("ws_binary")
+_INPUT_TO_WRITE = {transport: INPUT_TO_WRITE_SECONDS.labels(transport) for transport in TRANSPORTS}
+
+# Оси стиков из пакета клиента ({"x": ..., "y": ...}) -> коды контролов
+_LEFT_STICK = {"x": GamepadControl.AXIS_LX, "y": GamepadControl.AXIS_LY}
+_RIGHT_STICK = {"x": GamepadControl.AXIS_RX, "y": GamepadControl.AXIS_RY}
+
+
+def parse_gamepad_id(value) -> Optional[int]:
+    """Номер геймпада из запроса клиента (None - не указан), иначе HTTP 400"""
+    if value is None:
+        return None
+    if not isinstance(value, bool):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    raise HTTPException(status_code=400, detail="Invalid gamepad ID")
+
 
 class ConnectionManager:
     """Менеджер WebSocket подключений"""
@@ -41,14 +80,38 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket, client_id: str):
         """Подключение WebSocket клиента"""
         await websocket.accept()
+        # Прежнее соединение клиента вытесняется: его закрытие уже ничего не отключит
+        if self.active_connections.get(client_id) is None:
+            WEBSOCKET_CONNECTIONS.inc()
         self.active_connections[client_id] = websocket
+        WEBSOCKET_ACCEPTED.inc()
         logger.info(f"WebSocket client {client_id} connected")
     
-    def disconnect(self, client_id: str):
-        """Отключение WebSocket клиента"""
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-            logger.info(f"WebSocket client {client_id} disconnected")
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None) -> bool:
+        """
+        Отключение WebSocket клиента
+        
+        С websocket отключается только это соединение: False, если клиент
+        уже открыл новое (старое закрылось после возобновления сессии).
+        """
+        current = self.active_connections.get(client_id)
+        if current is None or (websocket is not None and current is not websocket):
+            return False
+        del self.active_connections[client_id]
+        WEBSOCKET_CONNECTIONS.dec()
+        logger.info(f"WebSocket client {client_id} disconnected")
+        return True
+    
+    def retire(self, client_id: str) -> None:
+        """
+        Отвязка текущего соединения клиента без отключения клиента
+        
+        После возобновления сессии клиент открывает новый WebSocket, а старый
+        закрывается уже после /connect: его обрыв не должен снова парковать сессию.
+        """
+        if self.active_connections.pop(client_id, None) is not None:
+            WEBSOCKET_CONNECTIONS.dec()
+            logger.info(f"WebSocket of client {client_id} replaced by a resumed session")
     
     async def send_personal_message(self, message: dict, client_id: str):
         """Отправка персонального сообщения"""
@@ -76,6 +139,35 @@ class FastAPIServer:
         self.client_manager: ClientManagerImpl = client_manager
         self.gamepad_manager: GamepadManagerImpl = gamepad_manager
         self.connection_manager = ConnectionManager()
+        self.shm_transport: Optional[SharedMemoryEventTransport] = None
+        self.gyro_aim: Optional[GyroAimEngine] = None
+        self._gyro_sources: Dict[str, str] = {}
+        self._qr_host: Optional[str] = None
+        # Задержки кадров по стадиям и медленные кадры
+        self.tracer = FrameTracer(settings.frame_tracing, settings.trace_slow_frames)
+        # Токены возобновления и припаркованные клиенты
+        self.sessions = SessionStore(settings.session_resume_grace)
+        # Последние кадры и ping клиентов, по ним периодический обход паркует и удаляет клиентов
+        self.liveness = LivenessTracker(settings.client_idle_timeout)
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Снимок статуса для /status и GUI (в режиме шардов - по данным роутера)
+        self.status_tracker = StatusTracker(
+            event_bus,
+            clients=lambda: self.router.clients() if self.router else self.client_manager.snapshot().values(),
+            counts=lambda: (self.router or self.client_manager).status_counts(),
+            gamepads=lambda: (self.router or self.gamepad_manager).gamepad_count(),
+            running=lambda: self.is_running
+        )
+        # Роутер шардов (ShardRouter): если задан, /connect распределяет клиентов по процессам
+        self.router = None
+        if settings.gyro_aim_enabled:
+            self.gyro_aim = GyroAimEngine(GyroAimConfig(
+                sensitivity=settings.gyro_sensitivity,
+                max_rate=settings.gyro_max_rate,
+                deadzone=settings.gyro_deadzone,
+                curve=settings.gyro_curve,
+                ratchet_button=settings.gyro_ratchet_button
+            ))
         self.start_time = time.time()
         self.is_running = False
         
@@ -95,9 +187,27 @@ class FastAPIServer:
         async def lifespan(app: FastAPI):
             # Startup
             logger.info("FastAPI server starting up...")
+            if settings.shm_event_ring:
+                self.shm_transport = SharedMemoryEventTransport(
+                    self.event_bus,
+                    settings.shm_event_ring_name,
+                    capacity=settings.shm_event_ring_capacity
+                )
+                try:
+                    self.shm_transport.start()
+                except Exception as e:
+                    logger.error(f"Could not start shared memory event ring: {e}")
+                    self.shm_transport = None
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
             yield
             # Shutdown  
             logger.info("FastAPI server shutting down...")
+            self._sweep_task.cancel()
+            self._sweep_task = None
+            self.sessions.clear()
+            if self.shm_transport:
+                self.shm_transport.close()
+                self.shm_transport = None
             await self.gamepad_manager.cleanup()
         
         self.app = FastAPI(
@@ -116,6 +226,14 @@ class FastAPIServer:
             allow_headers=["*"],
         )
         
+        # Страница и клиентские ресурсы из памяти (регистрируются раньше /static,
+        # чтобы перекрыть StaticFiles для этих файлов)
+        self.assets = AssetStore()
+        for url in dict.fromkeys(["/", *self.assets.urls]):
+            self.app.add_api_route(
+                url, self._serve_asset, methods=["GET", "HEAD"], include_in_schema=False
+            )
+        
         # Static files
         try:
             static_dir = os.path.join(os.getcwd(), "static")
@@ -139,104 +257,47 @@ class FastAPIServer:
     def _setup_routes(self):
         """Настройка маршрутов"""
         
-        @self.app.get("/", response_class=HTMLResponse)
-        async def index():
-            """Главная страница"""
-            try:
-                # Сначала пробуем текущую директорию
-                template_path = os.path.join(os.getcwd(), "templates", "index.html")
-                if not os.path.exists(template_path):
-                    # Пробуем относительно текущего файла
-                    current_dir = os.path.dirname(os.path.abspath(__file__))
-                    template_path = os.path.join(current_dir, "..", "..", "templates", "index.html")
-                
-                if os.path.exists(template_path):
-                    with open(template_path, "r", encoding="utf-8") as f:
-                        return f.read()
-                else:
-                    logger.warning(f"Template not found: {template_path}")
-                    return "<h1>RemoteGamepad Server</h1><p>Template not found</p>"
-            except Exception as e:
-                logger.error(f"Error loading template: {e}")
-                return f"<h1>RemoteGamepad Server</h1><p>Error loading template: {e}</p>"
-        
         @self.app.get("/status", response_model=ServerStatusResponse)
-        async def get_status():
-            """Статус сервера"""
-            clients = await self.client_manager.get_clients()
-            gamepad_count = await self.gamepad_manager.get_gamepad_count()
+        async def get_status(request: Request):
+            """Статус сервера (без блокировок менеджеров, с ETag по версии снимка)"""
+            tracker = self.status_tracker
+            headers = {"ETag": tracker.etag(), "Cache-Control": "no-cache"}
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and etag_matches(if_none_match, [headers["ETag"]]):
+                return Response(status_code=304, headers=headers)
             
-            return ServerStatusResponse(
-                status="running" if self.is_running else "stopped",
-                uptime=int(time.time() - self.start_time),
-                clients_count=len(clients),
-                server_info={
-                    "host": settings.server.host,
-                    "port": settings.server.port,
-                    "max_clients": settings.server.max_clients,
-                    "gamepads_active": gamepad_count,
-                    "max_gamepads": settings.max_gamepads
-                }
+            uptime = int(time.time() - self.start_time)
+            gamepad_count = tracker.gamepad_count()
+            body = tracker.serialized(
+                (self.is_running, uptime, gamepad_count),
+                lambda: ServerStatusResponse(
+                    status="running" if self.is_running else "stopped",
+                    uptime=uptime,
+                    clients_count=tracker.client_count(),
+                    server_info={
+                        "host": settings.server.host,
+                        "port": settings.server.port,
+                        "max_clients": settings.server.max_clients,
+                        "clients_by_status": tracker.status_counts(),
+                        "gamepads_active": gamepad_count,
+                        "max_gamepads": settings.max_gamepads,
+                        "shards": len(self.router.shards) if self.router else 0,
+                        "version": tracker.version
+                    }
+                ).model_dump_json().encode()
             )
+            return Response(content=body, media_type="application/json", headers=headers)
         
         @self.app.post("/connect", response_model=ConnectionResponse)
-        async def connect_client(client_info: dict):
+        async def connect_client(client_info: dict, request: Request):
             """Подключение нового клиента"""
-            try:
-                # Генерируем ID клиента
-                client_id = await self.client_manager.generate_client_id(
-                    client_info.get("ip_address", "unknown")
-                )
-                
-                # Получаем profile_name
-                profile_name = client_info.get("profile_name", "Guest")
-                logger.info(f"Client info received: {client_info}")
-                logger.info(f"Profile name: {profile_name}")
-                
-                # Создаем информацию о клиенте
-                client = ClientInfo(
-                    client_id=client_id,
-                    ip_address=client_info.get("ip_address", "unknown"),
-                    user_agent=client_info.get("user_agent", "unknown"),
-                    connected_at=time.time(),
-                    status=ClientStatus.CONNECTING,
-                    profile_name=profile_name
-                )
-                
-                logger.info(f"Creating client with profile_name: {profile_name}")
-                
-                # Добавляем клиента
-                if await self.client_manager.add_client(client):
-                    # Создаем геймпад для клиента
-                    gamepad_id = await self.gamepad_manager.create_gamepad(client_id)
-                    
-                    if gamepad_id:
-                        await self.client_manager.assign_gamepad(client_id, gamepad_id)
-                        
-                        # Обновляем статус на CONNECTED
-                        await self.client_manager.update_client_status(client_id, ClientStatus.CONNECTED)
-                        
-                        return ConnectionResponse(
-                            success=True,
-                            client_id=client_id,
-                            gamepad_id=gamepad_id,
-                            message="Connected successfully"
-                        )
-                    else:
-                        await self.client_manager.remove_client(client_id)
-                        raise HTTPException(
-                            status_code=503, 
-                            detail="Cannot create gamepad - limit reached"
-                        )
-                else:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Cannot connect - server full"
-                    )
-                    
-            except Exception as e:
-                logger.error(f"Error connecting client: {e}")
-                raise HTTPException(status_code=500, detail=str(e))
+            # Адрес берется из соединения: от него считается лимит клиентов на IP
+            if request.client:
+                client_info = {**client_info, "ip_address": request.client.host}
+            if self.router:
+                # Геймпад создается в одном из шардов, дальше клиент работает с ним напрямую
+                return await self.router.connect(client_info, request.url.hostname)
+            return await self.connect(client_info)
         
         @self.app.post("/update_profile")
         async def update_profile(data: dict):
@@ -257,6 +318,36 @@ class FastAPIServer:
                 logger.error(f"Error updating profile: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/gamepad_owner")
+        async def set_gamepad_owner(data: dict):
+            """
+            Закрепление контрола общего геймпада за клиентом
+            
+            Менять закрепление может только клиент этого геймпада (requester_id,
+            с его токеном, если сессии включены), и только в пользу клиента
+            того же геймпада; client_id = None снимает закрепление.
+            """
+            gamepad_id = parse_gamepad_id(data.get("gamepad_id"))
+            control_name = data.get("control")
+            requester_id = data.get("requester_id")
+            owner_id = data.get("client_id")
+            if gamepad_id is None or not control_name or not requester_id:
+                raise HTTPException(status_code=400, detail="Gamepad ID, control and requester ID required")
+            control = GamepadControl.parse(control_name)
+            if control is None:
+                raise HTTPException(status_code=400, detail=f"Unknown control: {control_name}")
+            
+            if self.sessions.enabled and not self.sessions.verify(requester_id, data.get("resume_token")):
+                raise HTTPException(status_code=403, detail="Invalid resume token")
+            attached = await self.gamepad_manager.get_clients_for_gamepad(gamepad_id)
+            if requester_id not in attached or (owner_id is not None and owner_id not in attached):
+                raise HTTPException(status_code=403, detail="Requester and owner must be attached to the gamepad")
+            
+            if not await self.gamepad_manager.set_control_owner(gamepad_id, control, owner_id):
+                raise HTTPException(status_code=404, detail="Gamepad, control or client not found")
+            
+            return {"success": True, "message": "Control owner updated"}
+        
         @self.app.post("/disconnect")
         async def disconnect_client(data: dict):
             """Отключение клиента"""
@@ -265,8 +356,12 @@ class FastAPIServer:
                 if not client_id:
                     raise HTTPException(status_code=400, detail="Client ID required")
                 
-                # Отключаем клиента
-                if await self.client_manager.remove_client(client_id):
+                # Отключаем клиента (в его шарде, если ввод шардирован)
+                removed = (
+                    await self.router.disconnect(client_id) if self.router
+                    else await self.client_manager.remove_client(client_id)
+                )
+                if removed:
                     logger.info(f"Client {client_id} disconnected")
                     return {"success": True, "message": "Disconnected successfully"}
                 else:
@@ -276,100 +371,37 @@ class FastAPIServer:
                 logger.error(f"Error disconnecting client: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/suspend")
+        async def suspend_client(data: dict):
+            """Парковка клиента: страница ушла в фон, геймпад ждет возвращения"""
+            client_id = data.get("client_id")
+            resume_token = data.get("resume_token")
+            # Без токена suspend() считает вызов обрывом соединения и не проверяет владельца
+            if not client_id or not resume_token:
+                raise HTTPException(status_code=400, detail="Client ID and resume token required")
+            
+            if self.router:
+                parked = await self.router.suspend(client_id, resume_token)
+            else:
+                parked = await self.suspend(client_id, resume_token)
+            if not parked:
+                raise HTTPException(status_code=404, detail="Session not found")
+            return {"success": True, "message": "Session parked", "grace": settings.session_resume_grace}
+        
         @self.app.post("/gamepad_data")
-        async def handle_gamepad_data(data: GamepadInputData):
+        async def handle_gamepad_data(request: Request):
             """Обработка данных геймпада"""
+            # Тело разбирается здесь, а не в FastAPI: так в трассировку попадает стадия decode
+            body = await request.body()
+            received = time.perf_counter()
             try:
-                client_id = data.client_id
-                if not client_id:
-                    raise HTTPException(status_code=400, detail="Client ID required")
-                
-                # Получаем геймпад для клиента
-                gamepad_id = await self.gamepad_manager.get_gamepad_for_client(client_id)
-                if not gamepad_id:
-                    raise HTTPException(status_code=404, detail="Gamepad not found for client")
-                
-                # Обрабатываем события осей
-                if data.type == "axis" and data.axes:
-                    axes_data = data.axes
-                    
-                    # Левый стик
-                    if axes_data.left_stick:
-                        for axis, value in axes_data.left_stick.items():
-                            axis_name = f"AxisL{axis}"
-                            event = GamepadEvent(
-                                client_id=client_id,
-                                event_type=GamepadEventType.AXIS_MOVE,
-                                axis_name=axis_name,
-                                value=float(value),
-                                timestamp=time.time()
-                            )
-                            await self.gamepad_manager.send_event(gamepad_id, event)
-                    
-                    # Правый стик  
-                    if axes_data.right_stick:
-                        for axis, value in axes_data.right_stick.items():
-                            axis_name = f"AxisR{axis}"
-                            event = GamepadEvent(
-                                client_id=client_id,
-                                event_type=GamepadEventType.AXIS_MOVE,
-                                axis_name=axis_name,
-                                value=float(value),
-                                timestamp=time.time()
-                            )
-                            await self.gamepad_manager.send_event(gamepad_id, event)
-                
-                # Обрабатываем события кнопок
-                if data.buttons:
-                    for button in data.buttons:
-                        # Проверяем, является ли это триггером
-                        if button.name in ['TriggerL', 'TriggerR']:
-                            # Триггеры обрабатываем как оси
-                            event = GamepadEvent(
-                                client_id=client_id,
-                                event_type=GamepadEventType.AXIS_MOVE,
-                                axis_name=button.name,
-                                value=button.pressed,  # True/False для триггеров
-                                timestamp=time.time()
-                            )
-
-                        else:
-                            # Обычные кнопки
-                            event_type = GamepadEventType.BUTTON_PRESS if button.pressed else GamepadEventType.BUTTON_RELEASE
-                            event = GamepadEvent(
-                                client_id=client_id,
-                                event_type=event_type,
-                                button_code=button.name,
-                                value=button.value,
-                                timestamp=time.time()
-                            )
-                        
-                        await self.gamepad_manager.send_event(gamepad_id, event)
-                
-                # Обрабатываем D-PAD события
-                if data.buttons:
-                    # Собираем D-PAD кнопки
-                    dpad_buttons = {btn.name: btn.pressed for btn in data.buttons if btn.name.startswith('Dpad')}
-                    
-                    if dpad_buttons:
-                        # Вычисляем D-PAD координаты как в старом коде
-                        dpad_x = (1 if dpad_buttons.get('Dpad_Right', False) else 0) - (1 if dpad_buttons.get('Dpad_Left', False) else 0)
-                        dpad_y = (1 if dpad_buttons.get('Dpad_Up', False) else 0) - (1 if dpad_buttons.get('Dpad_Down', False) else 0)
-                        
-                        # Инвертируем Y как в старом коде
-                        dpad_y = dpad_y * -1
-                        
-                        # Отправляем D-PAD событие
-                        dpad_event = GamepadEvent(
-                            client_id=client_id,
-                            event_type=GamepadEventType.DPAD,
-                            axis_name="Dpad",
-                            value_x=dpad_x,
-                            value_y=dpad_y,
-                            timestamp=time.time()
-                        )
-                        await self.gamepad_manager.send_event(gamepad_id, dpad_event)
-                
+                data = GamepadInputData.model_validate_json(body)
+            except ValidationError as e:
+                FRAMES_REJECTED.labels("http", "invalid").inc()
+                raise RequestValidationError(e.errors(include_url=False))
+            _HTTP_DECODE.observe_since(received)
+            try:
+                await self._ingest_gamepad_data(data, "http", received, time.perf_counter())
                 return {"status": "success"}
                 
             except HTTPException:
@@ -378,68 +410,519 @@ class FastAPIServer:
                 logger.error(f"Error processing gamepad data: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
+        if settings.metrics_enabled:
+            @self.app.get("/metrics")
+            async def metrics():
+                """Метрики в текстовом формате Prometheus"""
+                return Response(
+                    content=metrics_registry.render(),
+                    media_type="text/plain; version=0.0.4; charset=utf-8"
+                )
+        
+        @self.app.get("/admin/profile")
+        async def profile_server(request: Request, seconds: float = 5.0, interval_ms: float = 5.0):
+            """Сэмплирующий профилировщик: свернутые стеки всех потоков процесса"""
+            self._require_admin(request)
+            try:
+                collapsed = await profiler.profile(seconds, interval_ms / 1000.0)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except RuntimeError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            return Response(content=collapsed, media_type="text/plain; charset=utf-8")
+        
+        @self.app.get("/admin/latency")
+        async def frame_latency(request: Request, limit: int = 32):
+            """Задержки кадров по клиентам и стадиям, самые медленные недавние кадры"""
+            self._require_admin(request)
+            limit = max(1, limit)
+            return await self.router.latency(limit) if self.router else self.tracer.snapshot(limit)
+        
         @self.app.get("/qr")
-        async def generate_qr_code(request: QRCodeRequest = Depends()):
-            """Генерация QR кода для подключения"""
+        async def generate_qr_code(http_request: Request, request: QRCodeRequest = Depends()):
+            """QR код для подключения (PNG или SVG, с ETag)"""
             try:
-                # Получаем локальный IP адрес
-                import socket
-                hostname = socket.gethostname()
-                local_ip = socket.gethostbyname(hostname)
-                
                 # Формируем URL для подключения
-                url = f"http://{local_ip}:{settings.server.port}"
-                
-                # Создаем QR код
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_L,
-                    box_size=10,
-                    border=4,
-                )
-                qr.add_data(url)
-                qr.make(fit=True)
-                
-                # Генерируем изображение
-                img = qr.make_image(fill_color="black", back_color="white")
-                
-                # Конвертируем в base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='PNG')
-                img_str = base64.b64encode(buffer.getvalue()).decode()
-                
-                return {
-                    "qr_code": f"data:image/png;base64,{img_str}",
-                    "url": url,
-                    "format": "png"
-                }
-                
+                url = f"http://{await self._local_ip()}:{settings.server.port}"
+                image = await get_qr(url, request.size, request.format)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 logger.error(f"Error generating QR code: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
+            
+            headers = {"ETag": image.etag, "Cache-Control": "no-cache", "X-Connect-URL": url}
+            if_none_match = http_request.headers.get("if-none-match")
+            if if_none_match and etag_matches(if_none_match, [image.etag]):
+                return Response(status_code=304, headers=headers)
+            return Response(content=image.data, media_type=image.media_type, headers=headers)
         
         @self.app.websocket("/ws/{client_id}")
         async def websocket_endpoint(websocket: WebSocket, client_id: str):
-            """WebSocket эндпоинт для real-time коммуникации"""
+            """
+            WebSocket эндпоинт для real-time коммуникации
+            
+            Обрыв паркует клиента, только если соединение доказало владение
+            сессией (?resume_token=...): иначе кто угодно мог бы открыть и
+            закрыть /ws/<чужой id> и припарковать чужую сессию. Соединение без
+            токена просто отключается, а замолчавшего клиента паркует обход живости.
+            """
+            owner = self.sessions.verify(client_id, websocket.query_params.get("resume_token"))
             await self.connection_manager.connect(websocket, client_id)
             try:
                 while True:
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
+                    frame = await websocket.receive()
+                    if frame["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(frame.get("code", 1000))
+                    
+                    # Бинарные кадры - упакованные потоки датчиков
+                    if frame.get("bytes") is not None:
+                        await self._handle_binary_frame(client_id, frame["bytes"])
+                        continue
+                    
+                    start = time.perf_counter()
+                    try:
+                        message = json.loads(frame.get("text") or "{}")
+                    except ValueError:
+                        message = None
+                    if not isinstance(message, dict):
+                        # Испорченный кадр отбрасывается, соединение остается
+                        FRAMES_REJECTED.labels("ws", "invalid").inc()
+                        log_throttled(logger, logging.WARNING, ("ws_rejected", client_id),
+                                      "Rejected non-JSON WebSocket message from %s", client_id)
+                        continue
                     
                     # Обрабатываем WebSocket сообщения
                     if message.get("type") == "ping":
+                        self.liveness.seen_ping(client_id)
                         await self.connection_manager.send_personal_message({
                             "type": "pong",
                             "timestamp": time.time()
                         }, client_id)
                     
+                    elif message.get("type") == "gamepad_data":
+                        # Тот же путь, что и POST /gamepad_data, без HTTP-запроса на пакет
+                        try:
+                            data = GamepadInputData(**message.get("data", {}))
+                            data.client_id = client_id
+                            _WS_DECODE.observe_since(start)
+                            await self._ingest_gamepad_data(data, "ws", start, time.perf_counter())
+                        except ValidationError as e:
+                            FRAMES_REJECTED.labels("ws", "invalid").inc()
+                            log_throttled(logger, logging.WARNING, ("ws_rejected", client_id),
+                                          "Rejected WebSocket gamepad data from %s: %s", client_id, e)
+                        except HTTPException as e:
+                            log_throttled(logger, logging.WARNING, ("ws_rejected", client_id),
+                                          "Rejected WebSocket gamepad data from %s: %s", client_id, e.detail)
+                    
                     # Другие типы сообщений...
                     
             except WebSocketDisconnect:
-                self.connection_manager.disconnect(client_id)
-                # Удаляем клиента
+                pass
+            finally:
+                # Обрыв соединения владельца (или ошибка в цикле) паркует клиента
+                if self.connection_manager.disconnect(client_id, websocket) and owner:
+                    await self.suspend(client_id)
+    
+    def _require_admin(self, request: Request) -> None:
+        """Доступ к служебным эндпоинтам: по токену или только с localhost"""
+        if settings.admin_token:
+            token = request.headers.get("x-admin-token", "")
+            auth = request.headers.get("authorization", "")
+            if auth.lower().startswith("bearer "):
+                token = auth[7:].strip()
+            if not hmac.compare_digest(token.encode(), settings.admin_token.encode()):
+                raise HTTPException(status_code=403, detail="Admin token required")
+            return
+        
+        host = request.client.host if request.client else ""
+        try:
+            loopback = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise HTTPException(status_code=403, detail="Admin endpoints are available from localhost only")
+    
+    async def _serve_asset(self, request: Request) -> Response:
+        """Главная страница и ресурсы клиента (с ETag и сжатием)"""
+        if request.url.path == "/" and "/" not in self.assets.urls:
+            return HTMLResponse("<h1>RemoteGamepad Server</h1><p>Template not found</p>")
+        return self.assets.response(request.url.path, request)
+    
+    async def _local_ip(self) -> str:
+        """Локальный IP для QR кода (определяется один раз, вне цикла событий)"""
+        if self._qr_host is None:
+            import socket
+            loop = asyncio.get_running_loop()
+            self._qr_host = await loop.run_in_executor(None, lambda: socket.gethostbyname(socket.gethostname()))
+        return self._qr_host
+    
+    async def connect(self, client_info: dict) -> ConnectionResponse:
+        """Регистрация клиента и выдача ему геймпада (или возобновление его сессии)"""
+        try:
+            if client_info.get("resume_token"):
+                resumed = await self._resume(client_info)
+                if resumed is not None:
+                    return resumed
+            
+            # Генерируем ID клиента
+            client_id = await self.client_manager.generate_client_id(
+                client_info.get("ip_address", "unknown")
+            )
+            
+            # Получаем profile_name
+            profile_name = client_info.get("profile_name", "Guest")
+            logger.debug("Client info received: %s", client_info)
+            
+            # Создаем информацию о клиенте
+            client = ClientInfo(
+                client_id=client_id,
+                ip_address=client_info.get("ip_address", "unknown"),
+                user_agent=client_info.get("user_agent", "unknown"),
+                connected_at=time.time(),
+                status=ClientStatus.CONNECTING,
+                profile_name=profile_name
+            )
+            
+            # Co-pilot: клиент может присоединиться к существующему геймпаду
+            # (номер проверяется до регистрации, чтобы не занимать место клиента)
+            join_gamepad_id = parse_gamepad_id(client_info.get("gamepad_id"))
+            
+            # Добавляем клиента
+            if not await self.client_manager.add_client(client):
+                if not self.client_manager.admits(client.ip_address):
+                    raise HTTPException(
+                        status_code=429,
+                        detail="Cannot connect - too many clients from this address"
+                    )
+                raise HTTPException(
+                    status_code=503,
+                    detail="Cannot connect - server full"
+                )
+            
+            try:
+                if join_gamepad_id is not None:
+                    # Привязываем клиента к чужому геймпаду
+                    joined = await self.gamepad_manager.bind_client(client_id, join_gamepad_id)
+                    gamepad_id = join_gamepad_id if joined else None
+                else:
+                    # Создаем геймпад для клиента
+                    gamepad_id = await self.gamepad_manager.create_gamepad(client_id)
+                
+                if not gamepad_id:
+                    raise HTTPException(
+                        status_code=503, 
+                        detail="Cannot create gamepad - limit reached"
+                        if join_gamepad_id is None else "Cannot join gamepad - not found or full"
+                    )
+                
+                await self.client_manager.assign_gamepad(client_id, gamepad_id)
+                # Отсчет молчания - с момента подключения
+                self.liveness.seen_frame(client_id)
+                
+                # Обновляем статус на CONNECTED
+                await self.client_manager.update_client_status(client_id, ClientStatus.CONNECTED)
+                
+                return ConnectionResponse(
+                    success=True,
+                    client_id=client_id,
+                    gamepad_id=gamepad_id,
+                    message="Connected successfully",
+                    resume_token=self.sessions.issue(client_id) if self.sessions.enabled else None
+                )
+            except Exception:
+                # Клиент без геймпада не должен занимать место (геймпад освобождается с ним)
                 await self.client_manager.remove_client(client_id)
+                raise
+                
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error connecting client: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    async def _resume(self, client_info: dict) -> Optional[ConnectionResponse]:
+        """
+        Возобновление сессии по client_id и токену
+        
+        Клиент получает тот же client_id и геймпад; None - сессии нет
+        (истекла или токен неверный), и клиент подключается заново.
+        """
+        client_id = client_info.get("client_id")
+        if not client_id or not self.sessions.resume(client_id, client_info.get("resume_token")):
+            return None
+        
+        client = await self.client_manager.get_client(client_id)
+        gamepad_id = await self.gamepad_manager.get_gamepad_for_client(client_id)
+        if client is None or gamepad_id is None:
+            self.sessions.drop(client_id)
+            return None
+        
+        if profile_name := client_info.get("profile_name"):
+            await self.client_manager.update_client_profile(client_id, profile_name)
+        await self.client_manager.update_client_status(client_id, ClientStatus.CONNECTED)
+        self.connection_manager.retire(client_id)
+        self.liveness.seen_frame(client_id)
+        logger.info(f"Client {client_id} resumed session on gamepad {gamepad_id}")
+        
+        return ConnectionResponse(
+            success=True,
+            client_id=client_id,
+            gamepad_id=gamepad_id,
+            message="Session resumed",
+            resume_token=self.sessions.token_of(client_id),
+            resumed=True
+        )
+    
+    async def suspend(self, client_id: str, resume_token: Optional[str] = None) -> bool:
+        """
+        Парковка клиента: ввод в нейтраль, геймпад и client_id сохраняются
+        
+        С токеном - по запросу клиента (/suspend), без токена - при обрыве
+        WebSocket. Если сессии выключены, клиент удаляется сразу.
+        """
+        if resume_token is not None and not self.sessions.verify(client_id, resume_token):
+            return False
+        if await self.client_manager.get_client(client_id) is None:
+            return False
+        if not self.sessions.park(client_id):
+            return await self.client_manager.remove_client(client_id)
+        
+        await self.client_manager.update_client_status(client_id, ClientStatus.PARKED)
+        await self.gamepad_manager.park_client(client_id)
+        # Припаркованный клиент не отслеживается до возобновления (_resume)
+        self.liveness.forget(client_id)
+        if self.gyro_aim:
+            self.gyro_aim.reset(client_id)
+        return True
+    
+    async def _sweep_loop(self) -> None:
+        """Периодический обход живости клиентов"""
+        while True:
+            await asyncio.sleep(settings.liveness_sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Liveness sweep failed: {e}")
+    
+    async def sweep(self) -> Tuple[int, int]:
+        """
+        Один обход живости, возвращает (припарковано, удалено)
+        
+        Молчащие дольше client_idle_timeout клиенты паркуются, а клиенты
+        с истекшей сессией или оставшиеся в статусе DISCONNECTED/ERROR
+        удаляются пачкой: геймпады освобождаются за один захват блокировки.
+        """
+        now = time.monotonic()
+        clients = self.client_manager
+        evict = self.sessions.expired(now)
+        for status in (ClientStatus.DISCONNECTED, ClientStatus.ERROR):
+            evict.extend(client.client_id for client in await clients.get_clients_by_status(status))
+        
+        park = []
+        for client_id in self.liveness.idle(now):
+            client = await clients.get_client(client_id)
+            if client is None or client.status == ClientStatus.PARKED or client_id in evict:
+                continue
+            # Без возобновляемых сессий молчащий клиент удаляется сразу
+            (park if self.sessions.enabled else evict).append(client_id)
+        
+        for client_id in park:
+            await self.suspend(client_id)
+        removed = 0
+        if evict:
+            await self.gamepad_manager.release_clients(evict)
+            removed = await clients.remove_clients(evict)
+        
+        if park:
+            CLIENTS_SWEPT.labels("parked").inc(len(park))
+            logger.info(f"Parked {len(park)} idle clients")
+        if removed:
+            CLIENTS_SWEPT.labels("removed").inc(removed)
+        return len(park), removed
+    
+    async def _ingest_gamepad_data(self, data: GamepadInputData, transport: str = "http",
+                                   received: Optional[float] = None, decoded: Optional[float] = None) -> None:
+        """
+        Применение пакета ввода клиента (общий путь HTTP и WebSocket)
+        
+        received - perf_counter() получения кадра, decoded - окончания разбора:
+        от них считаются задержка до последней записи в устройство
+        (rg_input_to_write_seconds) и стадии трассировки кадра.
+        """
+        client_id = data.client_id
+        if not client_id:
+            FRAMES_REJECTED.labels(transport, "no_client_id").inc()
+            raise HTTPException(status_code=400, detail="Client ID required")
+        FRAMES_RECEIVED.labels(client_id, transport).inc()
+        
+        # Получаем геймпад для клиента
+        gamepad_id = await self.gamepad_manager.get_gamepad_for_client(client_id)
+        if not gamepad_id:
+            FRAMES_REJECTED.labels(transport, "no_gamepad").inc()
+            raise HTTPException(status_code=404, detail="Gamepad not found for client")
+        if self.sessions.is_parked(client_id):
+            # Припаркованный геймпад остается в нейтрали до возобновления сессии
+            FRAMES_REJECTED.labels(transport, "parked").inc()
+            raise HTTPException(status_code=409, detail="Session parked")
+        self.liveness.seen_frame(client_id)
+        
+        if received is None:
+            await self._apply_gamepad_data(client_id, gamepad_id, data)
+            return
+        
+        trace = self.tracer.begin(client_id, transport, received, decoded, data.timestamp)
+        try:
+            await self._apply_gamepad_data(client_id, gamepad_id, data)
+        except BaseException:
+            self.tracer.abandon(trace)
+            raise
+        self.tracer.finish(trace)
+        _INPUT_TO_WRITE[transport].observe_since(received)
+    
+    async def _apply_gamepad_data(self, client_id: str, gamepad_id: int, data: GamepadInputData) -> None:
+        """События геймпада из пакета ввода"""
+        # Обрабатываем события осей
+        if data.type == "axis" and data.axes:
+            axes_data = data.axes
+            
+            # Левый и правый стик
+            for stick, codes in ((axes_data.left_stick, _LEFT_STICK), (axes_data.right_stick, _RIGHT_STICK)):
+                if not stick:
+                    continue
+                for axis, value in stick.items():
+                    axis_code = codes.get(axis)
+                    if axis_code is None:
+                        continue
+                    event = GamepadEvent(
+                        client_id=client_id,
+                        event_type=GamepadEventType.AXIS_MOVE,
+                        axis_code=axis_code,
+                        value=float(value),
+                        timestamp=time.time()
+                    )
+                    await self.gamepad_manager.send_event(gamepad_id, event)
+        
+        # Обрабатываем события кнопок
+        if data.buttons:
+            for button in data.buttons:
+                # Кнопка "храповика" гироприцела не уходит в геймпад
+                if self.gyro_aim and button.name == settings.gyro_ratchet_button:
+                    self.gyro_aim.set_ratchet(client_id, button.pressed)
+                    continue
+                
+                # Имя кнопки -> код контрола (крестовина обрабатывается ниже целиком)
+                control = GamepadControl.parse(button.name)
+                if control is None:
+                    continue
+                
+                # Проверяем, является ли это триггером
+                if control.is_trigger:
+                    # Триггеры обрабатываем как оси
+                    event = GamepadEvent(
+                        client_id=client_id,
+                        event_type=GamepadEventType.AXIS_MOVE,
+                        axis_code=control,
+                        value=button.pressed,  # True/False для триггеров
+                        timestamp=time.time()
+                    )
+
+                else:
+                    # Обычные кнопки
+                    event_type = GamepadEventType.BUTTON_PRESS if button.pressed else GamepadEventType.BUTTON_RELEASE
+                    event = GamepadEvent(
+                        client_id=client_id,
+                        event_type=event_type,
+                        button_code=control,
+                        value=button.value,
+                        timestamp=time.time()
+                    )
+                
+                await self.gamepad_manager.send_event(gamepad_id, event)
+        
+        # Обрабатываем D-PAD события
+        if data.buttons:
+            # Собираем D-PAD кнопки
+            dpad_buttons = {btn.name: btn.pressed for btn in data.buttons if btn.name.startswith('Dpad')}
+            
+            if dpad_buttons:
+                # Вычисляем D-PAD координаты как в старом коде
+                dpad_x = (1 if dpad_buttons.get('Dpad_Right', False) else 0) - (1 if dpad_buttons.get('Dpad_Left', False) else 0)
+                dpad_y = (1 if dpad_buttons.get('Dpad_Up', False) else 0) - (1 if dpad_buttons.get('Dpad_Down', False) else 0)
+                
+                # Инвертируем Y как в старом коде
+                dpad_y = dpad_y * -1
+                
+                # Отправляем D-PAD событие
+                dpad_event = GamepadEvent(
+                    client_id=client_id,
+                    event_type=GamepadEventType.DPAD,
+                    axis_code=GamepadControl.DPAD,
+                    value_x=dpad_x,
+                    value_y=dpad_y,
+                    timestamp=time.time()
+                )
+                await self.gamepad_manager.send_event(gamepad_id, dpad_event)
+    
+    async def _handle_binary_frame(self, client_id: str, data: bytes) -> None:
+        """Обработка бинарного WebSocket кадра"""
+        if not data:
+            return
+        
+        if data[0] == MOTION_FRAME_TYPE:
+            FRAMES_RECEIVED.labels(client_id, "ws_binary").inc()
+            start = time.perf_counter()
+            try:
+                batch = decode_motion_frame(data)
+            except ValueError as e:
+                FRAMES_REJECTED.labels("ws_binary", "invalid").inc()
+                log_throttled(logger, logging.WARNING, ("bad_frame", client_id),
+                              "Bad motion frame from %s: %s", client_id, e)
+                return
+            _WS_BINARY_DECODE.observe_since(start)
+            
+            gamepad_id = await self.gamepad_manager.get_gamepad_for_client(client_id)
+            if gamepad_id and not self.sessions.is_parked(client_id):
+                self.liveness.seen_frame(client_id)
+                trace = self.tracer.begin(client_id, "ws_binary", start, time.perf_counter())
+                try:
+                    await self.gamepad_manager.send_motion_batch(gamepad_id, batch)
+                    if self.gyro_aim:
+                        await self._apply_gyro_aim(client_id, gamepad_id, batch)
+                except BaseException:
+                    self.tracer.abandon(trace)
+                    raise
+                self.tracer.finish(trace)
+                _INPUT_TO_WRITE["ws_binary"].observe_since(start)
+        else:
+            FRAMES_REJECTED.labels("ws_binary", "unknown_type").inc()
+            log_throttled(logger, logging.WARNING, ("bad_frame", client_id),
+                          "Unknown binary frame type %s from %s", data[0], client_id)
+    
+    async def _apply_gyro_aim(self, client_id: str, gamepad_id: int, batch) -> None:
+        """Гироприцел: пачка движения -> правый стик через обычный путь осей"""
+        output = self.gyro_aim.process(client_id, batch)
+        if output is None:
+            return
+        
+        # Гироприцел пишет отдельным источником и сливается со стиком клиента
+        source_id = self._gyro_sources.get(client_id)
+        if source_id is None:
+            source_id = await self.gamepad_manager.attach_aux_source(client_id, "gyro")
+            if source_id is None:
+                return
+            self._gyro_sources[client_id] = source_id
+        
+        now = time.time()
+        for axis_code, value in ((GamepadControl.AXIS_RX, output[0]), (GamepadControl.AXIS_RY, output[1])):
+            event = GamepadEvent(
+                client_id=source_id,
+                event_type=GamepadEventType.AXIS_MOVE,
+                axis_code=axis_code,
+                value=value,
+                timestamp=now
+            )
+            await self.gamepad_manager.send_event(gamepad_id, event)
     
     def _setup_event_handlers(self):
         """Настройка обработчиков событий"""
@@ -456,10 +939,18 @@ class FastAPIServer:
         
         async def on_client_disconnected(client_info: ClientInfo):
             """Обработчик отключения клиента"""
-            # Удаляем геймпад клиента
-            gamepad_id = await self.gamepad_manager.get_gamepad_for_client(client_info.client_id)
-            if gamepad_id:
-                await self.gamepad_manager.remove_gamepad(gamepad_id)
+            # Отвязываем клиента, геймпад удаляется вместе с последним клиентом
+            await self.gamepad_manager.release_client(client_info.client_id)
+            self._gyro_sources.pop(client_info.client_id, None)
+            for transport in TRANSPORTS:
+                FRAMES_RECEIVED.remove(client_info.client_id, transport)
+            self.tracer.forget(client_info.client_id)
+            self.sessions.drop(client_info.client_id)
+            self.liveness.forget(client_info.client_id)
+            forget_log_key(("ws_rejected", client_info.client_id))
+            forget_log_key(("bad_frame", client_info.client_id))
+            if self.gyro_aim:
+                self.gyro_aim.reset(client_info.client_id)
             
             await self.connection_manager.broadcast({
                 "type": WebSocketMessageType.CLIENT_DISCONNECTED,
@@ -468,8 +959,24 @@ class FastAPIServer:
                 }
             })
         
-        self.event_bus.subscribe_client("client_connected", on_client_connected)
-        self.event_bus.subscribe_client("client_disconnected", on_client_disconnected)
+        # Рассылка по WebSocket не должна задерживать подключение клиента
+        self.event_bus.subscribe_client(
+            Topic.CLIENT_CONNECTED, on_client_connected,
+            mode=DeliveryMode.QUEUED,
+            overflow=OverflowPolicy.DROP_OLDEST
+        )
+        self.event_bus.subscribe_client(Topic.CLIENT_DISCONNECTED, on_client_disconnected)
+        
+        if settings.server.debug:
+            async def log_gamepad_states(states: dict):
+                """Отладочный лог состояния геймпадов раз в секунду"""
+                for gamepad_id, state in states.items():
+                    if state is None:
+                        logger.debug(f"Gamepad {gamepad_id} state: removed")
+                    else:
+                        logger.debug(f"Gamepad {gamepad_id} state: buttons={state.buttons} axes={state.axes}")
+            
+            self.event_bus.subscribe_gamepad_sampled(log_gamepad_states, rate_hz=1.0)
     
     async def start(self) -> bool:
         """Запуск сервера"""
@@ -0,0 +1,80 @@
+"""
+Микробенчмарк EventBus
+
+Запуск:
+    python -m src.bench.event_bus [--iterations N]
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable, List, Tuple
+
+from ..core.events import EventBus
+from ..core.metrics import MetricsRegistry
+from ..utils.types import GamepadControl, GamepadEvent, GamepadEventType, Topic
+
+
+async def _noop(event: GamepadEvent) -> None:
+    return None
+
+
+def _make_handlers(count: int) -> List[Callable]:
+    """Отдельные функции-обработчики (множество не схлопывает одинаковые)"""
+    handlers = []
+    for _ in range(count):
+        async def handler(event: GamepadEvent) -> None:
+            return None
+        handlers.append(handler)
+    return handlers
+
+
+async def _measure(bus: EventBus, event_type: Topic, event: GamepadEvent, iterations: int) -> float:
+    """Среднее время одного emit_gamepad в наносекундах"""
+    emit = bus.emit_gamepad
+    # Прогрев
+    for _ in range(min(iterations, 1000)):
+        await emit(event_type, event)
+
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        await emit(event_type, event)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def run(iterations: int) -> List[Tuple[str, float]]:
+    """Замер отправки при разном числе подписчиков"""
+    event = GamepadEvent(
+        client_id="bench",
+        event_type=GamepadEventType.AXIS_MOVE,
+        axis_code=GamepadControl.AXIS_LX,
+        value=0.5,
+        timestamp=time.time()
+    )
+    results = []
+
+    for count in (0, 1, 3):
+        bus = EventBus(metrics=MetricsRegistry())
+        for handler in _make_handlers(count):
+            bus.subscribe_gamepad(Topic.AXIS_MOVE, handler)
+        ns = await _measure(bus, Topic.AXIS_MOVE, event, iterations)
+        results.append((f"{count} handler(s)", ns))
+
+    bus = EventBus(metrics=MetricsRegistry())
+    bus.subscribe_gamepad(Topic.AXIS_MOVE, _noop)
+    bus.subscribe_all(lambda event_type, data: _noop(data))
+    results.append(("1 handler + global", await _measure(bus, Topic.AXIS_MOVE, event, iterations)))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EventBus micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for name, ns in asyncio.run(run(args.iterations)):
+        print(f"emit_gamepad, {name:<20} {ns:9.1f} ns/op  {1e9 / ns:12,.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Общие части сквозных бенчмарков: процесс сервера, HTTP-клиент, метрики
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..api.control import ControlClient
+from ..config.settings import settings
+
+HOST = "127.0.0.1"
+READY_TIMEOUT = 15.0
+
+_SAMPLE_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$")
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+# Выборки /metrics: (имя, отсортированные метки) -> значение
+MetricSamples = Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]
+
+
+class HttpConnection:
+    """Минимальный HTTP/1.1 клиент с keep-alive (не добавляет своего веса к замеру)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._host = host
+
+    @classmethod
+    async def open(cls, port: int, host: str = HOST) -> "HttpConnection":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self._host}\r\n"
+        if body:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self._writer.write(head.encode() + b"\r\n" + body)
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        return status, await self._reader.readexactly(length)
+
+    async def post(self, path: str, body: bytes) -> Tuple[int, bytes]:
+        return await self.request("POST", path, body)
+
+    async def get(self, path: str) -> Tuple[int, bytes]:
+        return await self.request("GET", path)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Перцентиль по отсортированной выборке (q в долях)"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class ServerProcess:
+    """Процесс сервера, запущенный бенчмарком"""
+
+    def __init__(self, process: asyncio.subprocess.Process, control: ControlClient, port: int) -> None:
+        self.process = process
+        self.control = control
+        self.port = port
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+
+@asynccontextmanager
+async def spawn_server(port: int, **env_overrides: str) -> AsyncIterator[ServerProcess]:
+    """
+    Сервер в отдельном процессе с устройствами без uinput
+
+    Переменные окружения RG_* передаются именованными аргументами;
+    по умолчанию RG_DEVICE_BACKEND=null и свой управляющий сокет.
+    """
+    workdir = tempfile.mkdtemp(prefix="rg-bench-")
+    env = dict(
+        os.environ,
+        RG_DEVICE_BACKEND="null",
+        RG_CONTROL_SOCKET=str(Path(workdir) / "control.sock"),
+        RG_STATUS_SHM=f"rg_bench_status_{os.getpid()}",
+        RG_LOG_NAME="bench",
+    )
+    env.update(env_overrides)
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "src.api.process", "--host", HOST, "--port", str(port),
+        cwd=str(settings.project_root), env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    control = ControlClient(Path(env["RG_CONTROL_SOCKET"]))
+    try:
+        deadline = time.monotonic() + READY_TIMEOUT
+        while not await control.ping():
+            if process.returncode is not None or time.monotonic() > deadline:
+                raise RuntimeError("Server process did not start")
+            await asyncio.sleep(0.1)
+        yield ServerProcess(process, control, port)
+    finally:
+        try:
+            await control.request("shutdown")
+            await asyncio.wait_for(process.wait(), 5.0)
+        except Exception:
+            process.kill()
+            await process.wait()
+
+
+def parse_metrics(text: str) -> MetricSamples:
+    """Разбор текстового формата Prometheus"""
+    samples: MetricSamples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_LINE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        key = tuple(sorted(_LABEL.findall(labels or "")))
+        samples[(name, key)] = float(value)
+    return samples
+
+
+async def scrape_metrics(port: int, host: str = HOST) -> Optional[MetricSamples]:
+    """Снимок /metrics сервера (None, если метрики выключены)"""
+    conn = await HttpConnection.open(port, host)
+    try:
+        status, body = await conn.get("/metrics")
+    finally:
+        conn.close()
+    return parse_metrics(body.decode()) if status == 200 else None
+
+
+def metric_sum(samples: MetricSamples, name: str, **labels: str) -> float:
+    """Сумма выборок метрики с заданными метками (остальные метки любые)"""
+    total = 0.0
+    for (sample_name, sample_labels), value in samples.items():
+        if sample_name == name and all((k, v) in sample_labels for k, v in labels.items()):
+            total += value
+    return total
+
+
+def histogram_quantile(before: MetricSamples, after: MetricSamples, name: str, q: float,
+                       **labels: str) -> Optional[float]:
+    """
+    Квантиль гистограммы за интервал между двумя снимками
+
+    Как histogram_quantile в PromQL: линейная интерполяция внутри корзины.
+    """
+    buckets: Dict[float, float] = {}
+    for (sample_name, sample_labels), value in after.items():
+        if sample_name != f"{name}_bucket":
+            continue
+        label_dict = dict(sample_labels)
+        if any(label_dict.get(k) != v for k, v in labels.items()):
+            continue
+        le = float(label_dict["le"])
+        buckets[le] = buckets.get(le, 0.0) + value - before.get((sample_name, sample_labels), 0.0)
+
+    if not buckets:
+        return None
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]]
+    if total <= 0:
+        return None
+
+    rank = q * total
+    lower, below = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return lower
+            if count == below:
+                return bound
+            return lower + (bound - lower) * (rank - below) / (count - below)
+        lower, below = bound, count
+    return lower
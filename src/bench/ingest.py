@@ -0,0 +1,135 @@
+"""
+Бенчмарк путей ввода: стандартный asyncio против uvloop
+
+Для каждого типа цикла запускается отдельный процесс сервера с устройствами
+без uinput (RG_DEVICE_BACKEND=null), к нему подключаются клиенты и шлют
+пакеты осей через POST /gamepad_data и через WebSocket. Нагрузка идет из
+процесса бенчмарка на одном и том же цикле, меняется только цикл сервера.
+
+Запуск:
+    python -m src.bench.ingest [--clients N] [--requests N] [--rounds N] [--loops asyncio uvloop]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+import websockets
+
+from ..core import runtime
+from .harness import HOST, HttpConnection, percentile, spawn_server
+
+
+def _axis_packet(i: int) -> Dict:
+    """Пакет левого стика с меняющимся значением (каждый пакет меняет состояние)"""
+    value = ((i % 200) - 100) / 100.0
+    return {"type": "axis", "axes": {"left_stick": {"x": value, "y": -value}, "right_stick": {"x": 0.0, "y": 0.0}}}
+
+
+async def _connect_clients(port: int, count: int) -> List[str]:
+    conn = await HttpConnection.open(port)
+    try:
+        client_ids = []
+        for i in range(count):
+            status, body = await conn.post("/connect", json.dumps({"profile_name": f"bench-{i}"}).encode())
+            if status != 200:
+                raise RuntimeError(f"/connect failed: {status} {body[:200]!r}")
+            client_ids.append(json.loads(body)["client_id"])
+        return client_ids
+    finally:
+        conn.close()
+
+
+async def _http_worker(port: int, client_id: str, requests: int, latencies: List[float]) -> None:
+    conn = await HttpConnection.open(port)
+    try:
+        for i in range(requests):
+            body = json.dumps({**_axis_packet(i), "client_id": client_id}).encode()
+            start = time.perf_counter()
+            status, _ = await conn.post("/gamepad_data", body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"/gamepad_data failed: {status}")
+    finally:
+        conn.close()
+
+
+async def _ws_worker(port: int, client_id: str, messages: int) -> None:
+    async with websockets.connect(f"ws://{HOST}:{port}/ws/{client_id}") as ws:
+        for i in range(messages):
+            await ws.send(json.dumps({"type": "gamepad_data", "data": _axis_packet(i)}))
+        # Сообщения соединения обрабатываются по порядку: pong приходит после всех пакетов
+        await ws.send(json.dumps({"type": "ping"}))
+        while json.loads(await ws.recv()).get("type") != "pong":
+            pass
+
+
+async def _run_load(port: int, clients: int, requests: int) -> Dict[str, float]:
+    client_ids = await _connect_clients(port, clients)
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_http_worker(port, cid, requests, latencies) for cid in client_ids))
+    http_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_ws_worker(port, cid, requests) for cid in client_ids))
+    ws_elapsed = time.perf_counter() - start
+
+    total = clients * requests
+    return {
+        "http_rps": total / http_elapsed,
+        "http_p50_ms": statistics.median(latencies) * 1000,
+        "http_p99_ms": percentile(latencies, 0.99) * 1000,
+        "ws_mps": total / ws_elapsed,
+    }
+
+
+async def _bench_loop(kind: str, port: int, clients: int, requests: int) -> Dict[str, float]:
+    """Замер одного типа цикла в отдельном процессе сервера"""
+    async with spawn_server(port, RG_EVENT_LOOP=kind, RG_MAX_GAMEPADS=str(clients)):
+        return await _run_load(port, clients, requests)
+
+
+async def run(loops: List[str], clients: int, requests: int, port: int, rounds: int = 3) -> Dict[str, Dict[str, float]]:
+    """Медианы по раундам; циклы чередуются, чтобы прогрев не давал преимущества одному"""
+    if "uvloop" in loops and not runtime.uvloop_available():
+        print("uvloop is not installed, skipping")
+        loops = [kind for kind in loops if kind != "uvloop"]
+
+    samples: Dict[str, List[Dict[str, float]]] = {kind: [] for kind in loops}
+    for _ in range(rounds):
+        for kind in loops:
+            samples[kind].append(await _bench_loop(kind, port, clients, requests))
+
+    return {
+        kind: {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        for kind, runs in samples.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest path benchmark: asyncio vs uvloop")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000, help="packets per client and path")
+    parser.add_argument("--loops", nargs="+", default=["asyncio", "uvloop"], choices=["asyncio", "uvloop"])
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.loops, args.clients, args.requests, args.port, args.rounds))
+
+    print(f"{'loop':<8} {'POST req/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'WS msg/s':>10}")
+    for kind, r in results.items():
+        print(f"{kind:<8} {r['http_rps']:11,.0f} {r['http_p50_ms']:8.2f} {r['http_p99_ms']:8.2f} {r['ws_mps']:10,.0f}")
+
+    if "asyncio" in results and "uvloop" in results:
+        base, fast = results["asyncio"], results["uvloop"]
+        print(f"uvloop speedup: POST x{fast['http_rps'] / base['http_rps']:.2f}, "
+              f"WS x{fast['ws_mps'] / base['ws_mps']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
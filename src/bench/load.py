@@ -0,0 +1,495 @@
+"""
+Нагрузочный генератор: N телефонов подключаются и шлют ввод
+
+Каждый виртуальный телефон делает POST /connect, открывает транспорт и
+с заданной частотой отправляет трассу стиков и кнопок в том же виде, что
+static/script.js: кадр уходит, если состояние изменилось или прошло
+KEEPALIVE_INTERVAL с последней отправки. Для ws_binary отправляются кадры
+датчиков движения. Сценарий churn повторяет обработку visibilitychange
+в браузере: телефон "сворачивается" (POST /suspend, закрытие сокета),
+а затем возобновляет сессию через /connect с токеном.
+
+Транспорты замеряются по очереди, чтобы время CPU сервера относилось к
+одному из них. Задержка "вход - запись" берется из гистограммы сервера
+rg_input_to_write_seconds, время CPU - из process_cpu_seconds_total;
+для HTTP дополнительно меряется время ответа на стороне клиента.
+
+Запуск:
+    python -m src.bench.load [--clients N] [--rate HZ] [--duration S]
+                             [--transports http ws ws_binary] [--scenario steady|churn]
+                             [--url http://host:port]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Type
+from urllib.parse import urlparse
+
+import websockets
+
+from ..core.motion import MOTION_FRAME_TYPE, MOTION_FRAME_VERSION, MOTION_HEADER, MOTION_SAMPLE
+from .harness import (
+    HOST, HttpConnection, MetricSamples, histogram_quantile, metric_sum, percentile,
+    scrape_metrics, spawn_server
+)
+
+# Как в static/script.js: повтор неизменного состояния раз в keepaliveInterval мс
+KEEPALIVE_INTERVAL = 1.0
+# и отправка накопленных сэмплов датчиков раз в motionFlushInterval мс
+MOTION_FLUSH_INTERVAL = 0.05
+
+# Кнопки в порядке индексов Gamepad API (buttonMap в static/script.js)
+BUTTONS = (
+    "BtnA", "BtnB", "BtnX", "BtnY", "BtnShoulderL", "BtnShoulderR", "TriggerL", "TriggerR",
+    "BtnBack", "BtnStart", "BtnThumbL", "BtnThumbR", "Dpad_Up", "Dpad_Down", "Dpad_Left", "Dpad_Right",
+)
+
+LATENCY_METRIC = "rg_input_to_write_seconds"
+
+
+class PhoneTrace:
+    """
+    Правдоподобный ввод одного телефона
+
+    Стики плавно движутся (сумма синусоид с разной фазой) и иногда
+    отпускаются в центр; кнопки нажимаются случайно и удерживаются
+    80-250 мс. Значения округлены, как у Gamepad API, поэтому в покое
+    кадры повторяются и отсекаются проверкой изменений.
+    """
+
+    def __init__(self, seed: int) -> None:
+        self._rng = random.Random(seed)
+        self._phase = [self._rng.uniform(0, math.tau) for _ in range(4)]
+        self._speed = [self._rng.uniform(0.3, 1.5) for _ in range(4)]
+        self._idle_until = 0.0
+        self._active_until = 0.0
+        self._released_at: Dict[int, float] = {}
+
+    def _stick(self, index: int, t: float) -> float:
+        value = math.sin(self._phase[index] + t * self._speed[index] * math.tau)
+        value += 0.2 * math.sin(self._phase[index] * 3 + t * 5.3)
+        return round(max(-1.0, min(1.0, value)), 2)
+
+    def frame(self, t: float) -> Dict:
+        """Состояние геймпада в момент t секунд от начала"""
+        if t >= self._active_until and t >= self._idle_until:
+            # Чередование: 1-4 с движения, затем 0.2-1.5 с стики в покое
+            self._idle_until = t + self._rng.uniform(0.2, 1.5)
+            self._active_until = self._idle_until + self._rng.uniform(1.0, 4.0)
+
+        idle = t < self._idle_until
+        axes = [0.0 if idle else self._stick(i, t) for i in range(4)]
+
+        for index in list(self._released_at):
+            if t >= self._released_at[index]:
+                del self._released_at[index]
+        # В среднем ~2 нажатия в секунду при 60 Гц опроса
+        if self._rng.random() < 0.035:
+            self._released_at[self._rng.randrange(len(BUTTONS))] = t + self._rng.uniform(0.08, 0.25)
+
+        return {
+            "type": "axis",
+            "axes": {
+                "left_stick": {"x": axes[0], "y": axes[1]},
+                "right_stick": {"x": axes[2], "y": axes[3]},
+            },
+            "buttons": [
+                {"name": name, "pressed": index in self._released_at,
+                 "value": 1.0 if index in self._released_at else 0.0, "index": index}
+                for index, name in enumerate(BUTTONS)
+            ],
+        }
+
+    def motion_frame(self, t: float, samples: int) -> bytes:
+        """Бинарный кадр датчиков движения (формат core.motion)"""
+        parts = [MOTION_HEADER.pack(MOTION_FRAME_TYPE, MOTION_FRAME_VERSION, samples)]
+        for i in range(samples):
+            ts = t + i / (samples * 20)
+            parts.append(MOTION_SAMPLE.pack(
+                ts * 1000.0,
+                0.3 * math.sin(ts * 2.0), 9.8 + 0.1 * math.sin(ts * 7.0), 0.2 * math.cos(ts * 3.0),
+                40.0 * math.sin(self._phase[0] + ts * 4.0), 30.0 * math.cos(self._phase[1] + ts * 3.0), 5.0,
+            ))
+        return b"".join(parts)
+
+
+@dataclass
+class Endpoint:
+    """Адрес сервера (или шарда, выданного /connect)"""
+    host: str
+    port: int
+
+    @classmethod
+    def parse(cls, url: str) -> "Endpoint":
+        parsed = urlparse(url)
+        return cls(parsed.hostname or HOST, parsed.port or 80)
+
+
+@dataclass
+class LoadStats:
+    """Результаты одного транспорта (по всем телефонам)"""
+    frames: int = 0
+    skipped_ticks: int = 0
+    errors: int = 0
+    connects: int = 0
+    resumes: int = 0
+    disconnects: int = 0
+    rtt: List[float] = field(default_factory=list)
+    connect_time: List[float] = field(default_factory=list)
+
+
+class Transport:
+    """Способ доставки кадров ввода одного телефона"""
+    name = ""
+
+    def __init__(self, endpoint: Endpoint, client_id: str, stats: LoadStats) -> None:
+        self.endpoint = endpoint
+        self.client_id = client_id
+        self.stats = stats
+
+    async def open(self) -> None:
+        pass
+
+    async def send(self, trace: PhoneTrace, t: float) -> bool:
+        """Отправка кадра в момент t (False - состояние не изменилось, кадр не нужен)"""
+        raise NotImplementedError
+
+    async def drain(self) -> None:
+        """Ожидание обработки отправленных кадров сервером"""
+
+    async def close(self) -> None:
+        pass
+
+
+class _StateTransport(Transport):
+    """Кадры состояния геймпада с проверкой изменений, как checkForChanges()"""
+
+    def __init__(self, endpoint: Endpoint, client_id: str, stats: LoadStats) -> None:
+        super().__init__(endpoint, client_id, stats)
+        self._last: Optional[Dict] = None
+        self._last_sent = -KEEPALIVE_INTERVAL
+
+    async def send(self, trace: PhoneTrace, t: float) -> bool:
+        data = trace.frame(t)
+        if data == self._last and t - self._last_sent < KEEPALIVE_INTERVAL:
+            return False
+        self._last, self._last_sent = data, t
+        await self.send_state(data)
+        return True
+
+    async def send_state(self, data: Dict) -> None:
+        raise NotImplementedError
+
+
+class HttpTransport(_StateTransport):
+    """POST /gamepad_data на соединении keep-alive"""
+    name = "http"
+
+    async def open(self) -> None:
+        self._conn = await HttpConnection.open(self.endpoint.port, self.endpoint.host)
+
+    async def send_state(self, data: Dict) -> None:
+        body = json.dumps({**data, "client_id": self.client_id, "timestamp": time.time() * 1000}).encode()
+        start = time.perf_counter()
+        status, _ = await self._conn.post("/gamepad_data", body)
+        self.stats.rtt.append(time.perf_counter() - start)
+        if status != 200:
+            self.stats.errors += 1
+
+    async def close(self) -> None:
+        self._conn.close()
+
+
+class _WebSocketTransport(Transport):
+    async def open(self) -> None:
+        url = f"ws://{self.endpoint.host}:{self.endpoint.port}/ws/{self.client_id}"
+        self._ws = await websockets.connect(url)
+
+    async def drain(self) -> None:
+        # Сообщения соединения обрабатываются по порядку: pong приходит после всех кадров
+        await self._ws.send(json.dumps({"type": "ping"}))
+        while json.loads(await self._ws.recv()).get("type") != "pong":
+            pass
+
+    async def close(self) -> None:
+        await self._ws.close()
+
+
+class WebSocketTransport(_WebSocketTransport, _StateTransport):
+    """JSON-сообщения gamepad_data по WebSocket"""
+    name = "ws"
+
+    async def send_state(self, data: Dict) -> None:
+        await self._ws.send(json.dumps({"type": "gamepad_data", "data": {**data, "timestamp": time.time() * 1000}}))
+
+
+class MotionTransport(_WebSocketTransport):
+    """Бинарные кадры датчиков движения по WebSocket"""
+    name = "ws_binary"
+    samples_per_frame = 3  # 60 Гц датчиков, отправка раз в motionFlushInterval (50 мс)
+
+    def __init__(self, endpoint: Endpoint, client_id: str, stats: LoadStats) -> None:
+        super().__init__(endpoint, client_id, stats)
+        self._last_sent = -MOTION_FLUSH_INTERVAL
+
+    async def send(self, trace: PhoneTrace, t: float) -> bool:
+        if t - self._last_sent < MOTION_FLUSH_INTERVAL:
+            return False
+        self._last_sent = t
+        await self._ws.send(trace.motion_frame(t, self.samples_per_frame))
+        return True
+
+
+# Новый транспорт: подкласс Transport с уникальным name
+TRANSPORTS: Dict[str, Type[Transport]] = {
+    cls.name: cls for cls in (HttpTransport, WebSocketTransport, MotionTransport)
+}
+
+
+@dataclass
+class Scenario:
+    """Параметры нагрузки"""
+    clients: int = 8
+    rate: float = 60.0  # тиков опроса в секунду на телефон
+    duration: float = 10.0
+    churn: bool = False
+    visible_time: float = 3.0  # среднее время до сворачивания (churn)
+    hidden_time: Tuple[float, float] = (0.2, 1.5)
+
+
+async def _connect(server: Endpoint, index: int, stats: LoadStats,
+                   session: Optional[Tuple[str, str]] = None) -> Tuple[str, Endpoint, Optional[str]]:
+    """Подключение или возобновление сессии (session = (client_id, resume_token))"""
+    conn = await HttpConnection.open(server.port, server.host)
+    try:
+        start = time.perf_counter()
+        request = {
+            "ip_address": server.host,
+            "user_agent": f"rg-load/{index}",
+            "profile_name": f"load-{index}",
+        }
+        if session:
+            request["client_id"], request["resume_token"] = session
+        body = json.dumps(request).encode()
+        status, response = await conn.post("/connect", body)
+        stats.connect_time.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+    if status != 200:
+        raise RuntimeError(f"/connect failed: {status} {response[:200]!r}")
+    data = json.loads(response)
+    if not data.get("success"):
+        raise RuntimeError(f"/connect rejected: {data.get('message')}")
+    if data.get("resumed"):
+        stats.resumes += 1
+    else:
+        stats.connects += 1
+    # При шардированном вводе данные идут напрямую в шард
+    endpoint = Endpoint.parse(data["endpoint"]) if data.get("endpoint") else server
+    return data["client_id"], endpoint, data.get("resume_token")
+
+
+async def _suspend(endpoint: Endpoint, client_id: str, token: str) -> None:
+    conn = await HttpConnection.open(endpoint.port, endpoint.host)
+    try:
+        await conn.post("/suspend", json.dumps({"client_id": client_id, "resume_token": token}).encode())
+    finally:
+        conn.close()
+
+
+async def _disconnect(endpoint: Endpoint, client_id: str, stats: LoadStats) -> None:
+    conn = await HttpConnection.open(endpoint.port, endpoint.host)
+    try:
+        await conn.post("/disconnect", json.dumps({"client_id": client_id}).encode())
+        stats.disconnects += 1
+    finally:
+        conn.close()
+
+
+async def _phone(server: Endpoint, index: int, transport_cls: Type[Transport],
+                 scenario: Scenario, stats: LoadStats, deadline: float) -> None:
+    """Один телефон: подключение, поток кадров, сворачивания (churn)"""
+    rng = random.Random(index)
+    trace = PhoneTrace(index)
+    period = 1.0 / scenario.rate
+    epoch = time.perf_counter()
+
+    session: Optional[Tuple[str, str]] = None
+    while time.perf_counter() < deadline:
+        client_id, endpoint, token = await _connect(server, index, stats, session)
+        transport = transport_cls(endpoint, client_id, stats)
+        await transport.open()
+
+        hide_at = (time.perf_counter() + rng.expovariate(1.0 / scenario.visible_time)
+                   if scenario.churn else deadline)
+        next_tick = time.perf_counter()
+        try:
+            while (now := time.perf_counter()) < min(deadline, hide_at):
+                if await transport.send(trace, now - epoch):
+                    stats.frames += 1
+                next_tick += period
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # Отстали от графика: пропускаем тики, а не шлем пачкой
+                    missed = int(-delay / period)
+                    stats.skipped_ticks += missed
+                    next_tick += missed * period
+            await transport.drain()
+        finally:
+            await transport.close()
+
+        if scenario.churn and token and time.perf_counter() < deadline:
+            # visibilitychange -> hidden: suspendSession(), затем возврат на вкладку
+            await _suspend(endpoint, client_id, token)
+            await asyncio.sleep(rng.uniform(*scenario.hidden_time))
+            session = (client_id, token)
+            if time.perf_counter() < deadline:
+                continue
+        await _disconnect(endpoint, client_id, stats)
+
+
+def _report_row(transport: str, stats: LoadStats, elapsed: float, idle_cpu: float,
+                before: Optional[MetricSamples], after: Optional[MetricSamples]) -> Dict[str, Optional[float]]:
+    row: Dict[str, Optional[float]] = {
+        "frames": stats.frames,
+        "fps": stats.frames / elapsed,
+        "errors": stats.errors,
+        "skipped_ticks": stats.skipped_ticks,
+        "connects": stats.connects,
+        "resumes": stats.resumes,
+        "disconnects": stats.disconnects,
+        "connect_p99_ms": percentile(stats.connect_time, 0.99) * 1000 if stats.connect_time else None,
+        "rtt_p50_ms": percentile(stats.rtt, 0.5) * 1000 if stats.rtt else None,
+        "rtt_p99_ms": percentile(stats.rtt, 0.99) * 1000 if stats.rtt else None,
+        "cpu_us_per_frame": None,
+    }
+    for q, key in ((0.5, "p50_ms"), (0.99, "p99_ms"), (0.999, "p999_ms")):
+        value = histogram_quantile(before, after, LATENCY_METRIC, q, transport=transport) if after else None
+        row[key] = value * 1000 if value is not None else None
+
+    if before and after:
+        written = (metric_sum(after, f"{LATENCY_METRIC}_count", transport=transport)
+                   - metric_sum(before, f"{LATENCY_METRIC}_count", transport=transport))
+        cpu = metric_sum(after, "process_cpu_seconds_total") - metric_sum(before, "process_cpu_seconds_total")
+        # Фоновая работа сервера без нагрузки не относится к кадрам
+        cpu = max(0.0, cpu - idle_cpu * elapsed)
+        row["written"] = written
+        if written:
+            row["cpu_us_per_frame"] = cpu / written * 1e6
+    return row
+
+
+async def _scrape(endpoints: List[Endpoint]) -> Optional[MetricSamples]:
+    """Сумма /metrics сервера и его шардов (у каждого процесса свои метрики)"""
+    merged: Optional[MetricSamples] = None
+    for endpoint in endpoints:
+        samples = await scrape_metrics(endpoint.port, endpoint.host)
+        if samples is None:
+            continue
+        merged = merged or {}
+        for key, value in samples.items():
+            merged[key] = merged.get(key, 0.0) + value
+    return merged
+
+
+async def idle_cpu_rate(endpoints: List[Endpoint], window: float = 1.0) -> float:
+    """Доля CPU, которую сервер тратит без нагрузки (секунды CPU в секунду)"""
+    before = await _scrape(endpoints)
+    await asyncio.sleep(window)
+    after = await _scrape(endpoints)
+    if not before or not after:
+        return 0.0
+    return (metric_sum(after, "process_cpu_seconds_total") - metric_sum(before, "process_cpu_seconds_total")) / window
+
+
+async def run_transport(server: Endpoint, transport: str, scenario: Scenario, idle_cpu: float = 0.0,
+                        metrics_endpoints: Optional[List[Endpoint]] = None) -> Dict[str, Optional[float]]:
+    """Нагрузка одним транспортом и сводка по ней"""
+    metrics_endpoints = metrics_endpoints or [server]
+    stats = LoadStats()
+    before = await _scrape(metrics_endpoints)
+    start = time.perf_counter()
+    deadline = start + scenario.duration
+    await asyncio.gather(*(
+        _phone(server, i, TRANSPORTS[transport], scenario, stats, deadline)
+        for i in range(scenario.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    after = await _scrape(metrics_endpoints)
+    return _report_row(transport, stats, elapsed, idle_cpu, before, after)
+
+
+async def run(transports: List[str], scenario: Scenario, url: Optional[str] = None,
+              port: int = 5098, shards: int = 0) -> Dict[str, Dict[str, Optional[float]]]:
+    """Прогон по транспортам против запущенного сервера (url) или своего процесса"""
+    results = {}
+    if url:
+        server = Endpoint.parse(url)
+        idle_cpu = await idle_cpu_rate([server])
+        for transport in transports:
+            results[transport] = await run_transport(server, transport, scenario, idle_cpu)
+        return results
+
+    async with spawn_server(
+        port,
+        RG_METRICS="1",
+        RG_MAX_GAMEPADS=str(scenario.clients),
+        RG_MAX_CLIENTS=str(scenario.clients * 2),
+        RG_SHARDS=str(shards),
+    ):
+        server = Endpoint(HOST, port)
+        # Шарды слушают следующие порты (shard_base_port по умолчанию)
+        endpoints = [server] + [Endpoint(HOST, port + 1 + i) for i in range(shards if shards > 1 else 0)]
+        idle_cpu = await idle_cpu_rate(endpoints)
+        for transport in transports:
+            results[transport] = await run_transport(server, transport, scenario, idle_cpu, endpoints)
+    return results
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else "-"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetic multi-client load generator")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=60.0, help="input polls per second per client")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per transport")
+    parser.add_argument("--transports", nargs="+", default=list(TRANSPORTS), choices=list(TRANSPORTS))
+    parser.add_argument("--scenario", choices=["steady", "churn"], default="steady")
+    parser.add_argument("--visible-time", type=float, default=3.0, help="mean seconds before a client hides (churn)")
+    parser.add_argument("--url", help="existing server (default: spawn one with the null device backend)")
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--shards", type=int, default=0, help="RG_SHARDS for the spawned server")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    scenario = Scenario(
+        clients=args.clients, rate=args.rate, duration=args.duration,
+        churn=args.scenario == "churn", visible_time=args.visible_time,
+    )
+    results = asyncio.run(run(args.transports, scenario, args.url, args.port, args.shards))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.clients} clients, {args.rate:g} Hz, {args.duration:g}s per transport, {args.scenario}")
+    print(f"{'transport':<10} {'frames/s':>9} {'CPU us/fr':>10} {'p50 ms':>7} {'p99 ms':>7} {'p999 ms':>8} "
+          f"{'RTT p99':>8} {'errors':>6} {'skipped':>7} {'conn':>5} {'resume':>6}")
+    for transport, r in results.items():
+        print(f"{transport:<10} {r['fps']:9,.0f} {_fmt(r['cpu_us_per_frame'], '10.1f')} "
+              f"{_fmt(r['p50_ms'], '7.3f')} {_fmt(r['p99_ms'], '7.3f')} {_fmt(r['p999_ms'], '8.3f')} "
+              f"{_fmt(r['rtt_p99_ms'], '8.3f')} {r['errors']:6d} {r['skipped_ticks']:7d} {r['connects']:5d} {r['resumes']:6d}")
+    print("p50/p99/p999: server-side input-to-write latency (rg_input_to_write_seconds); "
+          "CPU excludes the idle baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Микробенчмарки стадий конвейера ввода с бюджетами
+
+Каждая стадия замеряется отдельно: разбор кадра, создание события,
+GamepadManagerImpl.send_event, EventBus.emit_* и запись в устройство без
+uinput (RG_DEVICE_BACKEND=null). Для стадии печатаются ns/op, ops/s и
+память на операцию по tracemalloc: пик выделенного за одну операцию и
+сколько остается после нее (утечки, растущие кэши).
+
+Бюджеты лежат в budgets.json рядом с модулем; если стадия медленнее или
+выделяет больше бюджета, процесс завершается с кодом 1. После намеренного
+изменения бюджеты переписываются из замера с запасом (--write-budgets).
+
+Запуск:
+    python -m src.bench.stages [--only PREFIX ...] [--iterations N] [--rounds N]
+                               [--budgets FILE] [--write-budgets] [--headroom X] [--json]
+"""
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..api.models import GamepadInputData
+from ..config.settings import settings
+from ..core.events import EventBus
+from ..core.metrics import MetricsRegistry
+from ..core.gamepad_manager import GamepadManagerImpl, VirtualGamepadDevice
+from ..core.motion import (
+    MOTION_FRAME_TYPE, MOTION_FRAME_VERSION, MOTION_HEADER, MOTION_SAMPLE, MotionSensorDevice,
+    decode_motion_frame
+)
+from ..utils.types import ClientInfo, ClientStatus, GamepadControl, GamepadEvent, GamepadEventType, Topic
+
+BUDGETS_FILE = Path(__file__).with_name("budgets.json")
+
+# Операция стадии: синхронная функция или корутина без аргументов
+Op = Callable[[], Any]
+Setup = Callable[[], Awaitable[Op]]
+
+# Кадр в том виде, в каком его шлет static/script.js
+FRAME = json.dumps({
+    "type": "axis",
+    "client_id": "bench",
+    "timestamp": 1700000000000,
+    "axes": {"left_stick": {"x": 0.25, "y": -0.5}, "right_stick": {"x": 0.0, "y": 0.75}},
+    "buttons": [
+        {"name": name, "pressed": name == "BtnA", "value": 1.0 if name == "BtnA" else 0.0, "index": index}
+        for index, name in enumerate((
+            "BtnA", "BtnB", "BtnX", "BtnY", "BtnShoulderL", "BtnShoulderR", "TriggerL", "TriggerR",
+            "BtnBack", "BtnStart", "BtnThumbL", "BtnThumbR", "Dpad_Up", "Dpad_Down", "Dpad_Left", "Dpad_Right",
+        ))
+    ],
+})
+
+MOTION_FRAME = MOTION_HEADER.pack(MOTION_FRAME_TYPE, MOTION_FRAME_VERSION, 3) + b"".join(
+    MOTION_SAMPLE.pack(float(i), 0.1, 9.8, 0.2, 10.0, -5.0, 1.0) for i in range(3)
+)
+
+
+@dataclass
+class StageResult:
+    """Замер одной стадии"""
+    name: str
+    ns_per_op: float
+    peak_bytes_per_op: float
+    retained_bytes_per_op: float
+
+    @property
+    def ops_per_sec(self) -> float:
+        return 1e9 / self.ns_per_op if self.ns_per_op else float("inf")
+
+
+class _Alternating:
+    """Чередование значений: каждая операция меняет состояние и доходит до записи"""
+
+    def __init__(self, *values: Any) -> None:
+        self._values = values
+        self._index = 0
+
+    def __call__(self) -> Any:
+        self._index = (self._index + 1) % len(self._values)
+        return self._values[self._index]
+
+
+# ---------- Стадии ----------
+
+async def _decode_input() -> Op:
+    # Путь WebSocket: текст -> dict -> модель
+    def op() -> None:
+        GamepadInputData(**json.loads(FRAME))
+    return op
+
+
+async def _decode_input_json() -> Op:
+    # Разбор и проверка одним вызовом pydantic
+    def op() -> None:
+        GamepadInputData.model_validate_json(FRAME)
+    return op
+
+
+async def _decode_motion() -> Op:
+    def op() -> None:
+        decode_motion_frame(MOTION_FRAME)
+    return op
+
+
+async def _construct_event() -> Op:
+    def op() -> None:
+        GamepadEvent(
+            client_id="bench",
+            event_type=GamepadEventType.AXIS_MOVE,
+            axis_code=GamepadControl.AXIS_LX,
+            value=0.5,
+            timestamp=time.time()
+        )
+    return op
+
+
+async def _manager(event_bus: Optional[EventBus] = None) -> Tuple[GamepadManagerImpl, int]:
+    manager = GamepadManagerImpl(event_bus or EventBus())
+    gamepad_id = await manager.create_gamepad("bench")
+    if gamepad_id is None:
+        raise RuntimeError("Failed to create a gamepad with the null device backend")
+    return manager, gamepad_id
+
+
+async def _send_event_axis() -> Op:
+    manager, gamepad_id = await _manager()
+    events = _Alternating(*(
+        GamepadEvent(client_id="bench", event_type=GamepadEventType.AXIS_MOVE, axis_code=GamepadControl.AXIS_LX, value=v)
+        for v in (0.25, -0.25)
+    ))
+
+    async def op() -> None:
+        await manager.send_event(gamepad_id, events())
+    return op
+
+
+async def _send_event_button() -> Op:
+    manager, gamepad_id = await _manager()
+    events = _Alternating(*(
+        GamepadEvent(client_id="bench", event_type=event_type, button_code=GamepadControl.BTN_A)
+        for event_type in (GamepadEventType.BUTTON_PRESS, GamepadEventType.BUTTON_RELEASE)
+    ))
+
+    async def op() -> None:
+        await manager.send_event(gamepad_id, events())
+    return op
+
+
+async def _send_event_coalesced() -> Op:
+    # Повтор того же значения: слияние отбрасывает событие до записи
+    manager, gamepad_id = await _manager()
+    event = GamepadEvent(client_id="bench", event_type=GamepadEventType.AXIS_MOVE, axis_code=GamepadControl.AXIS_LX, value=0.5)
+    await manager.send_event(gamepad_id, event)
+
+    async def op() -> None:
+        await manager.send_event(gamepad_id, event)
+    return op
+
+
+async def _emit_gamepad() -> Op:
+    bus = EventBus(metrics=MetricsRegistry())
+
+    async def handler(event: GamepadEvent) -> None:
+        return None
+
+    bus.subscribe_gamepad(Topic.AXIS_MOVE, handler)
+    event = GamepadEvent(client_id="bench", event_type=GamepadEventType.AXIS_MOVE, axis_code=GamepadControl.AXIS_LX, value=0.5)
+
+    async def op() -> None:
+        await bus.emit_gamepad(Topic.AXIS_MOVE, event)
+    return op
+
+
+async def _emit_gamepad_no_listeners() -> Op:
+    bus = EventBus(metrics=MetricsRegistry())
+    event = GamepadEvent(client_id="bench", event_type=GamepadEventType.AXIS_MOVE, axis_code=GamepadControl.AXIS_LX, value=0.5)
+
+    async def op() -> None:
+        await bus.emit_gamepad(Topic.AXIS_MOVE, event)
+    return op
+
+
+async def _emit_client() -> Op:
+    bus = EventBus(metrics=MetricsRegistry())
+
+    async def handler(client: ClientInfo) -> None:
+        return None
+
+    bus.subscribe_client(Topic.CLIENT_STATUS_CHANGED, handler)
+    client = ClientInfo("bench", "127.0.0.1", "bench", time.time(), ClientStatus.CONNECTED)
+
+    async def op() -> None:
+        await bus.emit_client(Topic.CLIENT_STATUS_CHANGED, client)
+    return op
+
+
+async def _device_axis() -> Op:
+    device = VirtualGamepadDevice(0)
+    await device.create()
+    values = _Alternating(16383, -16383)
+    code = 0  # ABS_X
+
+    async def op() -> None:
+        await device.send_axis_event(code, values())
+    return op
+
+
+async def _device_motion() -> Op:
+    device = MotionSensorDevice(0, "bench")
+    await device.create()
+    batch = decode_motion_frame(MOTION_FRAME)
+
+    async def op() -> None:
+        await device.send_batch(batch)
+    return op
+
+
+STAGES: Dict[str, Setup] = {
+    "decode.gamepad_input": _decode_input,
+    "decode.gamepad_input_json": _decode_input_json,
+    "decode.motion_frame": _decode_motion,
+    "event.construct": _construct_event,
+    "manager.send_event.axis": _send_event_axis,
+    "manager.send_event.button": _send_event_button,
+    "manager.send_event.coalesced": _send_event_coalesced,
+    "bus.emit_gamepad": _emit_gamepad,
+    "bus.emit_gamepad.no_listeners": _emit_gamepad_no_listeners,
+    "bus.emit_client": _emit_client,
+    "device.write_axis": _device_axis,
+    "device.write_motion": _device_motion,
+}
+
+
+# ---------- Замер ----------
+
+async def _timed(op: Op, is_async: bool, iterations: int) -> float:
+    """Время iterations операций в наносекундах"""
+    if is_async:
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            await op()
+        return time.perf_counter_ns() - start
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        op()
+    return time.perf_counter_ns() - start
+
+
+async def _allocations(op: Op, is_async: bool, iterations: int) -> Tuple[float, float]:
+    """Пик выделенного за одну операцию и прирост памяти на операцию (байты)"""
+    # В пик входят и объекты самого вызова (корутина op), одинаковые для всех стадий
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(min(iterations, 200)):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            if is_async:
+                await op()
+            else:
+                op()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        await _timed(op, is_async, iterations)
+        gc.collect()
+        retained = (tracemalloc.get_traced_memory()[0] - before) / iterations
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks), max(0.0, retained)
+
+
+async def measure(name: str, iterations: int, rounds: int) -> StageResult:
+    """Замер стадии: медиана времени по раундам и память по tracemalloc"""
+    op = await STAGES[name]()
+    is_async = inspect.iscoroutinefunction(op)
+
+    # Прогрев: кэши, дочерние метрики, специализация байткода
+    await _timed(op, is_async, min(iterations, 2000))
+
+    gc.disable()
+    try:
+        times = [await _timed(op, is_async, iterations) / iterations for _ in range(rounds)]
+    finally:
+        gc.enable()
+
+    peak, retained = await _allocations(op, is_async, iterations)
+    return StageResult(name, statistics.median(times), peak, retained)
+
+
+async def run(names: List[str], iterations: int, rounds: int) -> List[StageResult]:
+    """Замер стадий по очереди"""
+    settings.device_backend = "null"
+    return [await measure(name, iterations, rounds) for name in names]
+
+
+# ---------- Бюджеты ----------
+
+def load_budgets(path: Path) -> Dict[str, Dict[str, float]]:
+    """Бюджеты стадий: имя -> {ns_per_op, peak_bytes_per_op, retained_bytes_per_op}"""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def check_budgets(results: List[StageResult], budgets: Dict[str, Dict[str, float]]) -> List[str]:
+    """Превышения бюджетов (пустой список - все в пределах)"""
+    failures = []
+    for result in results:
+        budget = budgets.get(result.name)
+        if not budget:
+            continue
+        for key, limit in budget.items():
+            value = getattr(result, key)
+            if value > limit:
+                failures.append(f"{result.name}: {key} {value:.1f} > budget {limit:.1f}")
+    return failures
+
+
+def write_budgets(path: Path, results: List[StageResult], headroom: float,
+                  budgets: Dict[str, Dict[str, float]]) -> None:
+    """Бюджеты из замера с запасом (остальные стадии сохраняются как были)"""
+    for result in results:
+        budgets[result.name] = {
+            "ns_per_op": round(result.ns_per_op * headroom),
+            # Выделения почти не зависят от машины: запас меньше, но не меньше 64 байт
+            "peak_bytes_per_op": round(max(result.peak_bytes_per_op * 1.25, result.peak_bytes_per_op + 64)),
+            "retained_bytes_per_op": round(max(result.retained_bytes_per_op * 2, 16)),
+        }
+    path.write_text(json.dumps(dict(sorted(budgets.items())), indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-stage input pipeline micro-benchmarks with budgets")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="stages whose names start with PREFIX")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budgets", type=Path, default=BUDGETS_FILE)
+    parser.add_argument("--write-budgets", action="store_true", help="store measured values (with headroom) as budgets")
+    parser.add_argument("--headroom", type=float, default=3.0, help="time budget multiplier for --write-budgets")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    names = [name for name in STAGES if not args.only or any(name.startswith(p) for p in args.only)]
+    if not names:
+        parser.error(f"No stages match {args.only}")
+
+    results = asyncio.run(run(names, args.iterations, args.rounds))
+    budgets = load_budgets(args.budgets)
+
+    if args.json:
+        print(json.dumps([{**asdict(r), "ops_per_sec": r.ops_per_sec} for r in results], indent=2))
+    else:
+        print(f"{'stage':<32} {'ns/op':>9} {'ops/s':>12} {'peak B/op':>10} {'kept B/op':>10} {'budget ns':>10}")
+        for r in results:
+            budget = budgets.get(r.name, {}).get("ns_per_op")
+            print(f"{r.name:<32} {r.ns_per_op:9.0f} {r.ops_per_sec:12,.0f} {r.peak_bytes_per_op:10.0f} "
+                  f"{r.retained_bytes_per_op:10.1f} {budget if budget is not None else '-':>10}")
+
+    if args.write_budgets:
+        write_budgets(args.budgets, results, args.headroom, budgets)
+        print(f"Budgets written to {args.budgets}")
+        return
+
+    failures = check_budgets(results, budgets)
+    for failure in failures:
+        print(f"OVER BUDGET {failure}", file=sys.stderr)
+    missing = [name for name in names if name not in budgets]
+    if missing:
+        print(f"No budget for: {', '.join(missing)}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 Настройки приложения
 """
 import os
+import tempfile
 from pathlib import Path
 from typing import Optional
 from dataclasses import dataclass, field
@@ -32,13 +33,61 @@ class AppSettings:
     pin_code: Optional[str] = None
     allowed_ips: list[str] = field(default_factory=list)
     session_timeout: int = 3600  # секунды
+    # Сколько секунд геймпад ушедшего клиента ждет возобновления сессии (0 - удалять сразу)
+    session_resume_grace: float = 30.0
+    # Клиент без кадров и ping дольше этого времени паркуется (0 - не проверять)
+    client_idle_timeout: float = 30.0
+    liveness_sweep_interval: float = 2.0  # период обхода живости, секунды
+    # Токен служебных эндпоинтов (/admin/*); без токена они доступны только с localhost
+    admin_token: Optional[str] = None
     
     # Виртуальные геймпады
     max_gamepads: int = 4
     gamepad_name_template: str = "RemoteGamepad-{id}"
+    max_clients_per_gamepad: int = 2  # 1 - без co-pilot режима
+    gamepad_axis_merge: str = "max_magnitude"  # max_magnitude | priority
+    enable_motion_sensors: bool = True
+    device_backend: str = "uinput"  # uinput | null (без устройств, для бенчмарков)
+    gamepad_id_offset: int = 0  # Смещение номеров геймпадов (у каждого шарда свое)
+    
+    # Гироприцел (движение телефона -> правый стик)
+    gyro_aim_enabled: bool = False
+    gyro_sensitivity: float = 1.0
+    gyro_max_rate: float = 360.0  # °/с для полного отклонения
+    gyro_deadzone: float = 2.0  # °/с
+    gyro_curve: float = 1.0
+    gyro_ratchet_button: str = "GyroRatchet"
+    
+    # Кольцевой буфер событий в разделяемой памяти
+    shm_event_ring: bool = False
+    shm_event_ring_name: str = "remotegamepad_events"
+    shm_event_ring_capacity: int = 4096
+    
+    # Процесс сервера: управление через Unix-сокет и снимок статуса
+    control_socket: Path = field(default_factory=lambda: Path(
+        os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    ) / "remotegamepad.sock")
+    status_shm_name: str = "remotegamepad_status"
+    status_shm_size: int = 65536
+    
+    # Цикл событий: auto (uvloop, если установлен) | uvloop | asyncio
+    event_loop: str = "auto"
+    
+    # Шардирование ввода: N процессов-шардов со своими геймпадами и циклами,
+    # основной процесс только распределяет клиентов (0 или 1 - без шардов)
+    ingest_shards: int = 0
+    shard_base_port: int = 0  # 0 - порт сервера + 1
+    
+    # Метрики конвейера ввода (/metrics в формате Prometheus)
+    metrics_enabled: bool = True
+    
+    # Трассировка задержек кадров по стадиям (/admin/latency, вкладка в GUI)
+    frame_tracing: bool = True
+    trace_slow_frames: int = 64  # размер кольца медленных кадров
     
     # Логирование
     log_file: str = "remoteGamepad.log"
+    log_name: str = ""  # Имя процесса в имени файла лога (server, shard0, ...)
     log_rotation: str = "1 MB"
     log_retention: int = 10  # файлов
     
@@ -65,6 +114,12 @@ class AppSettings:
         if debug := os.getenv("RG_DEBUG"):
             self.server.debug = debug.lower() in ("true", "1", "yes")
         
+        if max_clients := os.getenv("RG_MAX_CLIENTS"):
+            self.server.max_clients = int(max_clients)
+        
+        if per_ip := os.getenv("RG_MAX_CLIENTS_PER_IP"):
+            self.server.max_clients_per_ip = int(per_ip)
+        
         # Безопасность
         if pin := os.getenv("RG_PIN"):
             self.pin_code = pin
@@ -73,9 +128,81 @@ class AppSettings:
         if ips := os.getenv("RG_ALLOWED_IPS"):
             self.allowed_ips = [ip.strip() for ip in ips.split(",")]
         
+        if admin_token := os.getenv("RG_ADMIN_TOKEN"):
+            self.admin_token = admin_token
+        
+        if resume_grace := os.getenv("RG_RESUME_GRACE"):
+            self.session_resume_grace = float(resume_grace)
+        
+        if idle_timeout := os.getenv("RG_IDLE_TIMEOUT"):
+            self.client_idle_timeout = float(idle_timeout)
+        
+        if sweep_interval := os.getenv("RG_SWEEP_INTERVAL"):
+            self.liveness_sweep_interval = float(sweep_interval)
+        
         # Геймпады
         if max_pads := os.getenv("RG_MAX_GAMEPADS"):
             self.max_gamepads = int(max_pads)
+        
+        if per_pad := os.getenv("RG_MAX_CLIENTS_PER_GAMEPAD"):
+            self.max_clients_per_gamepad = int(per_pad)
+        
+        if axis_merge := os.getenv("RG_AXIS_MERGE"):
+            self.gamepad_axis_merge = axis_merge.lower()
+        
+        if motion := os.getenv("RG_MOTION"):
+            self.enable_motion_sensors = motion.lower() in ("true", "1", "yes")
+        
+        if backend := os.getenv("RG_DEVICE_BACKEND"):
+            self.device_backend = backend.lower()
+        
+        if id_offset := os.getenv("RG_GAMEPAD_ID_OFFSET"):
+            self.gamepad_id_offset = int(id_offset)
+        
+        # Разделяемая память
+        if shm := os.getenv("RG_SHM_EVENTS"):
+            self.shm_event_ring = shm.lower() in ("true", "1", "yes")
+        
+        if shm_name := os.getenv("RG_SHM_EVENTS_NAME"):
+            self.shm_event_ring_name = shm_name
+        
+        # Процесс сервера
+        if control := os.getenv("RG_CONTROL_SOCKET"):
+            self.control_socket = Path(control)
+        
+        if status_shm := os.getenv("RG_STATUS_SHM"):
+            self.status_shm_name = status_shm
+        
+        if loop := os.getenv("RG_EVENT_LOOP"):
+            self.event_loop = loop.lower()
+        
+        if shards := os.getenv("RG_SHARDS"):
+            self.ingest_shards = int(shards)
+        
+        if shard_port := os.getenv("RG_SHARD_BASE_PORT"):
+            self.shard_base_port = int(shard_port)
+        
+        if log_name := os.getenv("RG_LOG_NAME"):
+            self.log_name = log_name
+        
+        if metrics := os.getenv("RG_METRICS"):
+            self.metrics_enabled = metrics.lower() in ("true", "1", "yes")
+        
+        if tracing := os.getenv("RG_FRAME_TRACING"):
+            self.frame_tracing = tracing.lower() in ("true", "1", "yes")
+        
+        if slow_frames := os.getenv("RG_TRACE_SLOW_FRAMES"):
+            self.trace_slow_frames = int(slow_frames)
+        
+        # Гироприцел
+        if gyro := os.getenv("RG_GYRO_AIM"):
+            self.gyro_aim_enabled = gyro.lower() in ("true", "1", "yes")
+        
+        if gyro_sens := os.getenv("RG_GYRO_SENSITIVITY"):
+            self.gyro_sensitivity = float(gyro_sens)
+        
+        if ratchet := os.getenv("RG_GYRO_RATCHET"):
+            self.gyro_ratchet_button = ratchet
     
     def to_dict(self) -> dict:
         """Конвертация в словарь для сериализации"""
@@ -84,6 +211,7 @@ class AppSettings:
                 "host": self.server.host,
                 "port": self.server.port,
                 "max_clients": self.server.max_clients,
+                "max_clients_per_ip": self.server.max_clients_per_ip,
                 "debug": self.server.debug,
                 "log_level": self.server.log_level,
                 "pin_code": self.server.pin_code,
@@ -98,11 +226,50 @@ class AppSettings:
                 "require_pin": self.require_pin,
                 "pin_code": self.pin_code,
                 "allowed_ips": self.allowed_ips,
+                "admin_token_set": self.admin_token is not None,
                 "session_timeout": self.session_timeout,
+                "session_resume_grace": self.session_resume_grace,
+                "client_idle_timeout": self.client_idle_timeout,
+                "liveness_sweep_interval": self.liveness_sweep_interval,
             },
             "gamepads": {
                 "max_gamepads": self.max_gamepads,
                 "name_template": self.gamepad_name_template,
+                "max_clients_per_gamepad": self.max_clients_per_gamepad,
+                "axis_merge": self.gamepad_axis_merge,
+                "enable_motion_sensors": self.enable_motion_sensors,
+                "device_backend": self.device_backend,
+                "id_offset": self.gamepad_id_offset,
+            },
+            "shm_event_ring": {
+                "enabled": self.shm_event_ring,
+                "name": self.shm_event_ring_name,
+                "capacity": self.shm_event_ring_capacity,
+            },
+            "server_process": {
+                "control_socket": str(self.control_socket),
+                "status_shm_name": self.status_shm_name,
+                "status_shm_size": self.status_shm_size,
+                "event_loop": self.event_loop,
+                "ingest_shards": self.ingest_shards,
+                "shard_base_port": self.shard_base_port,
+                "metrics_enabled": self.metrics_enabled,
+                "frame_tracing": self.frame_tracing,
+                "trace_slow_frames": self.trace_slow_frames,
+            },
+            "gyro_aim": {
+                "enabled": self.gyro_aim_enabled,
+                "sensitivity": self.gyro_sensitivity,
+                "max_rate": self.gyro_max_rate,
+                "deadzone": self.gyro_deadzone,
+                "curve": self.gyro_curve,
+                "ratchet_button": self.gyro_ratchet_button,
+            },
+            "logging": {
+                "file": self.log_file,
+                "name": self.log_name,
+                "rotation": self.log_rotation,
+                "retention": self.log_retention,
             }
         }
 
@@ -4,25 +4,81 @@
 import time
 import asyncio
 import logging
-from typing import Dict, List, Optional
+from dataclasses import replace
+from types import MappingProxyType
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple
 from uuid import uuid4
 
-from ..utils.types import ClientInfo, ClientStatus, ClientManager as IClientManager
+from ..utils.types import ClientInfo, ClientStatus, Topic, ClientManager as IClientManager
 from ..core.events import EventBus
 
 logger = logging.getLogger(__name__)
 
 
 class ClientManagerImpl(IClientManager):
-    """Реализация менеджера клиентов"""
+    """
+    Реализация менеджера клиентов
     
-    def __init__(self, event_bus: EventBus, max_clients: int = 4) -> None:
-        self._clients: Dict[str, ClientInfo] = {}
+    Изменения выполняются под блокировкой без await внутри и публикуют новый
+    снимок: словарь, который после публикации не меняется, с копиями
+    ClientInfo. События рассылаются после выхода из критической секции,
+    поэтому подписчики (GUI, рассылка по WebSocket) не задерживают другие
+    операции с клиентами. Чтение берет текущий снимок без блокировки.
+    
+    Вторичные индексы (по IP, статусу и геймпаду) обновляются вместе со
+    снимком, поэтому выборки по ним, статистика и проверка лимита на IP
+    не обходят всех клиентов.
+    """
+    
+    def __init__(self, event_bus: EventBus, max_clients: int = 4, max_clients_per_ip: int = 0) -> None:
+        self._clients: Mapping[str, ClientInfo] = MappingProxyType({})
         self._event_bus = event_bus
         self._max_clients = max_clients
+        self._max_clients_per_ip = max_clients_per_ip
         self._lock = asyncio.Lock()
+        # Индексы: значение поля -> клиенты с этим значением
+        self._by_ip: Dict[str, Dict[str, ClientInfo]] = {}
+        self._by_status: Dict[ClientStatus, Dict[str, ClientInfo]] = {}
+        self._by_gamepad: Dict[int, Dict[str, ClientInfo]] = {}
         
-        logger.info(f"ClientManager initialized with max_clients={max_clients}")
+        logger.info(f"ClientManager initialized with max_clients={max_clients}, "
+                    f"max_clients_per_ip={max_clients_per_ip or 'unlimited'}")
+    
+    def _commit(self, clients: Dict[str, ClientInfo], old: Optional[ClientInfo] = None,
+                new: Optional[ClientInfo] = None) -> None:
+        """Публикация нового снимка и обновление индексов (вызывается под блокировкой)"""
+        self._clients = MappingProxyType(clients)
+        if old is not None:
+            self._unindex(self._by_ip, old.ip_address, old.client_id)
+            self._unindex(self._by_status, old.status, old.client_id)
+            if old.gamepad_id is not None:
+                self._unindex(self._by_gamepad, old.gamepad_id, old.client_id)
+        if new is not None:
+            self._by_ip.setdefault(new.ip_address, {})[new.client_id] = new
+            self._by_status.setdefault(new.status, {})[new.client_id] = new
+            if new.gamepad_id is not None:
+                self._by_gamepad.setdefault(new.gamepad_id, {})[new.client_id] = new
+    
+    @staticmethod
+    def _unindex(index: Dict, key: Hashable, client_id: str) -> None:
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(client_id, None)
+            if not bucket:
+                del index[key]
+    
+    def _update(self, client_id: str, **changes) -> Optional[Tuple[ClientInfo, ClientInfo]]:
+        """Замена клиента копией с изменениями (под блокировкой), возвращает (старый, новый)"""
+        old = self._clients.get(client_id)
+        if old is None:
+            return None
+        new = replace(old, **changes)
+        self._commit({**self._clients, client_id: new}, old, new)
+        return old, new
+    
+    def snapshot(self) -> Mapping[str, ClientInfo]:
+        """Текущий снимок клиентов (только для чтения)"""
+        return self._clients
     
     async def add_client(self, client_info: ClientInfo) -> bool:
         """Добавление нового клиента"""
@@ -32,137 +88,151 @@ class ClientManagerImpl(IClientManager):
                 logger.warning(f"Cannot add client {client_info.client_id}: max clients reached")
                 return False
             
+            if not self.admits(client_info.ip_address):
+                logger.warning(f"Cannot add client {client_info.client_id}: "
+                               f"too many clients from {client_info.ip_address}")
+                return False
+            
             # Проверяем, что клиент еще не подключен
             if client_info.client_id in self._clients:
                 logger.warning(f"Client {client_info.client_id} already connected")
                 return False
             
             # Добавляем клиента
-            client_info.connected_at = time.time()
-            client_info.status = ClientStatus.CONNECTED
-            self._clients[client_info.client_id] = client_info
-            
-            logger.info(f"Client connected: {client_info.client_id} from {client_info.ip_address}")
-            logger.info(f"Client profile_name: {getattr(client_info, 'profile_name', 'NOT SET')}")
-            logger.info(f"Client full info: {client_info}")
-            
-            # Отправляем событие
-            await self._event_bus.emit_client("client_connected", client_info)
-            
-            return True
+            client = replace(client_info, connected_at=time.time(), status=ClientStatus.CONNECTED)
+            self._commit({**self._clients, client.client_id: client}, new=client)
+        
+        logger.info(f"Client connected: {client.client_id} from {client.ip_address} "
+                    f"as {client.profile_name!r}")
+        logger.debug("Client full info: %s", client)
+        
+        # Отправляем событие
+        await self._event_bus.emit_client(Topic.CLIENT_CONNECTED, client)
+        return True
     
     async def remove_client(self, client_id: str) -> bool:
         """Удаление клиента"""
         async with self._lock:
-            if client_id not in self._clients:
-                logger.warning(f"Cannot remove client {client_id}: not found")
-                return False
-            
-            client_info = self._clients[client_id]
-            client_info.status = ClientStatus.DISCONNECTED
-            
-            # Отправляем событие перед удалением
-            await self._event_bus.emit_client("client_disconnected", client_info)
-            
-            del self._clients[client_id]
-            
-            logger.info(f"Client {client_id} removed from {client_info.ip_address}")
-            return True
+            removed = self._pop(client_id)
+        
+        if removed is None:
+            logger.warning(f"Cannot remove client {client_id}: not found")
+            return False
+        
+        await self._event_bus.emit_client(Topic.CLIENT_DISCONNECTED, removed)
+        logger.info(f"Client {client_id} removed from {removed.ip_address}")
+        return True
+    
+    async def remove_clients(self, client_ids: List[str]) -> int:
+        """Удаление нескольких клиентов за один захват блокировки (обход живости)"""
+        async with self._lock:
+            removed = [client for client in map(self._pop, client_ids) if client is not None]
+        
+        for client in removed:
+            await self._event_bus.emit_client(Topic.CLIENT_DISCONNECTED, client)
+        if removed:
+            logger.info(f"Removed {len(removed)} clients")
+        return len(removed)
+    
+    def _pop(self, client_id: str) -> Optional[ClientInfo]:
+        """Удаление из снимка (под блокировкой), возвращает клиента в статусе DISCONNECTED"""
+        client = self._clients.get(client_id)
+        if client is None:
+            return None
+        
+        clients = dict(self._clients)
+        del clients[client_id]
+        self._commit(clients, old=client)
+        return replace(client, status=ClientStatus.DISCONNECTED)
     
     async def get_clients(self) -> List[ClientInfo]:
         """Получение списка всех клиентов"""
-        async with self._lock:
-            return list(self._clients.values())
+        return list(self._clients.values())
     
     async def get_client(self, client_id: str) -> Optional[ClientInfo]:
         """Получение информации о конкретном клиенте"""
-        async with self._lock:
-            return self._clients.get(client_id)
+        return self._clients.get(client_id)
     
     async def update_client_status(self, client_id: str, status: ClientStatus) -> bool:
         """Обновление статуса клиента"""
         async with self._lock:
-            if client_id not in self._clients:
-                return False
-            
-            old_status = self._clients[client_id].status
-            self._clients[client_id].status = status
-            
-            if old_status != status:
-                logger.debug(f"Client {client_id} status changed: {old_status} -> {status}")
-                await self._event_bus.emit_client("client_status_changed", self._clients[client_id])
-            
-            return True
+            changed = self._update(client_id, status=status)
+        
+        if changed is None:
+            return False
+        
+        old, new = changed
+        if old.status != status:
+            logger.debug(f"Client {client_id} status changed: {old.status} -> {status}")
+            await self._event_bus.emit_client(Topic.CLIENT_STATUS_CHANGED, new)
+        return True
     
     async def assign_gamepad(self, client_id: str, gamepad_id: int) -> bool:
         """Привязка геймпада к клиенту"""
         async with self._lock:
-            if client_id not in self._clients:
-                return False
-            
-            self._clients[client_id].gamepad_id = gamepad_id
-            logger.info(f"Client {client_id} assigned to gamepad {gamepad_id}")
-            
-            await self._event_bus.emit_client("client_gamepad_assigned", self._clients[client_id])
-            return True
+            changed = self._update(client_id, gamepad_id=gamepad_id)
+        
+        if changed is None:
+            return False
+        
+        logger.info(f"Client {client_id} assigned to gamepad {gamepad_id}")
+        await self._event_bus.emit_client(Topic.CLIENT_GAMEPAD_ASSIGNED, changed[1])
+        return True
     
     async def update_client_profile(self, client_id: str, profile_name: str) -> bool:
         """Обновление профиля клиента"""
         async with self._lock:
-            if client_id not in self._clients:
-                logger.warning(f"Cannot update profile: client {client_id} not found")
-                return False
-            
-            old_name = getattr(self._clients[client_id], 'profile_name', None)
-            self._clients[client_id].profile_name = profile_name
-            
-            logger.info(f"Profile updated for client {client_id}: {old_name} -> {profile_name}")
-            
-            if old_name != profile_name:
-                logger.info(f"Client {client_id} profile name changed: {old_name} -> {profile_name}")
-                await self._event_bus.emit_client("client_profile_updated", self._clients[client_id])
-            
-            return True
+            changed = self._update(client_id, profile_name=profile_name)
+        
+        if changed is None:
+            logger.warning(f"Cannot update profile: client {client_id} not found")
+            return False
+        
+        old, new = changed
+        if old.profile_name != profile_name:
+            logger.info(f"Client {client_id} profile name changed: {old.profile_name} -> {profile_name}")
+            await self._event_bus.emit_client(Topic.CLIENT_PROFILE_UPDATED, new)
+        return True
     
     async def get_client_count(self) -> int:
         """Получение количества подключенных клиентов"""
-        async with self._lock:
-            return len(self._clients)
+        return len(self._clients)
     
     async def get_clients_by_status(self, status: ClientStatus) -> List[ClientInfo]:
         """Получение клиентов по статусу"""
-        async with self._lock:
-            return [client for client in self._clients.values() if client.status == status]
+        return list(self._by_status.get(status, {}).values())
     
-    async def cleanup_inactive_clients(self, timeout_seconds: int = 300) -> int:
-        """Очистка неактивных клиентов"""
-        current_time = time.time()
-        removed_count = 0
-        
-        async with self._lock:
-            inactive_clients = []
-            
-            for client_info in self._clients.values():
-                if (current_time - client_info.connected_at) > timeout_seconds:
-                    if client_info.status in [ClientStatus.DISCONNECTED, ClientStatus.ERROR]:
-                        inactive_clients.append(client_info.client_id)
-            
-            for client_id in inactive_clients:
-                if await self.remove_client(client_id):
-                    removed_count += 1
-        
-        if removed_count > 0:
-            logger.info(f"Cleaned up {removed_count} inactive clients")
-        
-        return removed_count
+    async def get_clients_by_ip(self, ip_address: str) -> List[ClientInfo]:
+        """Клиенты с одного адреса"""
+        return list(self._by_ip.get(ip_address, {}).values())
+    
+    async def get_clients_by_gamepad(self, gamepad_id: int) -> List[ClientInfo]:
+        """Клиенты, которым назначен геймпад"""
+        return list(self._by_gamepad.get(gamepad_id, {}).values())
+    
+    def status_counts(self) -> Dict[ClientStatus, int]:
+        """Количество клиентов по статусам (из индекса, без обхода клиентов)"""
+        return {status: len(bucket) for status, bucket in self._by_status.items()}
+    
+    def count_by_ip(self, ip_address: str) -> int:
+        """Количество клиентов с адреса"""
+        return len(self._by_ip.get(ip_address, ()))
+    
+    def admits(self, ip_address: str) -> bool:
+        """Есть ли место для еще одного клиента с адреса"""
+        return not self._max_clients_per_ip or self.count_by_ip(ip_address) < self._max_clients_per_ip
     
     async def cleanup_all_clients(self) -> int:
         """Очистка всех клиентов (при остановке сервера)"""
         async with self._lock:
             client_count = len(self._clients)
-            self._clients.clear()
-            logger.info(f"All {client_count} clients removed")
-            return client_count
+            self._commit({})
+            self._by_ip.clear()
+            self._by_status.clear()
+            self._by_gamepad.clear()
+        
+        logger.info(f"All {client_count} clients removed")
+        return client_count
     
     async def generate_client_id(self, ip_address: str) -> str:
         """Генерация уникального ID для клиента"""
@@ -170,30 +240,19 @@ class ClientManagerImpl(IClientManager):
         base_id = str(uuid4())[:8]
         
         # Проверяем уникальность
-        async with self._lock:
-            while base_id in self._clients:
-                base_id = str(uuid4())[:8]
+        while f"client_{base_id}" in self._clients:
+            base_id = str(uuid4())[:8]
         
         return f"client_{base_id}"
     
     def get_stats(self) -> Dict[str, int]:
         """Получение статистики клиентов"""
-        stats = {
+        by_status = self._by_status
+        return {
             "total": len(self._clients),
-            "connected": 0,
-            "active": 0,
-            "disconnected": 0,
-            "error": 0
+            "connected": len(by_status.get(ClientStatus.CONNECTED, ())),
+            "active": len(by_status.get(ClientStatus.ACTIVE, ())),
+            "parked": len(by_status.get(ClientStatus.PARKED, ())),
+            "disconnected": len(by_status.get(ClientStatus.DISCONNECTED, ())),
+            "error": len(by_status.get(ClientStatus.ERROR, ()))
         }
-        
-        for client in self._clients.values():
-            if client.status == ClientStatus.CONNECTED:
-                stats["connected"] += 1
-            elif client.status == ClientStatus.ACTIVE:
-                stats["active"] += 1
-            elif client.status == ClientStatus.DISCONNECTED:
-                stats["disconnected"] += 1
-            elif client.status == ClientStatus.ERROR:
-                stats["error"] += 1
-        
-        return stats
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+Бэкенды виртуальных устройств ввода
+"""
+import logging
+from typing import Any
+
+from evdev import UInput
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class NullUInput:
+    """
+    Устройство без /dev/uinput: принимает и отбрасывает события
+
+    Используется бенчмарками и нагрузочными тестами, чтобы измерять
+    сервер, а не ядро, и запускаться без прав на uinput.
+    """
+
+    def __init__(self, caps: Any = None, name: str = "null", **kwargs: Any) -> None:
+        self.name = name
+        self.events_written = 0
+
+    def write(self, etype: int, code: int, value: int) -> None:
+        self.events_written += 1
+
+    def syn(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def create_uinput(caps: Any, **kwargs: Any) -> Any:
+    """Создание устройства выбранным бэкендом (settings.device_backend)"""
+    if settings.device_backend == "null":
+        return NullUInput(caps, **kwargs)
+    return UInput(caps, **kwargs)
@@ -3,81 +3,400 @@
 """
 import asyncio
 import logging
-from typing import Dict, List, Set, Callable, Any
-from collections import defaultdict
+from time import perf_counter
+from enum import Enum
+from typing import Dict, List, Optional, Set, Tuple, Callable, Any, Hashable
+from collections import deque, OrderedDict
 
-from ..utils.types import GamepadEvent, ClientInfo, EventCallback, ClientCallback
+from ..utils.types import GamepadEvent, ClientInfo, EventCallback, ClientCallback, Topic, TopicLike, TOPIC_COUNT
+from ..core.observers import SampledStream, SampledCallback, StateProvider
+from ..core.metrics import Histogram, HistogramChild, MetricsRegistry
 
 logger = logging.getLogger(__name__)
 
 
+class DeliveryMode(Enum):
+    """Режим доставки событий подписчику"""
+    INLINE = "inline"  # Отправитель ждет обработчик
+    QUEUED = "queued"  # Своя ограниченная очередь и рабочая задача
+
+
+class OverflowPolicy(Enum):
+    """Поведение очереди подписчика при переполнении"""
+    DROP_OLDEST = "drop_oldest"  # Выбрасывается самое старое событие
+    COALESCE = "coalesce"        # По ключу хранится только последнее событие
+    BLOCK = "block"              # Отправитель ждет свободного места
+
+
+def _default_key(*args: Any) -> Hashable:
+    """Ключ слияния по умолчанию - client_id аргументов"""
+    return tuple(getattr(arg, "client_id", arg) for arg in args)
+
+
+class QueuedSubscriber:
+    """
+    Подписчик с собственной ограниченной очередью и рабочей задачей
+    
+    Вызов подписчика только кладет событие в очередь, поэтому отправитель
+    не ждет медленного обработчика (кроме политики BLOCK).
+    """
+    
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        maxsize: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        key: Optional[Callable[..., Hashable]] = None,
+        latency: Optional[HistogramChild] = None,
+    ) -> None:
+        self.handler = handler
+        self.latency = latency
+        self.maxsize = max(1, maxsize)
+        self.overflow = overflow
+        self.dropped = 0
+        self._key = key or _default_key
+        self._queue: deque = deque()
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._worker: Optional[asyncio.Task] = None
+    
+    def __len__(self) -> int:
+        return len(self._pending) if self.overflow is OverflowPolicy.COALESCE else len(self._queue)
+    
+    async def __call__(self, *args: Any) -> None:
+        """Постановка события в очередь"""
+        if self.overflow is OverflowPolicy.COALESCE:
+            key = self._key(*args)
+            if key in self._pending:
+                self._pending[key] = args
+                self.dropped += 1
+            else:
+                if len(self._pending) >= self.maxsize:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+                self._pending[key] = args
+        elif self.overflow is OverflowPolicy.BLOCK:
+            while len(self._queue) >= self.maxsize:
+                self._has_space.clear()
+                await self._has_space.wait()
+            self._queue.append(args)
+        else:
+            if len(self._queue) >= self.maxsize:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(args)
+        
+        self._has_items.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+    
+    def _pop(self) -> Optional[tuple]:
+        if self.overflow is OverflowPolicy.COALESCE:
+            return self._pending.popitem(last=False)[1] if self._pending else None
+        return self._queue.popleft() if self._queue else None
+    
+    async def _run(self) -> None:
+        """Рабочая задача подписчика"""
+        while True:
+            args = self._pop()
+            if args is None:
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+            
+            self._has_space.set()
+            start = perf_counter()
+            try:
+                await self.handler(*args)
+            except Exception as e:
+                logger.error(f"Error in queued event handler: {e}", exc_info=True)
+            if self.latency is not None:
+                self.latency.observe_since(start)
+    
+    def close(self) -> None:
+        """Остановка рабочей задачи, необработанные события отбрасываются"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
+        self._queue.clear()
+        self._pending.clear()
+        self._has_space.set()
+
+
 class EventBus:
-    """Асинхронная шина событий"""
+    """
+    Асинхронная шина событий
     
-    def __init__(self) -> None:
-        self._gamepad_handlers: Dict[str, Set[EventCallback]] = defaultdict(set)
-        self._client_handlers: Dict[str, Set[ClientCallback]] = defaultdict(set)
-        self._global_handlers: Set[Callable[[str, Any], asyncio.Task[None]]] = set()
+    Темы - целые числа из реестра Topic. Обработчики хранятся в множествах,
+    а для отправки используются списки неизменяемых кортежей-снимков с
+    индексом по номеру темы, которые пересобираются только при подписке
+    и отписке. Строковые имена тем разрешаются в Topic при подписке, поэтому
+    опечатка в имени сразу вызывает ValueError. Отправка без слушателей ничего
+    не выделяет, единственный обработчик вызывается напрямую без asyncio.gather.
+    
+    Подписка с mode=DeliveryMode.QUEUED оборачивает обработчик в QueuedSubscriber,
+    и отправитель больше не ждет этого подписчика.
+    
+    Метрики шины (rg_eventbus_*: очереди подписчиков и время обработчиков)
+    пишутся только в явно переданный реестр. Шина приложения создается
+    с metrics=registry, вспомогательные шины (бенчмарки) - без него или со
+    своим реестром и не подменяют метрики сервера.
+    """
+    
+    def __init__(self, metrics: Optional[MetricsRegistry] = None) -> None:
+        self._gamepad_handlers: List[Set[EventCallback]] = [set() for _ in range(TOPIC_COUNT)]
+        self._client_handlers: List[Set[ClientCallback]] = [set() for _ in range(TOPIC_COUNT)]
+        self._global_handlers: Set[Callable[[Topic, Any], asyncio.Task[None]]] = set()
         self._running: bool = True
+        
+        # Снимки обработчиков для отправки событий (индекс - номер темы)
+        self._gamepad_dispatch: List[Tuple[EventCallback, ...]] = [()] * TOPIC_COUNT
+        self._client_dispatch: List[Tuple[ClientCallback, ...]] = [()] * TOPIC_COUNT
+        self._global_dispatch: Tuple[Callable[[Topic, Any], asyncio.Task[None]], ...] = ()
+        
+        # Обертки QUEUED подписчиков: (вид, тема, обработчик) -> обертка
+        self._queued: Dict[Tuple[str, int, Callable], QueuedSubscriber] = {}
+        
+        # Прореженный поток состояния геймпадов: gamepad_id -> снимок
+        self._gamepad_states = SampledStream()
+        
+        # Гистограммы времени обработчиков по темам (создаются при первой отправке)
+        self._latency: List[Optional[HistogramChild]] = [None] * TOPIC_COUNT
+        self._handler_seconds: Optional[Histogram] = None
+        if metrics is not None:
+            self._export_metrics(metrics)
+    
+    def _export_metrics(self, metrics: MetricsRegistry) -> None:
+        """Регистрация метрик шины (в реестре может быть только одна шина)"""
+        if metrics.get("rg_eventbus_queue_depth") is not None:
+            raise ValueError("Another EventBus already exports metrics to this registry")
+        self._handler_seconds = metrics.get("rg_eventbus_handler_seconds") or metrics.histogram(
+            "rg_eventbus_handler_seconds", "EventBus handler time per emit (inline) or per event (queued)",
+            ("topic", "mode"))
+        metrics.collect(
+            "rg_eventbus_dropped_total",
+            "Events dropped or coalesced by queued EventBus subscribers",
+            "counter", lambda: self._queue_samples("dropped")
+        )
+        metrics.collect(
+            "rg_eventbus_queue_depth",
+            "Events waiting in queued EventBus subscribers",
+            "gauge", lambda: self._queue_samples("depth")
+        )
+    
+    def _wrap(
+        self,
+        kind: str,
+        topic: int,
+        handler: Callable,
+        mode: DeliveryMode,
+        maxsize: int,
+        overflow: OverflowPolicy,
+        key: Optional[Callable[..., Hashable]],
+    ) -> Callable:
+        """Обертка обработчика под режим доставки"""
+        if mode is DeliveryMode.INLINE:
+            return handler
+        
+        subscriber = self._queued.get((kind, topic, handler))
+        if subscriber is None:
+            label = Topic(topic).label if topic else "all"
+            latency = self._handler_seconds.labels(label, "queued") if self._handler_seconds else None
+            subscriber = QueuedSubscriber(handler, maxsize, overflow, key, latency)
+            self._queued[(kind, topic, handler)] = subscriber
+        return subscriber
     
-    def subscribe_gamepad(self, event_type: str, handler: EventCallback) -> None:
+    def _unwrap(self, kind: str, topic: int, handler: Callable) -> Callable:
+        """Поиск обертки обработчика при отписке"""
+        subscriber = self._queued.pop((kind, topic, handler), None)
+        if subscriber is None:
+            return handler
+        subscriber.close()
+        return subscriber
+    
+    def subscribe_gamepad(
+        self,
+        event_type: TopicLike,
+        handler: EventCallback,
+        mode: DeliveryMode = DeliveryMode.INLINE,
+        maxsize: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        key: Optional[Callable[..., Hashable]] = None,
+    ) -> None:
         """Подписка на события геймпада"""
-        self._gamepad_handlers[event_type].add(handler)
-        logger.debug(f"Subscribed to gamepad event: {event_type}")
+        topic = Topic.resolve(event_type)
+        if topic.is_client:
+            raise ValueError(f"{topic.label} is a client topic, use subscribe_client")
+        handler = self._wrap("gamepad", topic, handler, mode, maxsize, overflow, key)
+        self._gamepad_handlers[topic].add(handler)
+        self._rebuild(self._gamepad_handlers, self._gamepad_dispatch, topic)
+        logger.debug(f"Subscribed to gamepad event: {topic.label} ({mode.value})")
     
-    def subscribe_client(self, event_type: str, handler: ClientCallback) -> None:
+    def subscribe_client(
+        self,
+        event_type: TopicLike,
+        handler: ClientCallback,
+        mode: DeliveryMode = DeliveryMode.INLINE,
+        maxsize: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        key: Optional[Callable[..., Hashable]] = None,
+    ) -> None:
         """Подписка на события клиентов"""
-        self._client_handlers[event_type].add(handler)
-        logger.debug(f"Subscribed to client event: {event_type}")
+        topic = Topic.resolve(event_type)
+        if not topic.is_client:
+            raise ValueError(f"{topic.label} is a gamepad topic, use subscribe_gamepad")
+        handler = self._wrap("client", topic, handler, mode, maxsize, overflow, key)
+        self._client_handlers[topic].add(handler)
+        self._rebuild(self._client_handlers, self._client_dispatch, topic)
+        logger.debug(f"Subscribed to client event: {topic.label} ({mode.value})")
     
-    def subscribe_all(self, handler: Callable[[str, Any], asyncio.Task[None]]) -> None:
-        """Подписка на все события"""
+    def subscribe_all(
+        self,
+        handler: Callable[[Topic, Any], asyncio.Task[None]],
+        mode: DeliveryMode = DeliveryMode.INLINE,
+        maxsize: int = 256,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        key: Optional[Callable[..., Hashable]] = None,
+    ) -> None:
+        """Подписка на все события (обработчик получает Topic и данные)"""
+        handler = self._wrap("all", 0, handler, mode, maxsize, overflow, key)
         self._global_handlers.add(handler)
-        logger.debug("Subscribed to all events")
+        self._global_dispatch = tuple(self._global_handlers)
+        logger.debug(f"Subscribed to all events ({mode.value})")
     
-    def unsubscribe_gamepad(self, event_type: str, handler: EventCallback) -> None:
+    def unsubscribe_gamepad(self, event_type: TopicLike, handler: EventCallback) -> None:
         """Отписка от событий геймпада"""
-        self._gamepad_handlers[event_type].discard(handler)
+        topic = Topic.resolve(event_type)
+        handler = self._unwrap("gamepad", topic, handler)
+        self._gamepad_handlers[topic].discard(handler)
+        self._rebuild(self._gamepad_handlers, self._gamepad_dispatch, topic)
     
-    def unsubscribe_client(self, event_type: str, handler: ClientCallback) -> None:
+    def unsubscribe_client(self, event_type: TopicLike, handler: ClientCallback) -> None:
         """Отписка от событий клиентов"""
-        self._client_handlers[event_type].discard(handler)
+        topic = Topic.resolve(event_type)
+        handler = self._unwrap("client", topic, handler)
+        self._client_handlers[topic].discard(handler)
+        self._rebuild(self._client_handlers, self._client_dispatch, topic)
     
-    def unsubscribe_all(self, handler: Callable[[str, Any], asyncio.Task[None]]) -> None:
+    def unsubscribe_all(self, handler: Callable[[Topic, Any], asyncio.Task[None]]) -> None:
         """Отписка от всех событий"""
+        handler = self._unwrap("all", 0, handler)
         self._global_handlers.discard(handler)
+        self._global_dispatch = tuple(self._global_handlers)
+    
+    def subscribe_gamepad_sampled(self, handler: SampledCallback, rate_hz: float = 30.0) -> None:
+        """
+        Подписка на состояние геймпадов с ограниченной частотой
+        
+        Обработчик получает словарь gamepad_id -> снимок состояния (None для
+        удаленного геймпада) не чаще rate_hz раз в секунду и только для
+        изменившихся геймпадов, сколько бы событий ввода ни пришло между тиками.
+        """
+        self._gamepad_states.subscribe(handler, rate_hz)
+    
+    def unsubscribe_gamepad_sampled(self, handler: SampledCallback) -> None:
+        """Отписка от прореженного состояния геймпадов"""
+        self._gamepad_states.unsubscribe(handler)
+    
+    def set_gamepad_state_provider(self, provider: StateProvider) -> None:
+        """Источник снимков состояния геймпадов (GamepadManager)"""
+        self._gamepad_states.set_provider(provider)
     
-    async def emit_gamepad(self, event_type: str, event: GamepadEvent) -> None:
+    def mark_gamepad_state(self, gamepad_id: int) -> None:
+        """Пометка состояния геймпада измененным (дешево, для горячего пути)"""
+        self._gamepad_states.mark(gamepad_id)
+    
+    def forget_gamepad_state(self, gamepad_id: int) -> None:
+        """Удаление геймпада из потока состояния"""
+        self._gamepad_states.forget(gamepad_id)
+    
+    def _queue_samples(self, field: str):
+        """Выборки по QUEUED подписчикам для /metrics"""
+        for (kind, topic, handler), subscriber in list(self._queued.items()):
+            labels = {
+                "topic": Topic(topic).label if topic else "all",
+                "handler": getattr(handler, "__qualname__", repr(handler)),
+            }
+            yield labels, subscriber.dropped if field == "dropped" else len(subscriber)
+    
+    def _handler_latency(self, topic: Topic) -> Optional[HistogramChild]:
+        """Гистограмма времени INLINE обработчиков темы (None - шина без метрик)"""
+        child = self._latency[topic]
+        if child is None and self._handler_seconds is not None:
+            child = self._latency[topic] = self._handler_seconds.labels(topic.label, "inline")
+        return child
+    
+    @staticmethod
+    def _rebuild(handlers: List[Set[Callable]], dispatch: List[Tuple[Callable, ...]], topic: Topic) -> None:
+        """Пересборка снимка обработчиков для темы"""
+        dispatch[topic] = tuple(handlers[topic])
+    
+    def has_listeners(self, event_type: TopicLike) -> bool:
+        """Есть ли хоть один слушатель события"""
+        topic = Topic.resolve(event_type)
+        return bool(
+            self._global_dispatch
+            or self._gamepad_dispatch[topic]
+            or self._client_dispatch[topic]
+        )
+    
+    async def emit_gamepad(self, event_type: TopicLike, event: GamepadEvent) -> None:
         """Отправка события геймпада"""
         if not self._running:
             return
         
-        # Вызываем специфичные обработчики
-        handlers = self._gamepad_handlers.get(event_type, set())
-        tasks = [self._safe_call_gamepad(handler, event) for handler in handlers]
-        
-        # Вызываем глобальные обработчики
-        global_tasks = [self._safe_call_global(handler, event_type, event) 
-                       for handler in self._global_handlers]
+        if type(event_type) is not Topic:
+            event_type = Topic.resolve(event_type)
+        handlers = self._gamepad_dispatch[event_type]
+        global_handlers = self._global_dispatch
         
-        if tasks or global_tasks:
-            await asyncio.gather(*tasks, *global_tasks, return_exceptions=True)
+        # Быстрые пути: нет слушателей или ровно один
+        if not global_handlers and not handlers:
+            return
+        start = perf_counter()
+        if not global_handlers and len(handlers) == 1:
+            try:
+                await handlers[0](event)
+            except Exception as e:
+                logger.error(f"Error in gamepad event handler: {e}", exc_info=True)
+        else:
+            await asyncio.gather(
+                *[self._safe_call_gamepad(handler, event) for handler in handlers],
+                *[self._safe_call_global(handler, event_type, event) for handler in global_handlers],
+                return_exceptions=True
+            )
+        if latency := self._handler_latency(event_type):
+            latency.observe_since(start)
     
-    async def emit_client(self, event_type: str, client: ClientInfo) -> None:
+    async def emit_client(self, event_type: TopicLike, client: ClientInfo) -> None:
         """Отправка события клиента"""
         if not self._running:
             return
         
-        # Вызываем специфичные обработчики
-        handlers = self._client_handlers.get(event_type, set())
-        tasks = [self._safe_call_client(handler, client) for handler in handlers]
+        if type(event_type) is not Topic:
+            event_type = Topic.resolve(event_type)
+        handlers = self._client_dispatch[event_type]
+        global_handlers = self._global_dispatch
         
-        # Вызываем глобальные обработчики
-        global_tasks = [self._safe_call_global(handler, event_type, client)
-                       for handler in self._global_handlers]
-        
-        if tasks or global_tasks:
-            await asyncio.gather(*tasks, *global_tasks, return_exceptions=True)
+        # Быстрые пути: нет слушателей или ровно один
+        if not global_handlers and not handlers:
+            return
+        start = perf_counter()
+        if not global_handlers and len(handlers) == 1:
+            try:
+                await handlers[0](client)
+            except Exception as e:
+                logger.error(f"Error in client event handler: {e}", exc_info=True)
+        else:
+            await asyncio.gather(
+                *[self._safe_call_client(handler, client) for handler in handlers],
+                *[self._safe_call_global(handler, event_type, client) for handler in global_handlers],
+                return_exceptions=True
+            )
+        if latency := self._handler_latency(event_type):
+            latency.observe_since(start)
     
     async def _safe_call_gamepad(self, handler: EventCallback, event: GamepadEvent) -> None:
         """Безопасный вызов обработчика события геймпада"""
@@ -93,7 +412,7 @@ class EventBus:
         except Exception as e:
             logger.error(f"Error in client event handler: {e}", exc_info=True)
     
-    async def _safe_call_global(self, handler: Callable, event_type: str, data: Any) -> None:
+    async def _safe_call_global(self, handler: Callable, event_type: Topic, data: Any) -> None:
         """Безопасный вызов глобального обработчика"""
         try:
             await handler(event_type, data)
@@ -103,6 +422,10 @@ class EventBus:
     def stop(self) -> None:
         """Остановка шины событий"""
         self._running = False
+        # Рабочие задачи очередей перезапустятся при следующем событии
+        for subscriber in self._queued.values():
+            subscriber.close()
+        self._gamepad_states.stop()
         logger.info("EventBus stopped")
     
     def start(self) -> None:
@@ -117,7 +440,7 @@ class EventBus:
 
 
 # Декоратор для подписки на события
-def on_gamepad_event(event_type: str, event_bus: EventBus):
+def on_gamepad_event(event_type: TopicLike, event_bus: EventBus):
     """Декоратор для автоматической подписки на события геймпада"""
     def decorator(func: EventCallback) -> EventCallback:
         event_bus.subscribe_gamepad(event_type, func)
@@ -125,7 +448,7 @@ def on_gamepad_event(event_type: str, event_bus: EventBus):
     return decorator
 
 
-def on_client_event(event_type: str, event_bus: EventBus):
+def on_client_event(event_type: TopicLike, event_bus: EventBus):
     """Декоратор для автоматической подписки на события клиентов"""
     def decorator(func: ClientCallback) -> ClientCallback:
         event_bus.subscribe_client(event_type, func)
@@ -8,12 +8,27 @@ import time
 
 from evdev import UInput, AbsInfo, ecodes as e
 
-from ..utils.types import GamepadEvent, GamepadManager as IGamepadManager
+from ..utils.types import (
+    GamepadControl, GamepadEvent, GamepadEventType, GamepadStateSnapshot, GamepadManager as IGamepadManager
+)
 from ..core.events import EventBus
+from ..core.input_merge import InputMerger, AxisMergePolicy
+from ..core.motion import MotionBatch, MotionSensorDevice
+from ..core.devices import create_uinput
+from ..core.metrics import (
+    DEVICE_WRITE_SECONDS, EVDEV_EVENTS_WRITTEN, FRAMES_REJECTED, SEND_EVENT_SECONDS, INPUT_COALESCED
+)
+from ..core.tracing import current_frame
 from ..config.settings import settings
+from ..utils.logging_utils import log_throttled
 
 logger = logging.getLogger(__name__)
 
+_GAMEPAD_WRITE = DEVICE_WRITE_SECONDS.labels("gamepad")
+_GAMEPAD_EVENTS = EVDEV_EVENTS_WRITTEN.labels("gamepad")
+_SEND_EVENT = SEND_EVENT_SECONDS.labels()
+_COALESCED = INPUT_COALESCED.labels()
+
 
 class VirtualGamepadDevice:
     """Виртуальный геймпад на основе evdev UInput"""
@@ -63,7 +78,7 @@ class VirtualGamepadDevice:
     async def create(self) -> bool:
         """Создание виртуального устройства"""
         try:
-            self.device = UInput(
+            self.device = create_uinput(
                 self.caps,
                 name=self.name,
                 vendor=0x045e,   # Microsoft
@@ -94,10 +109,15 @@ class VirtualGamepadDevice:
         if not self.device:
             return
             
+        start = time.perf_counter()
         try:
             self.device.write(e.EV_KEY, button_code, value)
             self.device.syn()
-            logger.debug(f"Gamepad {self.gamepad_id}: button {button_code} = {value}")
+            _GAMEPAD_WRITE.observe_since(start)
+            if trace := current_frame():
+                trace.add_write(start)
+            _GAMEPAD_EVENTS.inc()
+            logger.debug("Gamepad %s: button %s = %s", self.gamepad_id, button_code, value)
         except Exception as ex:
             logger.error(f"Error sending button event: {ex}")
     
@@ -106,10 +126,15 @@ class VirtualGamepadDevice:
         if not self.device:
             return
             
+        start = time.perf_counter()
         try:
             self.device.write(e.EV_ABS, axis_code, value)
             self.device.syn()
-            logger.debug(f"Gamepad {self.gamepad_id}: axis {axis_code} = {value}")
+            _GAMEPAD_WRITE.observe_since(start)
+            if trace := current_frame():
+                trace.add_write(start)
+            _GAMEPAD_EVENTS.inc()
+            logger.debug("Gamepad %s: axis %s = %s", self.gamepad_id, axis_code, value)
         except Exception as ex:
             logger.error(f"Error sending axis event: {ex}")
     
@@ -118,15 +143,20 @@ class VirtualGamepadDevice:
         if not self.device:
             return
             
+        start = time.perf_counter()
         try:
             self.device.write(e.EV_ABS, e.ABS_HAT0X, x)
             self.device.write(e.EV_ABS, e.ABS_HAT0Y, y)
             self.device.syn()
+            _GAMEPAD_WRITE.observe_since(start)
+            if trace := current_frame():
+                trace.add_write(start)
+            _GAMEPAD_EVENTS.inc(2)
             
             self.dpad_state['x'] = x
             self.dpad_state['y'] = y
             
-            logger.debug(f"Gamepad {self.gamepad_id}: dpad ({x}, {y})")
+            logger.debug("Gamepad %s: dpad (%s, %s)", self.gamepad_id, x, y)
         except Exception as ex:
             logger.error(f"Error sending dpad event: {ex}")
 
@@ -137,36 +167,83 @@ class GamepadManagerImpl(IGamepadManager):
     def __init__(self, event_bus: EventBus):
         self._gamepads: Dict[int, VirtualGamepadDevice] = {}
         self._client_gamepad_map: Dict[str, int] = {}
+        self._mergers: Dict[int, InputMerger] = {}
+        self._motion_devices: Dict[int, MotionSensorDevice] = {}
+        # Дополнительные источники ввода клиента (гироприцел): source_id -> client_id
+        self._aux_sources: Dict[str, str] = {}
         self._event_bus = event_bus
-        self._next_gamepad_id = 1
+        self._next_gamepad_id = settings.gamepad_id_offset + 1
         self._lock = asyncio.Lock()
         
         # Маппинг кнопок
-        self._button_map = {
-            "BtnA": e.BTN_SOUTH,
-            "BtnB": e.BTN_EAST,
-            "BtnX": e.BTN_NORTH, 
-            "BtnY": e.BTN_WEST,
-            "BtnBack": e.BTN_SELECT,
-            "BtnStart": e.BTN_START,
-            "BtnThumbL": e.BTN_THUMBL,
-            "BtnThumbR": e.BTN_THUMBR,
-            "BtnShoulderL": e.BTN_TL,
-            "BtnShoulderR": e.BTN_TR,
+        self._button_map: Dict[GamepadControl, int] = {
+            GamepadControl.BTN_A: e.BTN_SOUTH,
+            GamepadControl.BTN_B: e.BTN_EAST,
+            GamepadControl.BTN_X: e.BTN_NORTH,
+            GamepadControl.BTN_Y: e.BTN_WEST,
+            GamepadControl.BTN_BACK: e.BTN_SELECT,
+            GamepadControl.BTN_START: e.BTN_START,
+            GamepadControl.BTN_THUMB_L: e.BTN_THUMBL,
+            GamepadControl.BTN_THUMB_R: e.BTN_THUMBR,
+            GamepadControl.BTN_SHOULDER_L: e.BTN_TL,
+            GamepadControl.BTN_SHOULDER_R: e.BTN_TR,
         }
         
         # Маппинг осей
-        self._axis_map = {
-            'AxisLx': e.ABS_X,
-            'AxisLy': e.ABS_Y,
-            'AxisRx': e.ABS_RX,
-            'AxisRy': e.ABS_RY,
-            'TriggerL': e.ABS_Z,
-            'TriggerR': e.ABS_RZ
+        self._axis_map: Dict[GamepadControl, int] = {
+            GamepadControl.AXIS_LX: e.ABS_X,
+            GamepadControl.AXIS_LY: e.ABS_Y,
+            GamepadControl.AXIS_RX: e.ABS_RX,
+            GamepadControl.AXIS_RY: e.ABS_RY,
+            GamepadControl.TRIGGER_L: e.ABS_Z,
+            GamepadControl.TRIGGER_R: e.ABS_RZ
         }
         
+        # Индексы контролов в массивах состояния InputMerger
+        self._button_codes: List[int] = list(self._button_map.values())
+        self._button_index: Dict[GamepadControl, int] = {control: i for i, control in enumerate(self._button_map)}
+        self._axis_codes: List[int] = list(self._axis_map.values()) + [e.ABS_HAT0X, e.ABS_HAT0Y]
+        self._axis_index: Dict[GamepadControl, int] = {control: i for i, control in enumerate(self._axis_map)}
+        self._dpad_x_index = len(self._axis_map)
+        self._dpad_y_index = self._dpad_x_index + 1
+        self._axis_policy = AxisMergePolicy(settings.gamepad_axis_merge)
+        # Имена для снимков состояния (наблюдатели и раскладка кольцевого буфера)
+        self._button_names: List[str] = [control.label for control in self._button_map]
+        self._axis_names: List[str] = [control.label for control in self._axis_map] + ["DpadX", "DpadY"]
+        
+        # Наблюдатели получают состояние через прореженный поток EventBus
+        self._event_bus.set_gamepad_state_provider(self._state_snapshot)
+        
         logger.info("GamepadManager initialized")
     
+    def _state_snapshot(self, gamepad_id: int) -> Optional[GamepadStateSnapshot]:
+        """Снимок итогового состояния геймпада для наблюдателей"""
+        merger = self._mergers.get(gamepad_id)
+        if merger is None:
+            return None
+        
+        return GamepadStateSnapshot(
+            gamepad_id=gamepad_id,
+            client_ids=[c for c in merger.sources if c not in self._aux_sources],
+            buttons=dict(zip(self._button_names, merger.merged_buttons)),
+            axes=dict(zip(self._axis_names, merger.merged_axes)),
+            timestamp=time.time()
+        )
+    
+    def _new_merger(self) -> InputMerger:
+        """Создание состояния слияния для нового геймпада"""
+        # У каждого клиента может быть дополнительный источник (гироприцел)
+        return InputMerger(
+            len(self._button_codes),
+            len(self._axis_codes),
+            max_sources=max(1, settings.max_clients_per_gamepad) * 2,
+            axis_policy=self._axis_policy,
+        )
+    
+    def _client_count(self, merger: InputMerger) -> int:
+        """Количество настоящих клиентов геймпада без дополнительных источников"""
+        return sum(1 for source in merger.sources if source not in self._aux_sources)
+    
     async def create_gamepad(self, client_id: str) -> Optional[int]:
         """Создание виртуального геймпада для клиента"""
         async with self._lock:
@@ -189,7 +266,10 @@ class GamepadManagerImpl(IGamepadManager):
             )
             
             if await gamepad.create():
+                merger = self._new_merger()
+                merger.add_source(client_id)
                 self._gamepads[gamepad_id] = gamepad
+                self._mergers[gamepad_id] = merger
                 self._client_gamepad_map[client_id] = gamepad_id
                 
                 logger.info(f"Created gamepad {gamepad_id} for client {client_id}")
@@ -197,70 +277,319 @@ class GamepadManagerImpl(IGamepadManager):
             
             return None
     
-    async def remove_gamepad(self, gamepad_id: int) -> bool:
-        """Удаление виртуального геймпада"""
+    async def bind_client(self, client_id: str, gamepad_id: int) -> bool:
+        """Привязка дополнительного клиента к существующему геймпаду (co-pilot)"""
         async with self._lock:
             if gamepad_id not in self._gamepads:
+                logger.warning(f"Cannot bind {client_id}: gamepad {gamepad_id} not found")
                 return False
             
-            gamepad = self._gamepads[gamepad_id]
-            await gamepad.destroy()
+            current = self._client_gamepad_map.get(client_id)
+            if current is not None:
+                return current == gamepad_id
+            
+            merger = self._mergers[gamepad_id]
+            if (self._client_count(merger) >= settings.max_clients_per_gamepad
+                    or merger.add_source(client_id) is None):
+                logger.warning(f"Cannot bind {client_id}: gamepad {gamepad_id} is full")
+                return False
+            
+            self._client_gamepad_map[client_id] = gamepad_id
+            logger.info(f"Client {client_id} bound to gamepad {gamepad_id}")
+            return True
+    
+    async def attach_aux_source(self, client_id: str, kind: str) -> Optional[str]:
+        """
+        Дополнительный источник ввода клиента на его геймпаде
+        
+        Например, гироприцел пишет в правый стик отдельным источником,
+        и его значения сливаются со стиком по политике осей, а не затирают их.
+        """
+        async with self._lock:
+            gamepad_id = self._client_gamepad_map.get(client_id)
+            if gamepad_id is None:
+                return None
+            
+            source_id = f"{client_id}#{kind}"
+            if source_id in self._aux_sources:
+                return source_id
+            
+            if self._mergers[gamepad_id].add_source(source_id) is None:
+                logger.warning(f"Cannot attach {kind} source for {client_id}: gamepad {gamepad_id} is full")
+                return None
+            
+            self._aux_sources[source_id] = client_id
+            self._client_gamepad_map[source_id] = gamepad_id
+            logger.info(f"Attached {kind} source to gamepad {gamepad_id} for {client_id}")
+            return source_id
+    
+    async def release_client(self, client_id: str) -> bool:
+        """
+        Отвязка клиента (вместе с его дополнительными источниками) от геймпада
+        
+        Геймпад удаляется вместе с последним клиентом, иначе ввод
+        ушедшего клиента сбрасывается и устройство получает новое состояние.
+        """
+        async with self._lock:
+            return await self._release(client_id)
+    
+    async def release_clients(self, client_ids: List[str]) -> int:
+        """Отвязка нескольких клиентов за один захват блокировки (обход живости)"""
+        async with self._lock:
+            released = 0
+            for client_id in client_ids:
+                if await self._release(client_id):
+                    released += 1
+            return released
+    
+    async def _release(self, client_id: str) -> bool:
+        """Отвязка клиента (вызывается под блокировкой)"""
+        gamepad_id = self._client_gamepad_map.get(client_id)
+        if gamepad_id is None or client_id in self._aux_sources:
+            return False
+        
+        merger = self._mergers[gamepad_id]
+        changed_buttons, changed_axes = set(), set()
+        owned = [source for source, owner in self._aux_sources.items() if owner == client_id]
+        for source_id in owned + [client_id]:
+            self._aux_sources.pop(source_id, None)
+            self._client_gamepad_map.pop(source_id, None)
+            buttons, axes = merger.remove_source(source_id)
+            changed_buttons.update(buttons)
+            changed_axes.update(axes)
+        
+        if self._client_count(merger) == 0:
+            await self._destroy_gamepad(gamepad_id)
+            logger.info(f"Removed gamepad {gamepad_id} with its last client {client_id}")
+            return True
+        
+        await self._write_merged(gamepad_id, sorted(changed_buttons), sorted(changed_axes))
+        logger.info(f"Client {client_id} released from gamepad {gamepad_id}")
+        return True
+    
+    async def park_client(self, client_id: str) -> bool:
+        """
+        Нейтральное состояние ввода клиента без отвязки от геймпада
+
+        Устройство и слот клиента сохраняются: при возобновлении сессии
+        игра не видит отключения контроллера.
+        """
+        async with self._lock:
+            gamepad_id = self._client_gamepad_map.get(client_id)
+            if gamepad_id is None or client_id in self._aux_sources:
+                return False
+            
+            merger = self._mergers[gamepad_id]
+            changed_buttons, changed_axes = set(), set()
+            owned = [source for source, owner in self._aux_sources.items() if owner == client_id]
+            for source_id in owned + [client_id]:
+                buttons, axes = merger.clear_source(source_id)
+                changed_buttons.update(buttons)
+                changed_axes.update(axes)
+            
+            await self._write_merged(gamepad_id, sorted(changed_buttons), sorted(changed_axes))
+            logger.info(f"Client {client_id} parked on gamepad {gamepad_id}")
+            return True
+    
+    async def set_control_owner(self, gamepad_id: int, control: GamepadControl, client_id: Optional[str]) -> bool:
+        """Закрепление контрола (кнопки, оси или Dpad) за клиентом, None - снять"""
+        async with self._lock:
+            merger = self._mergers.get(gamepad_id)
+            if merger is None:
+                return False
             
-            # Удаляем из мапинга клиентов
-            client_to_remove = None
-            for client_id, gpad_id in self._client_gamepad_map.items():
-                if gpad_id == gamepad_id:
-                    client_to_remove = client_id
-                    break
+            if control in self._button_index:
+                index = self._button_index[control]
+                if not merger.set_button_owner(index, client_id):
+                    return False
+                await self._write_merged(gamepad_id, [index], [])
+            elif control in self._axis_index:
+                index = self._axis_index[control]
+                if not merger.set_axis_owner(index, client_id):
+                    return False
+                await self._write_merged(gamepad_id, [], [index])
+            elif control is GamepadControl.DPAD:
+                if not (merger.set_axis_owner(self._dpad_x_index, client_id)
+                        and merger.set_axis_owner(self._dpad_y_index, client_id)):
+                    return False
+                await self._write_merged(gamepad_id, [], [self._dpad_x_index, self._dpad_y_index])
+            else:
+                logger.warning(f"Unknown control for ownership: {control}")
+                return False
             
-            if client_to_remove:
-                del self._client_gamepad_map[client_to_remove]
+            logger.info(f"Gamepad {gamepad_id}: control {control.label} owned by {client_id}")
+            return True
+    
+    async def get_clients_for_gamepad(self, gamepad_id: int) -> List[str]:
+        """Клиенты геймпада в порядке приоритета"""
+        async with self._lock:
+            merger = self._mergers.get(gamepad_id)
+            if merger is None:
+                return []
+            return [c for c in merger.sources if c not in self._aux_sources]
+    
+    async def remove_gamepad(self, gamepad_id: int) -> bool:
+        """Удаление виртуального геймпада"""
+        async with self._lock:
+            if gamepad_id not in self._gamepads:
+                return False
             
-            del self._gamepads[gamepad_id]
+            await self._destroy_gamepad(gamepad_id)
             
             logger.info(f"Removed gamepad {gamepad_id}")
             return True
     
+    async def _destroy_gamepad(self, gamepad_id: int) -> None:
+        """Уничтожение устройства и всех привязок (вызывается под блокировкой)"""
+        gamepad = self._gamepads.pop(gamepad_id)
+        await gamepad.destroy()
+        
+        motion = self._motion_devices.pop(gamepad_id, None)
+        if motion:
+            await motion.destroy()
+        
+        merger = self._mergers.pop(gamepad_id)
+        for client_id in merger.sources:
+            self._client_gamepad_map.pop(client_id, None)
+            self._aux_sources.pop(client_id, None)
+        
+        self._event_bus.forget_gamepad_state(gamepad_id)
+    
+    async def _write_merged(self, gamepad_id: int, buttons: List[int], axes: List[int]) -> None:
+        """Запись итоговых значений указанных контролов в устройство"""
+        gamepad = self._gamepads[gamepad_id]
+        merger = self._mergers[gamepad_id]
+        
+        for index in buttons:
+            await gamepad.send_button_event(self._button_codes[index], merger.merged_buttons[index])
+        
+        dpad_changed = False
+        for index in axes:
+            if index in (self._dpad_x_index, self._dpad_y_index):
+                dpad_changed = True
+            else:
+                await gamepad.send_axis_event(self._axis_codes[index], merger.merged_axes[index])
+        
+        if dpad_changed:
+            await gamepad.send_dpad_event(
+                merger.merged_axes[self._dpad_x_index],
+                merger.merged_axes[self._dpad_y_index]
+            )
+        
+        if buttons or axes:
+            self._event_bus.mark_gamepad_state(gamepad_id)
+    
     async def send_event(self, gamepad_id: int, event: GamepadEvent) -> None:
         """Отправка события в виртуальный геймпад"""
+        start = time.perf_counter()
+        try:
+            await self._send_event(gamepad_id, event)
+        finally:
+            _SEND_EVENT.observe_since(start)
+            if trace := current_frame():
+                trace.add_dispatch(time.perf_counter() - start)
+    
+    async def _send_event(self, gamepad_id: int, event: GamepadEvent) -> None:
+        waited = time.perf_counter()
         async with self._lock:
+            # Кадр передан общему менеджеру: ожидание блокировки - стадия queue
+            if trace := current_frame():
+                trace.add_queue(waited)
+            
             if gamepad_id not in self._gamepads:
-                logger.warning(f"Gamepad {gamepad_id} not found")
+                log_throttled(logger, logging.WARNING, ("gamepad_not_found", gamepad_id),
+                              "Gamepad %s not found", gamepad_id)
                 return
             
             gamepad = self._gamepads[gamepad_id]
+            merger = self._mergers[gamepad_id]
             
-            if event.event_type.value == "button_press" or event.event_type.value == "button_release":
-                if event.button_code and event.button_code in self._button_map:
-                    button_evdev_code = self._button_map[event.button_code]
-                    value = 1 if event.event_type.value == "button_press" else 0
-                    await gamepad.send_button_event(button_evdev_code, value)
+            # Слот источника: ввод клиента, не подключенного к геймпаду (отвязанного
+            # или чужого), отбрасывается, а не пишется от имени основного
+            slot = merger.slot_of(event.client_id)
+            if slot is None:
+                FRAMES_REJECTED.labels(trace.transport if trace else "internal", "no_source").inc()
+                log_throttled(logger, logging.WARNING, ("no_source", event.client_id),
+                              "Dropped input of %s: not a source of gamepad %s", event.client_id, gamepad_id)
+                return
+            
+            event_type = event.event_type
+            if event_type is GamepadEventType.BUTTON_PRESS or event_type is GamepadEventType.BUTTON_RELEASE:
+                button_evdev_code = self._button_map.get(event.button_code)
+                if button_evdev_code is not None:
+                    value = 1 if event_type is GamepadEventType.BUTTON_PRESS else 0
+                    index = self._button_index[event.button_code]
+                    if merger.update_button(slot, index, value):
+                        await gamepad.send_button_event(button_evdev_code, merger.merged_buttons[index])
+                        self._event_bus.mark_gamepad_state(gamepad_id)
+                    else:
+                        _COALESCED.inc()
             
-            elif event.event_type.value == "axis_move":
-                if event.axis_name and event.axis_name in self._axis_map:
-                    axis_evdev_code = self._axis_map[event.axis_name]
+            elif event_type is GamepadEventType.AXIS_MOVE:
+                axis_evdev_code = self._axis_map.get(event.axis_code)
+                if axis_evdev_code is not None:
+                    index = self._axis_index[event.axis_code]
                     
                     # Специальная обработка для триггеров
-                    if event.axis_name in ['TriggerL', 'TriggerR']:
+                    if event.axis_code.is_trigger:
                         # Триггеры: конвертируем булево значение в 0-255
                         if isinstance(event.value, bool):
                             scaled_value = 255 if event.value else 0
                         else:
                             # Если пришло число 0.0-1.0, конвертируем в 0-255
                             scaled_value = int(event.value * 255)
-                        
-                        await gamepad.send_axis_event(axis_evdev_code, scaled_value)
                     else:
                         # Обычные оси (стики): конвертируем в диапазон -32768 до 32767
                         scaled_value = int(event.value * 32767)
-                        await gamepad.send_axis_event(axis_evdev_code, scaled_value)
+                    
+                    if merger.update_axis(slot, index, scaled_value):
+                        await gamepad.send_axis_event(axis_evdev_code, merger.merged_axes[index])
+                        self._event_bus.mark_gamepad_state(gamepad_id)
+                    else:
+                        _COALESCED.inc()
             
-            elif event.event_type.value == "dpad":
+            elif event_type is GamepadEventType.DPAD:
                 # D-Pad события
-                if hasattr(event, 'value_x') and hasattr(event, 'value_y'):
-                    await gamepad.send_dpad_event(event.value_x, event.value_y)
+                if event.value_x is not None and event.value_y is not None:
+                    changed_x = merger.update_axis(slot, self._dpad_x_index, event.value_x)
+                    changed_y = merger.update_axis(slot, self._dpad_y_index, event.value_y)
+                    if changed_x or changed_y:
+                        await gamepad.send_dpad_event(
+                            merger.merged_axes[self._dpad_x_index],
+                            merger.merged_axes[self._dpad_y_index]
+                        )
+                        self._event_bus.mark_gamepad_state(gamepad_id)
+                    else:
+                        _COALESCED.inc()
                 else:
-                    logger.warning(f"Gamepad {gamepad_id}: D-PAD event missing coordinates")
+                    log_throttled(logger, logging.WARNING, ("dpad_missing", gamepad_id),
+                                  "Gamepad %s: D-PAD event missing coordinates", gamepad_id)
+    
+    async def send_motion_batch(self, gamepad_id: int, batch: MotionBatch) -> None:
+        """Отправка пачки сэмплов движения в парное устройство датчиков"""
+        if not settings.enable_motion_sensors:
+            return
+        
+        start = time.perf_counter()
+        trace = current_frame()
+        async with self._lock:
+            if trace:
+                trace.add_queue(start)
+            gamepad = self._gamepads.get(gamepad_id)
+            if gamepad is None:
+                return
+            
+            # Устройство датчиков создается по первому пакету движения
+            motion = self._motion_devices.get(gamepad_id)
+            if motion is None:
+                motion = MotionSensorDevice(gamepad_id, gamepad.name)
+                if not await motion.create():
+                    return
+                self._motion_devices[gamepad_id] = motion
+            
+            await motion.send_batch(batch)
+        if trace:
+            trace.add_dispatch(time.perf_counter() - start)
     
     async def get_gamepad_for_client(self, client_id: str) -> Optional[int]:
         """Получение ID геймпада для клиента"""
@@ -272,24 +601,26 @@ class GamepadManagerImpl(IGamepadManager):
         async with self._lock:
             return len(self._gamepads)
     
+    def gamepad_count(self) -> int:
+        """Количество геймпадов без блокировки (снимок статуса)"""
+        return len(self._gamepads)
+    
     async def get_gamepad_info(self) -> List[Dict]:
         """Получение информации о всех геймпадах"""
         async with self._lock:
             info = []
             for gamepad_id, gamepad in self._gamepads.items():
-                # Находим клиента для этого геймпада
-                client_id = None
-                for cid, gid in self._client_gamepad_map.items():
-                    if gid == gamepad_id:
-                        client_id = cid
-                        break
+                # Клиенты геймпада, первый - основной
+                client_ids = [c for c in self._mergers[gamepad_id].sources if c not in self._aux_sources]
                 
                 info.append({
                     "gamepad_id": gamepad_id,
                     "name": gamepad.name,
-                    "client_id": client_id,
+                    "client_id": client_ids[0] if client_ids else None,
+                    "client_ids": client_ids,
                     "created_at": gamepad.created_at,
-                    "device_path": getattr(gamepad.device, 'device', None) if gamepad.device else None
+                    "device_path": getattr(gamepad.device, 'device', None) if gamepad.device else None,
+                    "motion_sensors": gamepad_id in self._motion_devices
                 })
             
             return info
@@ -297,10 +628,16 @@ class GamepadManagerImpl(IGamepadManager):
     async def cleanup(self) -> None:
         """Очистка всех геймпадов"""
         async with self._lock:
-            for gamepad in self._gamepads.values():
+            for gamepad_id, gamepad in self._gamepads.items():
                 await gamepad.destroy()
+                self._event_bus.forget_gamepad_state(gamepad_id)
+            for motion in self._motion_devices.values():
+                await motion.destroy()
             
             self._gamepads.clear()
+            self._motion_devices.clear()
+            self._mergers.clear()
+            self._aux_sources.clear()
             self._client_gamepad_map.clear()
             
             logger.info("All gamepads cleaned up")
\ No newline at end of file
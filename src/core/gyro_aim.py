@@ -0,0 +1,132 @@
+"""
+Гироприцел: преобразование данных гироскопа и акселерометра в правый стик
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ..core.motion import MotionBatch, SAMPLE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Максимальный шаг интегрирования - защита от пропусков в потоке
+MAX_SAMPLE_DT = 0.05
+
+
+@dataclass
+class GyroAimConfig:
+    """Настройки гироприцела"""
+    sensitivity: float = 1.0       # Множитель угловой скорости
+    max_rate: float = 360.0        # °/с, дающие полное отклонение стика
+    deadzone: float = 2.0          # °/с, ниже которых вращение игнорируется
+    curve: float = 1.0             # Показатель кривой отклика (1 - линейная)
+    filter_alpha: float = 0.98     # Доля гироскопа в комплементарном фильтре
+    invert_y: bool = False
+    ratchet_button: str = "GyroRatchet"
+
+
+@dataclass
+class _AimState:
+    """Оценка ориентации и состояние одного клиента"""
+    pitch: float = 0.0
+    roll: float = 0.0
+    last_t: Optional[float] = None
+    initialized: bool = False
+    ratchet: bool = False
+
+
+class GyroAimEngine:
+    """
+    Преобразование пачек сэмплов движения в отклонение правого стика
+
+    Пачка обрабатывается целиком операциями NumPy: ориентация (pitch/roll)
+    оценивается комплементарным фильтром в замкнутой форме, угловая скорость
+    проецируется на вектор гравитации (рыскание в мировых координатах)
+    и на локальную ось X (тангаж), а затем проходит через кривую чувствительности.
+    """
+
+    def __init__(self, config: Optional[GyroAimConfig] = None) -> None:
+        self.config = config or GyroAimConfig()
+        self._states: Dict[str, _AimState] = {}
+
+    def set_ratchet(self, client_id: str, held: bool) -> None:
+        """
+        Кнопка "храповика": пока нажата, прицел не двигается
+
+        Позволяет переставить телефон в удобное положение, как мышь на коврике.
+        """
+        self._states.setdefault(client_id, _AimState()).ratchet = held
+
+    def reset(self, client_id: str) -> None:
+        """Сброс состояния клиента"""
+        self._states.pop(client_id, None)
+
+    def process(self, client_id: str, batch: MotionBatch) -> Optional[Tuple[float, float]]:
+        """Обработка пачки, возвращает (x, y) правого стика в диапазоне -1..1"""
+        state = self._states.setdefault(client_id, _AimState())
+        data = np.frombuffer(batch.samples, dtype=np.float32).reshape(batch.count, SAMPLE_FIELDS)
+
+        t = data[:, 0].astype(np.float64) / 1000.0
+        accel = data[:, 1:4].astype(np.float64)
+        gyro = np.radians(data[:, 4:7].astype(np.float64))
+
+        # Шаги интегрирования между сэмплами
+        prev_t = t[0] if state.last_t is None else state.last_t
+        dt = np.diff(t, prepend=prev_t)
+        np.clip(dt, 0.0, MAX_SAMPLE_DT, out=dt)
+        state.last_t = float(t[-1])
+
+        # Углы по акселерометру
+        pitch_acc = np.arctan2(accel[:, 1], accel[:, 2])
+        roll_acc = np.arctan2(-accel[:, 0], np.hypot(accel[:, 1], accel[:, 2]))
+
+        if not state.initialized:
+            state.pitch = float(pitch_acc[0])
+            state.roll = float(roll_acc[0])
+            state.initialized = True
+
+        pitch = self._complementary(state.pitch, gyro[:, 0] * dt, pitch_acc)
+        roll = self._complementary(state.roll, gyro[:, 1] * dt, roll_acc)
+        state.pitch = float(pitch[-1])
+        state.roll = float(roll[-1])
+
+        duration = float(dt.sum())
+        if state.ratchet or duration <= 0.0:
+            return 0.0, 0.0
+
+        # Единичный вектор гравитации в координатах телефона
+        cos_roll = np.cos(roll)
+        gravity = np.stack((-np.sin(roll), np.sin(pitch) * cos_roll, np.cos(pitch) * cos_roll), axis=1)
+
+        # Средние скорости за тик (°/с): рыскание вокруг гравитации и тангаж
+        yaw_rate = np.degrees(np.einsum('ij,ij->i', gyro, gravity) @ dt / duration)
+        pitch_rate = np.degrees(gyro[:, 0] @ dt / duration)
+
+        rates = np.array((-yaw_rate, -pitch_rate)) * self.config.sensitivity
+        if self.config.invert_y:
+            rates[1] = -rates[1]
+
+        x, y = self._apply_curve(rates)
+        return float(x), float(y)
+
+    def _complementary(self, start: float, gyro_delta: np.ndarray, accel_angle: np.ndarray) -> np.ndarray:
+        """
+        Комплементарный фильтр для всей пачки без цикла
+
+        θ_k = α(θ_{k-1} + ω_k·dt_k) + (1-α)φ_k раскрывается в
+        θ_k = α^k (θ_0 + Σ_{j<=k} α^{-j} u_j), где u_j = α·ω_j·dt_j + (1-α)φ_j
+        """
+        alpha = self.config.filter_alpha
+        u = alpha * gyro_delta + (1.0 - alpha) * accel_angle
+        powers = alpha ** np.arange(1, u.shape[0] + 1, dtype=np.float64)
+        return powers * (start + np.cumsum(u / powers))
+
+    def _apply_curve(self, rates: np.ndarray) -> np.ndarray:
+        """Мертвая зона, нормализация и кривая отклика"""
+        config = self.config
+        magnitude = np.abs(rates)
+        span = max(config.max_rate - config.deadzone, 1e-6)
+        normalized = np.clip((magnitude - config.deadzone) / span, 0.0, 1.0)
+        return np.sign(rates) * normalized ** config.curve
@@ -0,0 +1,212 @@
+"""
+Слияние ввода нескольких клиентов на одном виртуальном геймпаде
+"""
+from array import array
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+
+class AxisMergePolicy(Enum):
+    """Политика слияния осей"""
+    MAX_MAGNITUDE = "max_magnitude"  # Побеждает наибольшее отклонение
+    PRIORITY = "priority"            # Побеждает первый не нейтральный клиент по приоритету
+
+
+NO_OWNER = -1
+
+
+class InputMerger:
+    """
+    Сведение состояний нескольких источников в одно состояние устройства
+
+    Кнопки сливаются по OR, оси - по политике AxisMergePolicy.
+    Закрепленный за источником контрол (владелец) учитывает только его ввод.
+
+    Состояние хранится в заранее выделенных массивах (источник x контрол),
+    поэтому обновление одного контрола не создает новых объектов.
+    Методы update_* возвращают True только если итоговое значение изменилось -
+    так два потока по 120 Гц не удваивают количество записей в устройство.
+    """
+
+    def __init__(
+        self,
+        button_count: int,
+        axis_count: int,
+        max_sources: int = 2,
+        axis_policy: AxisMergePolicy = AxisMergePolicy.MAX_MAGNITUDE,
+    ) -> None:
+        self.button_count = button_count
+        self.axis_count = axis_count
+        self.max_sources = max_sources
+        self.axis_policy = axis_policy
+
+        # Состояние по источникам: [slot * count + index]
+        self._buttons = array('b', bytes(button_count * max_sources))
+        self._axes = array('i', bytes(4 * axis_count * max_sources))
+
+        # Итоговое состояние устройства
+        self.merged_buttons = array('b', bytes(button_count))
+        self.merged_axes = array('i', bytes(4 * axis_count))
+
+        # Владельцы контролов (слот или NO_OWNER)
+        self._button_owner = array('b', [NO_OWNER] * button_count)
+        self._axis_owner = array('b', [NO_OWNER] * axis_count)
+
+        # Слоты источников в порядке приоритета (порядок подключения)
+        self._slots: Dict[str, int] = {}
+        self._order: List[int] = []
+        self._free: List[int] = list(range(max_sources - 1, -1, -1))
+
+    @property
+    def source_count(self) -> int:
+        """Количество подключенных источников"""
+        return len(self._order)
+
+    @property
+    def sources(self) -> List[str]:
+        """Источники в порядке приоритета"""
+        by_slot = {slot: client_id for client_id, slot in self._slots.items()}
+        return [by_slot[slot] for slot in self._order]
+
+    def slot_of(self, client_id: str) -> Optional[int]:
+        """Слот источника"""
+        return self._slots.get(client_id)
+
+    @property
+    def primary_slot(self) -> Optional[int]:
+        """Слот источника с наивысшим приоритетом"""
+        return self._order[0] if self._order else None
+
+    def add_source(self, client_id: str) -> Optional[int]:
+        """Добавление источника, возвращает слот или None при отсутствии мест"""
+        if client_id in self._slots:
+            return self._slots[client_id]
+        if not self._free:
+            return None
+
+        slot = self._free.pop()
+        self._slots[client_id] = slot
+        self._order.append(slot)
+        return slot
+
+    def remove_source(self, client_id: str) -> Tuple[List[int], List[int]]:
+        """
+        Удаление источника
+
+        Возвращает индексы кнопок и осей, итоговое значение которых изменилось
+        """
+        slot = self._slots.pop(client_id, None)
+        if slot is None:
+            return [], []
+
+        self._order.remove(slot)
+        self._free.append(slot)
+
+        for index in range(self.button_count):
+            if self._button_owner[index] == slot:
+                self._button_owner[index] = NO_OWNER
+        for index in range(self.axis_count):
+            if self._axis_owner[index] == slot:
+                self._axis_owner[index] = NO_OWNER
+        return self._reset_slot(slot)
+
+    def clear_source(self, client_id: str) -> Tuple[List[int], List[int]]:
+        """
+        Сброс ввода источника в нейтраль с сохранением слота и закреплений
+
+        Возвращает индексы кнопок и осей, итоговое значение которых изменилось
+        """
+        slot = self._slots.get(client_id)
+        if slot is None:
+            return [], []
+        return self._reset_slot(slot)
+
+    def _reset_slot(self, slot: int) -> Tuple[List[int], List[int]]:
+        for index in range(self.button_count):
+            self._buttons[slot * self.button_count + index] = 0
+        for index in range(self.axis_count):
+            self._axes[slot * self.axis_count + index] = 0
+
+        changed_buttons = [i for i in range(self.button_count) if self._merge_button(i)]
+        changed_axes = [i for i in range(self.axis_count) if self._merge_axis(i)]
+        return changed_buttons, changed_axes
+
+    def set_button_owner(self, index: int, client_id: Optional[str]) -> bool:
+        """Закрепление кнопки за источником (None - снять владельца)"""
+        if not self._set_owner(self._button_owner, index, client_id):
+            return False
+        self._merge_button(index)
+        return True
+
+    def set_axis_owner(self, index: int, client_id: Optional[str]) -> bool:
+        """Закрепление оси за источником (None - снять владельца)"""
+        if not self._set_owner(self._axis_owner, index, client_id):
+            return False
+        self._merge_axis(index)
+        return True
+
+    def _set_owner(self, owners: array, index: int, client_id: Optional[str]) -> bool:
+        if client_id is None:
+            owners[index] = NO_OWNER
+            return True
+        slot = self._slots.get(client_id)
+        if slot is None:
+            return False
+        owners[index] = slot
+        return True
+
+    def update_button(self, slot: int, index: int, value: int) -> bool:
+        """Обновление кнопки источника, True - итоговое значение изменилось"""
+        offset = slot * self.button_count + index
+        if self._buttons[offset] == value:
+            return False
+        self._buttons[offset] = value
+        return self._merge_button(index)
+
+    def update_axis(self, slot: int, index: int, value: int) -> bool:
+        """Обновление оси источника, True - итоговое значение изменилось"""
+        offset = slot * self.axis_count + index
+        if self._axes[offset] == value:
+            return False
+        self._axes[offset] = value
+        return self._merge_axis(index)
+
+    def _merge_button(self, index: int) -> bool:
+        owner = self._button_owner[index]
+        if owner != NO_OWNER:
+            merged = self._buttons[owner * self.button_count + index]
+        else:
+            # Кнопки всегда сливаются по OR
+            merged = 0
+            for slot in self._order:
+                if self._buttons[slot * self.button_count + index]:
+                    merged = 1
+                    break
+
+        if self.merged_buttons[index] == merged:
+            return False
+        self.merged_buttons[index] = merged
+        return True
+
+    def _merge_axis(self, index: int) -> bool:
+        owner = self._axis_owner[index]
+        if owner != NO_OWNER:
+            merged = self._axes[owner * self.axis_count + index]
+        elif self.axis_policy is AxisMergePolicy.MAX_MAGNITUDE:
+            merged = 0
+            for slot in self._order:
+                value = self._axes[slot * self.axis_count + index]
+                if abs(value) > abs(merged):
+                    merged = value
+        else:
+            merged = 0
+            for slot in self._order:
+                value = self._axes[slot * self.axis_count + index]
+                if value:
+                    merged = value
+                    break
+
+        if self.merged_axes[index] == merged:
+            return False
+        self.merged_axes[index] = merged
+        return True
@@ -0,0 +1,58 @@
+"""
+Живость клиентов по входящему трафику
+
+Каждый кадр ввода и ping клиента только записывают время в словарь:
+без блокировок и событий, чтобы горячий путь не платил за учет. Решения
+принимает один периодический обход (сервер, _sweep): он паркует клиентов,
+от которых давно ничего не приходило, и пачкой удаляет тех, чья сессия
+истекла.
+"""
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class LivenessTracker:
+    """
+    Время последнего кадра или ping по клиентам (time.monotonic)
+
+    Словарь упорядочен по времени: каждая отметка переносит клиента в конец,
+    поэтому обход начинается с самых давно молчащих и останавливается на
+    первом живом - стоимость idle() пропорциональна числу просроченных
+    клиентов, а не всех отслеживаемых.
+    """
+
+    def __init__(self, idle_timeout: float) -> None:
+        self.idle_timeout = idle_timeout
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def seen_frame(self, client_id: str) -> None:
+        seen = self._seen
+        seen[client_id] = time.monotonic()
+        seen.move_to_end(client_id)
+
+    def seen_ping(self, client_id: str) -> None:
+        # Ping учитывается только для подключенных клиентов (известных по кадрам)
+        seen = self._seen
+        if client_id in seen:
+            seen[client_id] = time.monotonic()
+            seen.move_to_end(client_id)
+
+    def last_seen(self, client_id: str) -> Optional[float]:
+        """Последний признак жизни клиента (None - клиент не отслеживается)"""
+        return self._seen.get(client_id)
+
+    def idle(self, now: Optional[float] = None) -> List[str]:
+        """Клиенты, молчащие дольше idle_timeout"""
+        if self.idle_timeout <= 0:
+            return []
+        deadline = (time.monotonic() if now is None else now) - self.idle_timeout
+        idle = []
+        for client_id, seen in self._seen.items():
+            if seen >= deadline:
+                break
+            idle.append(client_id)
+        return idle
+
+    def forget(self, client_id: str) -> None:
+        self._seen.pop(client_id, None)
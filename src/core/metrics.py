@@ -0,0 +1,285 @@
+"""
+Метрики конвейера ввода в формате Prometheus
+
+Счетчики и гистограммы обновляются на месте: дочерняя метрика для набора
+меток создается один раз, гистограмма - массив счетчиков с фиксированными
+границами, и наблюдение стоит одного bisect и двух сложений. Текст для
+/metrics собирается только при запросе.
+"""
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Границы по умолчанию для задержек в секундах: от 25 мкс до 250 мс
+LATENCY_BUCKETS = (
+    0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+)
+
+# Границы для сквозной задержки кадра: мельче шаг, чтобы оценивать p99.9
+INPUT_LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00015, 0.0002, 0.0003, 0.0004, 0.0005, 0.00075,
+    0.001, 0.0015, 0.002, 0.003, 0.005, 0.0075, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0,
+)
+
+# Сборщик: функция, возвращающая строки выборок (метки, значение) при запросе
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Iterable[Sample]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class CounterChild:
+    """Счетчик для одного набора меток"""
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class GaugeChild:
+    """Текущее значение для одного набора меток"""
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class HistogramChild:
+    """Гистограмма для одного набора меток: счетчики корзин без накопления"""
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts = array("Q", bytes(8 * (len(bounds) + 1)))
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def observe_since(self, start: float) -> None:
+        """Наблюдение времени, прошедшего с perf_counter() = start"""
+        value = time.perf_counter() - start
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля с интерполяцией внутри корзины (None, если наблюдений нет)"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        rank = q * total
+        lower, below = 0.0, 0
+        for bound, count in zip(self.bounds, self.counts):
+            if below + count >= rank:
+                return lower + (bound - lower) * (rank - below) / count if count else bound
+            lower, below = bound, below + count
+        # Значение за последней границей: известна только она
+        return self.bounds[-1] if self.bounds else None
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Дочерняя метрика для значений меток (создается один раз)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def remove(self, *values: str) -> None:
+        """Удаление дочерней метрики (например, ушедшего клиента)"""
+        self._children.pop(values, None)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {repr(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _CollectedMetric:
+    """Метрика, значения которой читаются из объектов только при запросе"""
+
+    def __init__(self, name: str, documentation: str, kind: str, collector: Collector) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.collector = collector
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.collector():
+            lines.append(f"{self.name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self, name: str, documentation: str, kind: str, collector: Collector) -> None:
+        """Регистрация метрики-сборщика (заменяет прежнюю с тем же именем)"""
+        self._metrics[name] = _CollectedMetric(name, documentation, kind, collector)
+
+    def get(self, name: str) -> Optional[object]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Конвейер ввода
+FRAMES_RECEIVED = registry.counter(
+    "rg_frames_received_total", "Input frames received from clients", ("client", "transport"))
+FRAMES_REJECTED = registry.counter(
+    "rg_frames_rejected_total", "Input frames dropped before reaching a gamepad", ("transport", "reason"))
+FRAME_DECODE_SECONDS = registry.histogram(
+    "rg_frame_decode_seconds", "Time to decode and validate an input frame", ("transport",))
+SEND_EVENT_SECONDS = registry.histogram(
+    "rg_send_event_seconds", "GamepadManager.send_event time including lock wait")
+DEVICE_WRITE_SECONDS = registry.histogram(
+    "rg_device_write_seconds", "Time spent writing events to the virtual device", ("device",))
+EVDEV_EVENTS_WRITTEN = registry.counter(
+    "rg_evdev_events_written_total", "Events written to virtual devices (without SYN)", ("device",))
+INPUT_COALESCED = registry.counter(
+    "rg_input_coalesced_total", "Input events that did not change the merged gamepad state")
+INPUT_TO_WRITE_SECONDS = registry.histogram(
+    "rg_input_to_write_seconds", "Time from receiving an input frame to its last device write",
+    ("transport",), INPUT_LATENCY_BUCKETS)
+
+# Подключения
+WEBSOCKET_CONNECTIONS = registry.gauge(
+    "rg_websocket_connections", "Open WebSocket connections")
+WEBSOCKET_ACCEPTED = registry.counter(
+    "rg_websocket_accepted_total", "Accepted WebSocket connections")
+CLIENTS_SWEPT = registry.counter(
+    "rg_clients_swept_total", "Clients parked or removed by the liveness sweeper", ("action",))
+
+# Процесс
+registry.collect(
+    "process_cpu_seconds_total", "User and system CPU time of the process", "counter",
+    lambda: [({}, time.process_time())])
+
+# Метрики шины событий (rg_eventbus_*) регистрирует сама шина приложения: EventBus(metrics=registry)
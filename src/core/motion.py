@@ -0,0 +1,175 @@
+"""
+Датчики движения: бинарные пакеты от телефона и виртуальное устройство акселерометра/гироскопа
+"""
+import logging
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from evdev import UInput, AbsInfo, ecodes as e
+
+from ..core.devices import create_uinput
+from ..core.metrics import DEVICE_WRITE_SECONDS, EVDEV_EVENTS_WRITTEN
+from ..core.tracing import current_frame
+
+logger = logging.getLogger(__name__)
+
+_MOTION_WRITE = DEVICE_WRITE_SECONDS.labels("motion")
+_MOTION_EVENTS = EVDEV_EVENTS_WRITTEN.labels("motion")
+
+
+# Формат бинарного кадра WebSocket (little-endian):
+#   заголовок: тип кадра (u8), версия (u8), число сэмплов (u16)
+#   сэмпл:     t_ms, ax, ay, az (м/с²), gx, gy, gz (°/с) - 7 x float32
+MOTION_FRAME_TYPE = 0x01
+MOTION_FRAME_VERSION = 1
+MOTION_HEADER = struct.Struct("<BBH")
+MOTION_SAMPLE = struct.Struct("<7f")
+SAMPLE_FIELDS = 7
+MAX_SAMPLES_PER_FRAME = 64
+
+# Разрешение осей как у DualShock 4 (hid-playstation)
+STANDARD_GRAVITY = 9.80665
+ACCEL_RES_PER_G = 8192
+GYRO_RES_PER_DPS = 16
+ABS_LIMIT = 32767
+
+
+@dataclass
+class MotionBatch:
+    """Пачка сэмплов датчиков движения в плоском массиве float32"""
+    count: int
+    samples: array  # count * SAMPLE_FIELDS значений
+
+    def sample(self, index: int) -> Tuple[float, ...]:
+        """Сэмпл по индексу"""
+        offset = index * SAMPLE_FIELDS
+        return tuple(self.samples[offset:offset + SAMPLE_FIELDS])
+
+    def last(self) -> Tuple[float, ...]:
+        """Последний сэмпл пачки"""
+        return self.sample(self.count - 1)
+
+
+def decode_motion_frame(data: bytes) -> MotionBatch:
+    """Разбор бинарного кадра с сэмплами движения"""
+    if len(data) < MOTION_HEADER.size:
+        raise ValueError("Motion frame too short")
+
+    frame_type, version, count = MOTION_HEADER.unpack_from(data)
+    if frame_type != MOTION_FRAME_TYPE or version != MOTION_FRAME_VERSION:
+        raise ValueError(f"Unsupported motion frame: type={frame_type} version={version}")
+    if count == 0 or count > MAX_SAMPLES_PER_FRAME:
+        raise ValueError(f"Invalid motion sample count: {count}")
+    if len(data) != MOTION_HEADER.size + count * MOTION_SAMPLE.size:
+        raise ValueError("Motion frame size mismatch")
+
+    samples = array('f')
+    samples.frombytes(memoryview(data)[MOTION_HEADER.size:])
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    return MotionBatch(count=count, samples=samples)
+
+
+def _clamp(value: float) -> int:
+    return max(-ABS_LIMIT, min(ABS_LIMIT, int(value)))
+
+
+class MotionSensorDevice:
+    """Виртуальное устройство датчиков движения, парное к геймпаду"""
+
+    def __init__(self, gamepad_id: int, name: str):
+        self.gamepad_id = gamepad_id
+        self.name = f"{name} Motion Sensors"
+        self.device: Optional[UInput] = None
+        self.created_at = time.time()
+        self.samples_received = 0
+
+        accel = AbsInfo(0, -ABS_LIMIT, ABS_LIMIT, 4, 0, ACCEL_RES_PER_G)
+        gyro = AbsInfo(0, -ABS_LIMIT, ABS_LIMIT, 16, 0, GYRO_RES_PER_DPS)
+
+        self.caps = {
+            e.EV_ABS: [
+                # Акселерометр
+                (e.ABS_X, accel),
+                (e.ABS_Y, accel),
+                (e.ABS_Z, accel),
+                # Гироскоп
+                (e.ABS_RX, gyro),
+                (e.ABS_RY, gyro),
+                (e.ABS_RZ, gyro),
+            ],
+            e.EV_MSC: [e.MSC_TIMESTAMP],
+        }
+
+    async def create(self) -> bool:
+        """Создание виртуального устройства"""
+        try:
+            self.device = create_uinput(
+                self.caps,
+                name=self.name,
+                vendor=0x045e,
+                product=0x028e,
+                version=0x0110,
+                bustype=e.BUS_USB,
+                input_props=[e.INPUT_PROP_ACCELEROMETER]
+            )
+            logger.info(f"Motion sensors for gamepad {self.gamepad_id} created: {self.name}")
+            return True
+
+        except Exception as ex:
+            logger.error(f"Failed to create motion sensors for gamepad {self.gamepad_id}: {ex}")
+            return False
+
+    async def destroy(self) -> None:
+        """Уничтожение виртуального устройства"""
+        if self.device:
+            try:
+                self.device.close()
+                logger.info(f"Motion sensors for gamepad {self.gamepad_id} destroyed")
+            except Exception as ex:
+                logger.error(f"Error destroying motion sensors {self.gamepad_id}: {ex}")
+            finally:
+                self.device = None
+
+    async def send_batch(self, batch: MotionBatch) -> None:
+        """
+        Запись пачки сэмплов: каждый сэмпл - отдельный отчет со своим SYN_REPORT
+
+        Внутри одного отчета evdev видит только последнее значение каждой оси,
+        поэтому сэмплы не сливаются: устройство получает поток с частотой
+        датчиков телефона, а MSC_TIMESTAMP каждого отчета хранит время сэмпла
+        (пачка пишется разом, раз в интервал отправки клиента).
+        """
+        if not self.device:
+            return
+
+        accel_scale = ACCEL_RES_PER_G / STANDARD_GRAVITY
+        samples = batch.samples
+
+        start = time.perf_counter()
+        try:
+            write = self.device.write
+            syn = self.device.syn
+            for offset in range(0, batch.count * SAMPLE_FIELDS, SAMPLE_FIELDS):
+                t_ms, ax, ay, az, gx, gy, gz = samples[offset:offset + SAMPLE_FIELDS]
+                write(e.EV_ABS, e.ABS_X, _clamp(ax * accel_scale))
+                write(e.EV_ABS, e.ABS_Y, _clamp(ay * accel_scale))
+                write(e.EV_ABS, e.ABS_Z, _clamp(az * accel_scale))
+                write(e.EV_ABS, e.ABS_RX, _clamp(gx * GYRO_RES_PER_DPS))
+                write(e.EV_ABS, e.ABS_RY, _clamp(gy * GYRO_RES_PER_DPS))
+                write(e.EV_ABS, e.ABS_RZ, _clamp(gz * GYRO_RES_PER_DPS))
+                # MSC_TIMESTAMP - микросекунды, 32 бита с переполнением
+                write(e.EV_MSC, e.MSC_TIMESTAMP, int(t_ms * 1000) & 0x7FFFFFFF)
+                syn()
+            self.samples_received += batch.count
+            _MOTION_WRITE.observe_since(start)
+            if trace := current_frame():
+                trace.add_write(start)
+            _MOTION_EVENTS.inc(7 * batch.count)
+        except Exception as ex:
+            logger.error(f"Error sending motion batch: {ex}")
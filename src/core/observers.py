@@ -0,0 +1,143 @@
+"""
+Прореженные потоки состояния для наблюдателей (UI, логгеры, телеметрия)
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+StateProvider = Callable[[Hashable], Any]
+SampledCallback = Callable[[Dict[Hashable, Any]], Awaitable[None]]
+
+
+class _Sampler:
+    """Подписчик потока со своей частотой опроса"""
+
+    def __init__(self, handler: SampledCallback, rate_hz: float) -> None:
+        self.handler = handler
+        self.interval = 1.0 / rate_hz
+        self.seen: Dict[Hashable, int] = {}
+        self.task: Optional[asyncio.Task] = None
+
+
+class SampledStream:
+    """
+    Поток последних значений с ограниченной частотой доставки
+
+    Источник на горячем пути только помечает ключ измененным (O(1), без
+    копирования состояния). Каждый подписчик раз в 1/rate_hz секунд получает
+    снимки ключей, изменившихся с его прошлой доставки; промежуточные
+    изменения сливаются в последнее значение. Удаленный ключ доставляется
+    один раз со значением None. Стоимость наблюдения зависит от частоты
+    подписчика, а не от частоты ввода.
+    """
+
+    def __init__(self, provider: Optional[StateProvider] = None) -> None:
+        self._provider = provider
+        self._versions: Dict[Hashable, int] = {}
+        self._removed: Dict[Hashable, int] = {}
+        self._samplers: List[_Sampler] = []
+        self._counter = 0
+        self._deferred = False
+
+    def set_provider(self, provider: StateProvider) -> None:
+        """Функция, строящая снимок состояния по ключу"""
+        self._provider = provider
+
+    def mark(self, key: Hashable) -> None:
+        """Пометка ключа измененным"""
+        self._counter += 1
+        self._versions[key] = self._counter
+        if self._deferred:
+            self.ensure_running()
+
+    def forget(self, key: Hashable) -> None:
+        """Удаление ключа из потока"""
+        if self._versions.pop(key, None) is not None:
+            self._counter += 1
+            self._removed[key] = self._counter
+
+    def subscribe(self, handler: SampledCallback, rate_hz: float) -> None:
+        """Подписка с частотой доставки rate_hz"""
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+        if any(sampler.handler == handler for sampler in self._samplers):
+            return
+
+        sampler = _Sampler(handler, rate_hz)
+        self._samplers.append(sampler)
+        try:
+            sampler.task = asyncio.get_running_loop().create_task(self._run(sampler))
+        except RuntimeError:
+            # Нет запущенного цикла - задача стартует при первом mark() из цикла
+            self._deferred = True
+        logger.debug(f"Sampled subscriber added at {rate_hz} Hz")
+
+    def unsubscribe(self, handler: SampledCallback) -> None:
+        """Отписка"""
+        for sampler in list(self._samplers):
+            if sampler.handler == handler:
+                if sampler.task:
+                    sampler.task.cancel()
+                self._samplers.remove(sampler)
+
+    def ensure_running(self) -> None:
+        """Запуск отложенных задач подписчиков (вызывается из цикла событий)"""
+        self._deferred = False
+        for sampler in self._samplers:
+            if sampler.task is None or sampler.task.done():
+                sampler.task = asyncio.get_running_loop().create_task(self._run(sampler))
+
+    def stop(self) -> None:
+        """Остановка всех задач подписчиков"""
+        for sampler in self._samplers:
+            if sampler.task:
+                sampler.task.cancel()
+                sampler.task = None
+        self._deferred = bool(self._samplers)
+
+    def _collect(self, sampler: _Sampler) -> Dict[Hashable, Any]:
+        """Снимки ключей, изменившихся с прошлой доставки подписчику"""
+        changed: Dict[Hashable, Any] = {}
+        seen = sampler.seen
+
+        for key, version in self._versions.items():
+            if seen.get(key) != version:
+                seen[key] = version
+                changed[key] = self._provider(key) if self._provider else None
+
+        for key, version in self._removed.items():
+            if key in seen and seen[key] < version:
+                del seen[key]
+                changed[key] = None
+
+        # Удаленные ключи, которые уже видели все подписчики, больше не нужны
+        if self._removed and all(
+            not any(key in s.seen for s in self._samplers) for key in self._removed
+        ):
+            self._removed.clear()
+
+        return changed
+
+    async def _run(self, sampler: _Sampler) -> None:
+        """Цикл доставки одного подписчика"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += sampler.interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+            changed = self._collect(sampler)
+            if not changed:
+                continue
+
+            try:
+                await sampler.handler(changed)
+            except Exception as e:
+                logger.error(f"Error in sampled stream handler: {e}", exc_info=True)
+
+            # Медленный подписчик пропускает тики, а не копит их
+            now = loop.time()
+            if next_tick < now:
+                next_tick = now
@@ -0,0 +1,115 @@
+"""
+Сэмплирующий профилировщик работающего процесса
+
+Отдельный поток с заданным интервалом снимает стеки всех потоков через
+sys._current_frames() и считает одинаковые стеки. Результат - свернутые
+стеки (формат collapsed: "поток;внешняя;...;внутренняя N"), которые
+принимают flamegraph.pl, speedscope и inferno. Код процесса не
+инструментируется, поэтому профилировщик можно включить посреди игры.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_DURATION = 60.0
+MIN_INTERVAL = 0.001
+MAX_DEPTH = 128
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Сбор стеков всех потоков процесса в фоновом потоке"""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = max(MIN_INTERVAL, interval)
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code) -> str:
+        # Подписи кэшируются по объекту кода: форматирование не попадает в каждый сэмпл
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(f"thread:{names.get(ident, ident)}")
+            self._stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            self._sample()
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # Не догоняем пропущенные тики, если процесс был занят
+                next_tick = time.perf_counter()
+
+    def start(self) -> None:
+        """Запуск сбора"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rg-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановка сбора"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self) -> str:
+        """Свернутые стеки, самые частые сверху"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+_active = False
+
+
+async def profile(duration: float, interval: float = 0.005) -> str:
+    """Профилирование процесса в течение duration секунд (одно одновременно)"""
+    global _active
+
+    if not 0 < duration <= MAX_DURATION:
+        raise ValueError(f"Duration must be in (0, {MAX_DURATION}] seconds")
+    if _active:
+        raise RuntimeError("Profiler is already running")
+
+    _active = True
+    profiler = SamplingProfiler(interval)
+    logger.info(f"Sampling profiler started for {duration}s every {profiler.interval * 1000:.1f}ms")
+    profiler.start()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        profiler.stop()
+        _active = False
+    logger.info(f"Sampling profiler finished: {profiler.samples} samples")
+    return profiler.collapsed()
@@ -0,0 +1,79 @@
+"""
+Среда выполнения: единственный цикл событий процесса
+
+Точки входа (gui_main.py, main.py, python -m src.api.process) запускают
+главную корутину через run(). Цикл создается здесь (uvloop, если он
+установлен и выбран), и все менеджеры, блокировки, очереди и задачи
+создаются уже внутри него, а не там, где объект впервые сконструирован.
+"""
+import asyncio
+import concurrent.futures
+import logging
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LOOP_KINDS = ("auto", "uvloop", "asyncio")
+
+_owner: Optional[asyncio.AbstractEventLoop] = None
+
+
+def uvloop_available() -> bool:
+    """Установлен ли uvloop"""
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_loop_kind(kind: Optional[str] = None) -> str:
+    """Итоговый тип цикла с учетом настройки и установленных пакетов"""
+    kind = (kind or settings.event_loop).lower()
+    if kind not in LOOP_KINDS:
+        raise ValueError(f"Unknown event loop kind: {kind}")
+
+    if kind == "auto":
+        return "uvloop" if uvloop_available() else "asyncio"
+    if kind == "uvloop" and not uvloop_available():
+        logger.warning("uvloop requested but not installed, falling back to asyncio")
+        return "asyncio"
+    return kind
+
+
+def loop_factory(kind: Optional[str] = None) -> Callable[[], asyncio.AbstractEventLoop]:
+    """Фабрика циклов событий выбранного типа"""
+    if resolve_loop_kind(kind) == "uvloop":
+        import uvloop
+        return uvloop.new_event_loop
+    return asyncio.new_event_loop
+
+
+def run(main: Coroutine[Any, Any, T], kind: Optional[str] = None) -> T:
+    """Запуск главной корутины процесса в собственном цикле"""
+    global _owner
+
+    resolved = resolve_loop_kind(kind)
+    with asyncio.Runner(loop_factory=loop_factory(resolved)) as runner:
+        _owner = runner.get_loop()
+        logger.info(f"Event loop: {resolved} ({type(_owner).__module__}.{type(_owner).__name__})")
+        try:
+            return runner.run(main)
+        finally:
+            _owner = None
+
+
+def owner_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Цикл, которым владеет процесс (None вне run())"""
+    return _owner
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+    """Выполнение корутины в цикле процесса из другого потока"""
+    if _owner is None:
+        raise RuntimeError("Runtime event loop is not running")
+    return asyncio.run_coroutine_threadsafe(coro, _owner)
@@ -0,0 +1,82 @@
+"""
+Возобновляемые сессии клиентов
+
+При подключении клиент получает токен возобновления. Если страница ушла
+в фон или соединение оборвалось, клиент не удаляется, а паркуется: его ввод
+сбрасывается в нейтраль, виртуальный геймпад остается на месте. Повторный
+/connect с client_id и токеном в течение grace секунд возвращает тот же
+client_id и геймпад одним запросом; истекшие сессии забирает периодический
+обход сервера, и клиент удаляется как при обычном отключении.
+"""
+import hmac
+import logging
+import secrets
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """Токены возобновления и время парковки клиентов (time.monotonic)"""
+
+    def __init__(self, grace: float) -> None:
+        self.grace = grace
+        self._tokens: Dict[str, str] = {}
+        self._parked: Dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.grace > 0
+
+    def issue(self, client_id: str) -> str:
+        """Новый токен клиента"""
+        token = secrets.token_urlsafe(24)
+        self._tokens[client_id] = token
+        return token
+
+    def verify(self, client_id: str, token: Optional[str]) -> bool:
+        """Проверка токена (сравнение за постоянное время)"""
+        expected = self._tokens.get(client_id)
+        if expected is None or not token:
+            return False
+        return hmac.compare_digest(expected.encode(), token.encode())
+
+    def token_of(self, client_id: str) -> Optional[str]:
+        return self._tokens.get(client_id)
+
+    def is_parked(self, client_id: str) -> bool:
+        return client_id in self._parked
+
+    def park(self, client_id: str) -> bool:
+        """Парковка клиента: сессия ждет его grace секунд"""
+        if not self.enabled or client_id not in self._tokens:
+            return False
+        self._parked.setdefault(client_id, time.monotonic())
+        return True
+
+    def resume(self, client_id: str, token: Optional[str]) -> bool:
+        """Возобновление сессии по токену (в том числе еще не припаркованной)"""
+        if not self.verify(client_id, token):
+            return False
+        self._parked.pop(client_id, None)
+        return True
+
+    def expired(self, now: Optional[float] = None) -> List[str]:
+        """Клиенты, не вернувшиеся за grace секунд (их сессии забываются)"""
+        deadline = (time.monotonic() if now is None else now) - self.grace
+        expired = [client_id for client_id, parked_at in self._parked.items() if parked_at <= deadline]
+        for client_id in expired:
+            self.drop(client_id)
+        if expired:
+            logger.info(f"{len(expired)} parked sessions expired after {self.grace:.0f}s")
+        return expired
+
+    def drop(self, client_id: str) -> None:
+        """Забыть сессию (клиент отключился явно или удален)"""
+        self._tokens.pop(client_id, None)
+        self._parked.pop(client_id, None)
+
+    def clear(self) -> None:
+        self._parked.clear()
+        self._tokens.clear()
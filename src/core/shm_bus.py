@@ -0,0 +1,373 @@
+"""
+Кольцевой буфер событий в разделяемой памяти для потребителей из других процессов
+"""
+import json
+import logging
+import os
+import struct
+import time
+from dataclasses import asdict, is_dataclass
+from enum import Enum
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from ..core.events import EventBus
+from ..utils.types import GamepadStateSnapshot, Topic
+
+logger = logging.getLogger(__name__)
+
+
+# Заголовок буфера: magic, версия, размер записи, емкость,
+# длина и поколение раскладки состояния, последний seq, PID писателя
+RING_MAGIC = 0x52475242  # "RGRB"
+RING_VERSION = 2
+HEADER = struct.Struct("<IHHIHHQ")
+HEADER_SIZE = 64
+LAYOUT_LEN_OFFSET = 12
+WRITE_SEQ_OFFSET = 16
+OWNER_PID_OFFSET = 24
+SEQ = struct.Struct("<Q")
+OWNER_PID = struct.Struct("<I")
+LAYOUT_HEAD = struct.Struct("<HH")
+
+# Раскладка состояния геймпада (JSON с именами кнопок и осей) хранится
+# один раз в заголовке, а не в каждой записи
+LAYOUT_SIZE = 1024
+RECORDS_OFFSET = HEADER_SIZE + LAYOUT_SIZE
+
+# Запись: seq (пишется последним - признак готовности), время,
+# номер темы (Topic), кодировка данных, длина данных, данные
+RECORD_HEAD = struct.Struct("<QdHBxH")
+
+ENCODING_JSON = 0
+ENCODING_STATE = 1
+
+# Упакованное состояние геймпада: id, число кнопок, число осей,
+# битовая маска кнопок, затем значения осей (int32)
+STATE_HEAD = struct.Struct("<HBBQ")
+MAX_STATE_BUTTONS = 64
+
+DEFAULT_RECORD_SIZE = 512
+DEFAULT_CAPACITY = 4096
+
+
+class RingRecord(NamedTuple):
+    """Прочитанная запись кольцевого буфера"""
+    seq: int
+    timestamp: float
+    topic: int
+    encoding: int
+    payload: bytes
+
+    def json(self) -> Any:
+        """Данные записи как JSON"""
+        return json.loads(self.payload)
+
+
+class PackedGamepadState(NamedTuple):
+    """Упакованное состояние геймпада из кольцевого буфера"""
+    gamepad_id: int
+    button_mask: int
+    axes: Tuple[int, ...]
+
+    def buttons(self, names: List[str]) -> Dict[str, int]:
+        """Кнопки по именам из раскладки"""
+        return {name: (self.button_mask >> index) & 1 for index, name in enumerate(names)}
+
+
+def pack_gamepad_state(gamepad_id: int, buttons: List[int], axes: List[int]) -> bytes:
+    """Упаковка состояния геймпада в запись фиксированного формата"""
+    mask = 0
+    for index, value in enumerate(buttons[:MAX_STATE_BUTTONS]):
+        if value:
+            mask |= 1 << index
+    head = STATE_HEAD.pack(gamepad_id, min(len(buttons), MAX_STATE_BUTTONS), len(axes), mask)
+    return head + struct.pack(f"<{len(axes)}i", *axes)
+
+
+def unpack_gamepad_state(payload: bytes) -> PackedGamepadState:
+    """Разбор упакованного состояния геймпада"""
+    gamepad_id, _, axis_count, mask = STATE_HEAD.unpack_from(payload)
+    axes = struct.unpack_from(f"<{axis_count}i", payload, STATE_HEAD.size)
+    return PackedGamepadState(gamepad_id, mask, axes)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Подключение к существующему сегменту без регистрации в resource_tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    except TypeError:
+        # Python < 3.13: параметра track нет
+        return shared_memory.SharedMemory(name=name, create=False)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+def _create_owned(name: str, size: int, pid_offset: int) -> shared_memory.SharedMemory:
+    """
+    Создание сегмента писателя с PID владельца в заголовке (по смещению pid_offset)
+
+    Сегмент с тем же именем забирается, только если записанный в нем
+    владелец завершился (остался от аварийно завершенного процесса). Если
+    владелец жив или неизвестен, FileExistsError: чужой сегмент не удаляется.
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        stale = _attach(name)
+        try:
+            owner = 0
+            if stale.size >= pid_offset + OWNER_PID.size:
+                owner = OWNER_PID.unpack_from(stale.buf, pid_offset)[0]
+            if not owner:
+                raise FileExistsError(
+                    f"Shared memory segment {name} already exists and has no owner PID; "
+                    f"remove /dev/shm/{name} if no other RemoteGamepad server is running"
+                )
+            if _pid_alive(owner):
+                raise FileExistsError(f"Shared memory segment {name} is in use by process {owner}")
+            logger.warning(f"Reclaiming shared memory segment {name} left by dead process {owner}")
+            stale.unlink()
+        finally:
+            stale.close()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    OWNER_PID.pack_into(shm.buf, pid_offset, os.getpid())
+    return shm
+
+
+class SharedMemoryRing:
+    """
+    Кольцевой буфер записей фиксированного размера (один писатель)
+
+    Писатель никогда не ждет читателей: при отставании читатель теряет
+    самые старые записи и узнает об этом по разрыву в seq.
+    """
+
+    def __init__(self, name: str, capacity: int = DEFAULT_CAPACITY,
+                 record_size: int = DEFAULT_RECORD_SIZE) -> None:
+        if record_size <= RECORD_HEAD.size:
+            raise ValueError("record_size too small")
+
+        self.name = name
+        self.capacity = capacity
+        self.record_size = record_size
+        self.max_payload = record_size - RECORD_HEAD.size
+        size = RECORDS_OFFSET + capacity * record_size
+        self._shm = _create_owned(name, size, OWNER_PID_OFFSET)
+        self._buf = self._shm.buf
+        self._seq = 0
+        self._layout_gen = 0
+        self.dropped = 0
+
+        HEADER.pack_into(self._buf, 0, RING_MAGIC, RING_VERSION, record_size, capacity, 0, 0, 0)
+        logger.info(f"Shared memory ring {name} created: {capacity} x {record_size} bytes")
+
+    def set_layout(self, layout: bytes) -> None:
+        """Запись раскладки состояния геймпада в заголовок"""
+        if len(layout) > LAYOUT_SIZE:
+            raise ValueError("Layout too large")
+        self._buf[HEADER_SIZE:HEADER_SIZE + len(layout)] = layout
+        self._layout_gen = (self._layout_gen + 1) & 0xFFFF
+        LAYOUT_HEAD.pack_into(self._buf, LAYOUT_LEN_OFFSET, len(layout), self._layout_gen)
+
+    def publish(self, topic: int, payload: bytes, encoding: int = ENCODING_JSON,
+                timestamp: Optional[float] = None) -> bool:
+        """Запись события в буфер"""
+        if len(payload) > self.max_payload:
+            self.dropped += 1
+            logger.warning(f"Ring payload too large for topic {topic}: {len(payload)} bytes")
+            return False
+
+        seq = self._seq + 1
+        offset = RECORDS_OFFSET + ((seq - 1) % self.capacity) * self.record_size
+        buf = self._buf
+
+        # seq = 0 помечает запись как незаконченную, пока пишутся данные
+        RECORD_HEAD.pack_into(
+            buf, offset, 0, timestamp if timestamp is not None else time.time(),
+            topic, encoding, len(payload)
+        )
+        start = offset + RECORD_HEAD.size
+        buf[start:start + len(payload)] = payload
+        SEQ.pack_into(buf, offset, seq)
+        SEQ.pack_into(buf, WRITE_SEQ_OFFSET, seq)
+
+        self._seq = seq
+        return True
+
+    def close(self) -> None:
+        """Закрытие и удаление сегмента"""
+        self._buf = None
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info(f"Shared memory ring {self.name} removed")
+
+
+class SharedMemoryRingReader:
+    """Читатель кольцевого буфера из другого процесса"""
+
+    def __init__(self, name: str, from_start: bool = False) -> None:
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+
+        magic, version, record_size, capacity, _, _, _ = HEADER.unpack_from(self._buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            self._shm.close()
+            raise ValueError(f"Segment {name} is not a RemoteGamepad event ring")
+
+        self.record_size = record_size
+        self.capacity = capacity
+        self.lost = 0
+        self._layout_gen = -1
+        self._layout: Optional[Dict[str, List[str]]] = None
+        # По умолчанию читаем только новые события
+        self._next = 1 if from_start else self.write_seq + 1
+
+    @property
+    def write_seq(self) -> int:
+        """Номер последней опубликованной записи"""
+        return SEQ.unpack_from(self._buf, WRITE_SEQ_OFFSET)[0]
+
+    @property
+    def layout(self) -> Optional[Dict[str, List[str]]]:
+        """Раскладка состояния геймпада: {"buttons": [...], "axes": [...]}"""
+        length, generation = LAYOUT_HEAD.unpack_from(self._buf, LAYOUT_LEN_OFFSET)
+        if generation != self._layout_gen:
+            self._layout_gen = generation
+            self._layout = json.loads(bytes(self._buf[HEADER_SIZE:HEADER_SIZE + length])) if length else None
+        return self._layout
+
+    def poll(self, max_records: int = 1024) -> List[RingRecord]:
+        """Новые записи с прошлого вызова (без блокировки и без участия писателя)"""
+        head = self.write_seq
+        if head < self._next:
+            return []
+
+        # Писатель обогнал читателя больше чем на кольцо
+        oldest = head - self.capacity + 1
+        if self._next < oldest:
+            self.lost += oldest - self._next
+            self._next = oldest
+
+        records: List[RingRecord] = []
+        buf = self._buf
+        while self._next <= head and len(records) < max_records:
+            seq = self._next
+            self._next += 1
+            offset = RECORDS_OFFSET + ((seq - 1) % self.capacity) * self.record_size
+
+            record_seq, timestamp, topic, encoding, payload_len = RECORD_HEAD.unpack_from(buf, offset)
+            if record_seq != seq:
+                self.lost += 1
+                continue
+
+            start = offset + RECORD_HEAD.size
+            payload = bytes(buf[start:start + payload_len])
+
+            # Запись перезаписали во время чтения
+            if SEQ.unpack_from(buf, offset)[0] != seq:
+                self.lost += 1
+                continue
+
+            records.append(RingRecord(seq, timestamp, topic, encoding, payload))
+
+        return records
+
+    def close(self) -> None:
+        """Отключение от сегмента (сегмент не удаляется)"""
+        self._buf = None
+        self._shm.close()
+
+
+def _to_jsonable(data: Any) -> Any:
+    if is_dataclass(data):
+        data = asdict(data)
+    if isinstance(data, dict):
+        return {key: _to_jsonable(value) for key, value in data.items()}
+    if isinstance(data, Enum):
+        return data.value
+    if isinstance(data, (list, tuple)):
+        return [_to_jsonable(value) for value in data]
+    return data
+
+
+class SharedMemoryEventTransport:
+    """
+    Публикация событий EventBus в кольцевой буфер разделяемой памяти
+
+    GUI, запись сессий и экспорт метрик могут читать события из своих
+    процессов через SharedMemoryRingReader, не касаясь цикла событий сервера.
+    Состояние геймпадов публикуется через прореженный поток с частотой
+    gamepad_state_rate_hz и пишется упакованной записью (ENCODING_STATE),
+    имена кнопок и осей лежат один раз в раскладке заголовка.
+    """
+
+    def __init__(self, event_bus: EventBus, name: str, capacity: int = DEFAULT_CAPACITY,
+                 record_size: int = DEFAULT_RECORD_SIZE, gamepad_state_rate_hz: float = 30.0) -> None:
+        self._event_bus = event_bus
+        self._name = name
+        self._capacity = capacity
+        self._record_size = record_size
+        self._state_rate = gamepad_state_rate_hz
+        self.ring: Optional[SharedMemoryRing] = None
+        self._layout: Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]] = None
+
+    def start(self) -> None:
+        """Создание буфера и подписка на события"""
+        if self.ring:
+            return
+        self.ring = SharedMemoryRing(self._name, self._capacity, self._record_size)
+        self._event_bus.subscribe_all(self._on_event)
+        if self._state_rate > 0:
+            self._event_bus.subscribe_gamepad_sampled(self._on_gamepad_states, self._state_rate)
+
+    def close(self) -> None:
+        """Отписка и удаление буфера"""
+        if not self.ring:
+            return
+        self._event_bus.unsubscribe_all(self._on_event)
+        self._event_bus.unsubscribe_gamepad_sampled(self._on_gamepad_states)
+        self.ring.close()
+        self.ring = None
+        self._layout = None
+
+    def _publish(self, topic: Topic, data: Any) -> None:
+        payload = json.dumps(_to_jsonable(data), separators=(",", ":")).encode()
+        self.ring.publish(topic, payload)
+
+    def _publish_state(self, state: GamepadStateSnapshot) -> None:
+        layout = (tuple(state.buttons), tuple(state.axes))
+        if layout != self._layout:
+            self._layout = layout
+            self.ring.set_layout(json.dumps(
+                {"buttons": list(layout[0]), "axes": list(layout[1])}, separators=(",", ":")
+            ).encode())
+        payload = pack_gamepad_state(state.gamepad_id, list(state.buttons.values()), list(state.axes.values()))
+        self.ring.publish(Topic.GAMEPAD_STATE, payload, ENCODING_STATE, state.timestamp)
+
+    async def _on_event(self, event_type: Topic, data: Any) -> None:
+        """Глобальный обработчик EventBus"""
+        if self.ring:
+            self._publish(event_type, data)
+
+    async def _on_gamepad_states(self, states: Dict[int, Any]) -> None:
+        """Прореженное состояние геймпадов"""
+        if not self.ring:
+            return
+        for gamepad_id, state in states.items():
+            if state is None:
+                self._publish(Topic.GAMEPAD_REMOVED, {"gamepad_id": gamepad_id})
+            else:
+                self._publish_state(state)
@@ -0,0 +1,88 @@
+"""
+Статус сервера, обновляемый по событиям клиентов
+"""
+import logging
+from typing import Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from ..core.events import EventBus
+from ..utils.types import ClientInfo, ClientStatus, Topic
+
+logger = logging.getLogger(__name__)
+
+
+class StatusTracker:
+    """
+    Снимок статуса без блокировок менеджеров
+
+    Подключение, отключение и любое изменение клиента увеличивают version
+    и сбрасывают кэш. Счетчики по статусам берутся из индексов, которые
+    менеджер клиентов (или роутер шардов) поддерживает при каждом изменении,
+    поэтому /status не перестраивает список клиентов. Читатели получают
+    сериализованный ответ за O(1), пока ничего не изменилось, а по version,
+    числу геймпадов и состоянию сервера строят ETag для условных запросов.
+    Список клиентов (снимок для GUI) собирается лениво, один раз на версию.
+    """
+
+    def __init__(
+        self,
+        event_bus: EventBus,
+        clients: Callable[[], Iterable[ClientInfo]],
+        counts: Callable[[], Mapping[ClientStatus, int]],
+        gamepads: Callable[[], int],
+        running: Callable[[], bool],
+    ) -> None:
+        self.version = 0
+        self._source_clients = clients
+        self._source_counts = counts
+        self._source_gamepads = gamepads
+        self._source_running = running
+        self._clients: Optional[List[ClientInfo]] = None
+        self._serialized: Optional[Tuple[Hashable, bytes]] = None
+
+        for topic in (t for t in Topic if t.is_client):
+            event_bus.subscribe_client(topic, self._on_client_event)
+
+    async def _on_client_event(self, client_info: ClientInfo) -> None:
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Отметка об изменении списка клиентов"""
+        self.version += 1
+        self._clients = None
+
+    def clients(self) -> List[ClientInfo]:
+        """Текущие клиенты (список перестраивается только после изменений)"""
+        if self._clients is None:
+            # Отключенные клиенты не показываются, даже если источник их еще отдает
+            self._clients = [
+                client for client in self._source_clients()
+                if client.status != ClientStatus.DISCONNECTED
+            ]
+        return self._clients
+
+    def status_counts(self) -> Dict[str, int]:
+        """Видимые клиенты по статусам (отключенные не считаются)"""
+        return {
+            status.value: count for status, count in self._source_counts().items()
+            if status != ClientStatus.DISCONNECTED and count
+        }
+
+    def client_count(self) -> int:
+        """Количество видимых клиентов"""
+        return sum(self.status_counts().values())
+
+    def gamepad_count(self) -> int:
+        """Количество геймпадов"""
+        return self._source_gamepads()
+
+    def etag(self) -> str:
+        """Слабый ETag снимка (время работы в нем не учитывается)"""
+        return f'W/"{self.version}.{self.gamepad_count()}.{int(self._source_running())}"'
+
+    def serialized(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        """Сериализованный ответ, пересобираемый только при смене версии или ключа"""
+        full_key = (self.version, key)
+        if self._serialized is None or self._serialized[0] != full_key:
+            self._serialized = (full_key, build())
+        return self._serialized[1]
+
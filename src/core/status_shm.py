@@ -0,0 +1,125 @@
+"""
+Снимок статуса сервера в разделяемой памяти (seqlock, один писатель)
+"""
+import json
+import logging
+import struct
+import time
+from typing import Any, Dict, Optional
+
+from ..core.shm_bus import _attach, _create_owned
+
+logger = logging.getLogger(__name__)
+
+
+# Заголовок: magic, версия формата, счетчик seqlock, длина данных, PID писателя
+STATUS_MAGIC = 0x52475353  # "RGSS"
+STATUS_VERSION = 1
+STATUS_HEADER = struct.Struct("<IHxxQI")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+LENGTH = struct.Struct("<I")
+LENGTH_OFFSET = 16
+OWNER_PID_OFFSET = 20
+DATA_OFFSET = 64
+
+READ_RETRIES = 100
+
+
+class StatusSnapshotWriter:
+    """
+    Публикация снимка статуса (JSON) для процесса GUI
+
+    Счетчик нечетный, пока идет запись: читатель повторяет чтение, если
+    счетчик нечетный или изменился за время копирования. Писатель никогда
+    не ждет читателя.
+    """
+
+    def __init__(self, name: str, size: int = 65536) -> None:
+        self.name = name
+        self.size = size
+        self._shm = _create_owned(name, size, OWNER_PID_OFFSET)
+        self._buf = self._shm.buf
+        self._seq = 0
+        STATUS_HEADER.pack_into(self._buf, 0, STATUS_MAGIC, STATUS_VERSION, 0, 0)
+        logger.info(f"Status snapshot segment {name} created ({size} bytes)")
+
+    def publish(self, snapshot: Dict[str, Any]) -> bool:
+        """Запись нового снимка"""
+        data = json.dumps(snapshot, separators=(",", ":")).encode()
+        if len(data) > self.size - DATA_OFFSET:
+            logger.warning(f"Status snapshot too large: {len(data)} bytes")
+            return False
+
+        buf = self._buf
+        self._seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+        buf[DATA_OFFSET:DATA_OFFSET + len(data)] = data
+        LENGTH.pack_into(buf, LENGTH_OFFSET, len(data))
+        self._seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+        return True
+
+    def close(self) -> None:
+        """Закрытие и удаление сегмента"""
+        self._buf = None
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info(f"Status snapshot segment {self.name} removed")
+
+
+class StatusSnapshotReader:
+    """Чтение снимка статуса из другого процесса"""
+
+    def __init__(self, name: str) -> None:
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+
+        magic, version, _, _ = STATUS_HEADER.unpack_from(self._buf, 0)
+        if magic != STATUS_MAGIC or version != STATUS_VERSION:
+            self._shm.close()
+            raise ValueError(f"Segment {name} is not a RemoteGamepad status snapshot")
+
+        self._seen = 0
+        self._cached: Optional[Dict[str, Any]] = None
+
+    @property
+    def seq(self) -> int:
+        """Счетчик изменений снимка"""
+        return SEQ.unpack_from(self._buf, SEQ_OFFSET)[0]
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """Последний согласованный снимок (None, если еще не опубликован)"""
+        buf = self._buf
+        for _ in range(READ_RETRIES):
+            before = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if before == 0:
+                return None
+            if before & 1:
+                time.sleep(0)
+                continue
+            if before == self._seen:
+                return self._cached
+
+            length = LENGTH.unpack_from(buf, LENGTH_OFFSET)[0]
+            data = bytes(buf[DATA_OFFSET:DATA_OFFSET + length])
+            if SEQ.unpack_from(buf, SEQ_OFFSET)[0] != before:
+                continue
+
+            self._seen = before
+            self._cached = json.loads(data)
+            return self._cached
+
+        return self._cached
+
+    def changed(self) -> bool:
+        """Появился ли новый снимок с прошлого read()"""
+        return self.seq != self._seen
+
+    def close(self) -> None:
+        """Отключение от сегмента (сегмент не удаляется)"""
+        self._buf = None
+        self._shm.close()
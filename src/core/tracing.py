@@ -0,0 +1,221 @@
+"""
+Сквозная трассировка кадров ввода
+
+Каждый входящий кадр получает запись FrameTrace, которая едет вместе с
+обработкой через contextvar: сервер отмечает получение и разбор, менеджер
+геймпадов - ожидание блокировки (передачу кадра общему менеджеру) и время
+отправки событий, устройства - запись и SYN. По завершении кадра стадии
+попадают в гистограммы клиента (rg_frame_stage_seconds), а самые медленные
+кадры - в кольцевой буфер с разбивкой по стадиям.
+
+Вместе с задержкой сервера в записи хранится интервал с предыдущим кадром
+клиента и разница с временной меткой клиента: если сервер обработал кадр
+быстро, а интервал большой, задержка была в сети или на телефоне.
+"""
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..core.metrics import INPUT_LATENCY_BUCKETS, HistogramChild, registry
+
+# Стадии в порядке прохождения кадра
+STAGES = ("decode", "queue", "map", "write", "total")
+
+FRAME_STAGE_SECONDS = registry.histogram(
+    "rg_frame_stage_seconds", "Per-frame latency by pipeline stage", ("client", "stage"),
+    INPUT_LATENCY_BUCKETS)
+
+# Окно, за которое в кольцо попадает самый медленный кадр
+SLOW_WINDOW = 1.0
+
+_current: ContextVar[Optional["FrameTrace"]] = ContextVar("rg_frame_trace", default=None)
+
+
+def current_frame() -> Optional["FrameTrace"]:
+    """Трассировка кадра, который сейчас обрабатывается (None - вне кадра)"""
+    return _current.get()
+
+
+class FrameTrace:
+    """Отметки времени одного кадра (perf_counter, секунды)"""
+    __slots__ = (
+        "client_id", "transport", "received", "received_wall", "client_timestamp", "gap",
+        "decoded", "handoff", "written", "finished", "queue", "dispatch", "write", "events", "_token",
+    )
+
+    def __init__(self, client_id: str, transport: str, received: float,
+                 client_timestamp: Optional[float] = None) -> None:
+        self.client_id = client_id
+        self.transport = transport
+        self.received = received
+        self.received_wall = time.time()
+        self.client_timestamp = client_timestamp  # мс от клиента (Date.now())
+        self.gap: Optional[float] = None
+        self.decoded = received
+        self.handoff: Optional[float] = None  # первый захват блокировки менеджера
+        self.written: Optional[float] = None  # последний SYN
+        self.finished = received
+        # Накопленные длительности по событиям кадра
+        self.queue = 0.0
+        self.dispatch = 0.0
+        self.write = 0.0
+        self.events = 0
+        self._token: Any = None
+
+    def add_queue(self, waited_since: float) -> None:
+        """Ожидание блокировки менеджера закончилось"""
+        now = time.perf_counter()
+        if self.handoff is None:
+            self.handoff = now
+        self.queue += now - waited_since
+
+    def add_dispatch(self, seconds: float) -> None:
+        self.dispatch += seconds
+        self.events += 1
+
+    def add_write(self, started: float) -> None:
+        """Запись в устройство и SYN завершены"""
+        now = time.perf_counter()
+        self.written = now
+        self.write += now - started
+
+    def stages(self) -> Tuple[float, ...]:
+        """Длительности стадий в порядке STAGES"""
+        decode = self.decoded - self.received
+        mapping = max(0.0, self.dispatch - self.queue - self.write)
+        return decode, self.queue, mapping, self.write, self.finished - self.received
+
+    def to_dict(self) -> Dict[str, Any]:
+        def offset(t: Optional[float]) -> Optional[float]:
+            return round((t - self.received) * 1000, 4) if t is not None else None
+
+        return {
+            "client_id": self.client_id,
+            "transport": self.transport,
+            "received_at": self.received_wall,
+            "events": self.events,
+            "stages_ms": {name: round(value * 1000, 4) for name, value in zip(STAGES, self.stages())},
+            # Отметки относительно получения кадра
+            "timeline_ms": {
+                "decoded": offset(self.decoded),
+                "handoff": offset(self.handoff),
+                "written": offset(self.written),
+                "finished": offset(self.finished),
+            },
+            "gap_ms": round(self.gap * 1000, 3) if self.gap is not None else None,
+            # Часы клиента не синхронизированы с сервером: важна динамика, а не абсолютное значение
+            "client_offset_ms": (
+                round(self.received_wall * 1000 - self.client_timestamp, 3)
+                if self.client_timestamp is not None else None
+            ),
+        }
+
+
+class _ClientStages:
+    __slots__ = ("histograms", "last_received", "frames", "max_gap")
+
+    def __init__(self, client_id: str) -> None:
+        self.histograms: Tuple[HistogramChild, ...] = tuple(
+            FRAME_STAGE_SECONDS.labels(client_id, stage) for stage in STAGES
+        )
+        self.last_received: Optional[float] = None
+        self.frames = 0
+        self.max_gap = 0.0
+
+
+class FrameTracer:
+    """Сбор трассировок: гистограммы по клиентам и кольцо медленных кадров"""
+
+    def __init__(self, enabled: bool = True, slow_frames: int = 64) -> None:
+        self.enabled = enabled
+        self._clients: Dict[str, _ClientStages] = {}
+        self._slow: Deque[FrameTrace] = deque(maxlen=slow_frames)
+        self._window_start = 0.0
+        self._window_slowest: Optional[FrameTrace] = None
+
+    def begin(self, client_id: str, transport: str, received: float, decoded: Optional[float] = None,
+              client_timestamp: Optional[float] = None) -> Optional[FrameTrace]:
+        """Начало кадра после разбора: запись становится текущей для этой задачи"""
+        if not self.enabled:
+            return None
+        trace = FrameTrace(client_id, transport, received, client_timestamp)
+        if decoded is not None:
+            trace.decoded = decoded
+        trace._token = _current.set(trace)
+        return trace
+
+    def finish(self, trace: Optional[FrameTrace]) -> None:
+        """Кадр обработан: учет в гистограммах и выбор медленных"""
+        if trace is None:
+            return
+        _current.reset(trace._token)
+        trace._token = None
+        trace.finished = time.perf_counter()
+
+        client = self._clients.get(trace.client_id)
+        if client is None:
+            client = self._clients[trace.client_id] = _ClientStages(trace.client_id)
+        if client.last_received is not None:
+            trace.gap = trace.received - client.last_received
+            if trace.gap > client.max_gap:
+                client.max_gap = trace.gap
+        client.last_received = trace.received
+        client.frames += 1
+
+        for histogram, value in zip(client.histograms, trace.stages()):
+            histogram.observe(value)
+
+        # Самый медленный кадр каждого окна уходит в кольцо
+        if trace.finished - self._window_start >= SLOW_WINDOW:
+            if self._window_slowest is not None:
+                self._slow.append(self._window_slowest)
+            self._window_start = trace.finished
+            self._window_slowest = trace
+        elif self._window_slowest is None or trace.finished - trace.received > (
+                self._window_slowest.finished - self._window_slowest.received):
+            self._window_slowest = trace
+
+    def abandon(self, trace: Optional[FrameTrace]) -> None:
+        """Кадр отклонен: запись снимается без учета"""
+        if trace is not None and trace._token is not None:
+            _current.reset(trace._token)
+            trace._token = None
+
+    def forget(self, client_id: str) -> None:
+        """Удаление данных ушедшего клиента"""
+        if self._clients.pop(client_id, None) is not None:
+            for stage in STAGES:
+                FRAME_STAGE_SECONDS.remove(client_id, stage)
+
+    def slowest(self, limit: Optional[int] = None) -> List[FrameTrace]:
+        """Медленные недавние кадры, самые медленные первыми"""
+        frames = list(self._slow)
+        if self._window_slowest is not None:
+            frames.append(self._window_slowest)
+        frames.sort(key=lambda trace: trace.finished - trace.received, reverse=True)
+        return frames[:limit] if limit else frames
+
+    def snapshot(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Сводка для эндпоинта и GUI: квантили стадий по клиентам и медленные кадры"""
+        clients = {}
+        for client_id, client in self._clients.items():
+            stages = {}
+            for stage, histogram in zip(STAGES, client.histograms):
+                p50, p99 = histogram.quantile(0.5), histogram.quantile(0.99)
+                stages[stage] = {
+                    "p50_ms": round(p50 * 1000, 4) if p50 is not None else None,
+                    "p99_ms": round(p99 * 1000, 4) if p99 is not None else None,
+                    "mean_ms": round(histogram.sum / client.frames * 1000, 4) if client.frames else None,
+                }
+            clients[client_id] = {
+                "frames": client.frames,
+                "max_gap_ms": round(client.max_gap * 1000, 3),
+                "stages": stages,
+            }
+        return {
+            "enabled": self.enabled,
+            "stages": list(STAGES),
+            "clients": clients,
+            "slowest": [trace.to_dict() for trace in self.slowest(limit)],
+        }
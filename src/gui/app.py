@@ -2,7 +2,9 @@
 Главное GUI приложение на Flet
 """
 import asyncio
+import base64
 import logging
+import time
 from typing import Optional
 
 import flet as ft
@@ -10,28 +12,43 @@ from flet import Colors
 
 from ..config.settings import settings
 from ..utils.dependency import container, inject
-from ..core.events import EventBus
-from ..core.client_manager import ClientManagerImpl
-from ..core.gamepad_manager import GamepadManagerImpl
-from ..api.server import FastAPIServer
-from ..utils.types import ClientManager, GamepadManager
+from ..core.status_shm import StatusSnapshotReader
+from ..api.process import ServerProcessHandle
+from ..api.control import ControlError
+from ..utils.types import ClientInfo, ClientStatus
+from ..utils.qr import get_qr
 
 logger = logging.getLogger(__name__)
 
+# Частота опроса снимка статуса процесса сервера
+STATUS_POLL_INTERVAL = 0.25
+# Размер QR-кодов в окне (отображаются в 120x120, запас для HiDPI)
+QR_GUI_SIZE = 240
+# Обновление задержек кадров (запрос к процессу сервера)
+LATENCY_POLL_INTERVAL = 2.0
+LATENCY_SLOW_FRAMES = 5
+
 
 class RemoteGamepadApp:
-    """Основное GUI приложение"""
+    """
+    Основное GUI приложение
+    
+    Сервер работает в отдельном процессе (ServerProcess): GUI запускает
+    и останавливает его через канал управления, а список клиентов берет
+    из снимка статуса в разделяемой памяти. Перерисовка Flet не отнимает
+    время у цикла ввода, и объекты менеджеров не делятся между циклами.
+    """
     
     def __init__(self) -> None:
         self.page: Optional[ft.Page] = None
-        self.event_bus: EventBus = inject(EventBus)
-        self.client_manager: ClientManager = inject(ClientManager)
-        self.gamepad_manager: GamepadManager = inject(GamepadManager)
-        self.server: FastAPIServer = inject(FastAPIServer)
+        self.server: ServerProcessHandle = inject(ServerProcessHandle)
+        self._status_reader: Optional[StatusSnapshotReader] = None
+        self._status_task: Optional[asyncio.Task] = None
         
         # UI элементы
         self.status_text: Optional[ft.Text] = None
         self.client_list: Optional[ft.ListView] = None
+        self.latency_list: Optional[ft.ListView] = None
         self.server_controls: Optional[ft.Row] = None
         self.qr_image: Optional[ft.Image] = None
         
@@ -42,7 +59,6 @@ class RemoteGamepadApp:
         self.page = page
         await self._setup_page()
         await self._build_ui()
-        await self._setup_event_handlers()
         
         # НЕ запускаем периодические задачи здесь - они вызывают ошибки
         
@@ -287,11 +303,31 @@ class RemoteGamepadApp:
             )
         )
         
+        # Задержки кадров по стадиям
+        self.latency_list = ft.ListView(
+            height=200,
+            spacing=5,
+            padding=ft.padding.all(10)
+        )
+        
+        latency_card = ft.Card(
+            content=ft.Container(
+                content=ft.Column([
+                    ft.Row([
+                        ft.Text("⏱️ Задержки кадров (мс)", weight=ft.FontWeight.BOLD, expand=True),
+                        ft.IconButton(ft.Icons.REFRESH, on_click=self._refresh_latency, tooltip="Обновить")
+                    ]),
+                    self.latency_list
+                ]),
+                padding=15
+            )
+        )
+        
         # Собираем все элементы в ScrollView
         main_content = ft.Column([
             title,
             self.server_controls,
-            ft.Column([server_info, clients_card], expand=True)
+            ft.Column([server_info, clients_card, latency_card], expand=True)
         ], spacing=20)
         
         # Добавляем прокрутку через ListView
@@ -306,124 +342,94 @@ class RemoteGamepadApp:
         
         logger.info("UI built and ready")
     
-    async def _setup_event_handlers(self) -> None:
-        """Настройка обработчиков событий"""
-        # Подписываемся на события клиентов
-        self.event_bus.subscribe_client("client_connected", self._on_client_connected)
-        self.event_bus.subscribe_client("client_disconnected", self._on_client_disconnected)
-        self.event_bus.subscribe_client("client_profile_updated", self._on_client_profile_updated)
-        
-        # Запускаем периодическое обновление списка клиентов
-        # НЕ используем asyncio.create_task() здесь - это может вызвать проблемы с event loop
-        
-        logger.debug("Event handlers set up")
-    
     async def _start_server(self, e: ft.ControlEvent) -> None:
-        """Запуск сервера"""
+        """Запуск процесса сервера"""
         try:
             # Получаем IP из поля ввода
             server_ip = self.server_ip_field.value if self.server_ip_field.value else "0.0.0.0"
-            
-            # Обновляем настройки сервера
-            self.server._host = server_ip
             logger.info(f"Starting server on {server_ip}:{settings.server.port}")
             
-            # Запускаем сервер в отдельном потоке
-            import threading
-            server_thread = threading.Thread(
-                target=self._run_server_in_thread,
-                args=(server_ip,),
-                daemon=True
-            )
-            server_thread.start()
+            if not await self.server.start(server_ip, settings.server.port):
+                await self._show_error("Не удалось запустить сервер")
+                return
             
-            # Ждем немного для запуска
-            await asyncio.sleep(1.0)
-            
-            # Проверяем статус через uvicorn
-            if hasattr(self.server, '_server_instance') and self.server._server_instance:
-                # Устанавливаем флаг запуска
-                self.server.is_running = True
-                await self._update_server_status(True)
-                await self._update_qr_code()
-                logger.info("Server started successfully")
-            else:
-                # Дополнительная проверка - возможно сервер уже запущен
-                await asyncio.sleep(0.5)
-                if hasattr(self.server, '_server_instance') and self.server._server_instance:
-                    self.server.is_running = True
-                    await self._update_server_status(True)
-                    await self._update_qr_code()
-                    logger.info("Server started successfully (delayed check)")
-                else:
-                    await self._show_error("Не удалось запустить сервер")
+            self._status_reader = self.server.open_status()
+            self._status_task = asyncio.create_task(self._watch_status())
+            await self._update_server_status(True)
+            await self._update_qr_code()
+            logger.info("Server started successfully")
                 
         except Exception as ex:
             logger.error(f"Failed to start server: {ex}")
             await self._show_error(f"Ошибка запуска сервера: {ex}")
     
-    def _run_server_in_thread(self, host: str) -> None:
-        """Запуск сервера в отдельном потоке"""
-        try:
-            import asyncio
-            import uvicorn
-            
-            # Создаем новый event loop для потока
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Запускаем сервер
-            config = uvicorn.Config(
-                app=self.server.app,
-                host=host,
-                port=settings.server.port,
-                log_level=settings.server.log_level.lower(),
-                access_log=settings.server.debug
-            )
-            
-            server = uvicorn.Server(config)
-            self.server._server_instance = server
-            self.server._host = host
-            
-            # Устанавливаем флаг запуска
-            self.server.is_running = True
-            logger.info(f"Server thread started on {host}:{settings.server.port}")
-            
-            # Запускаем сервер
-            loop.run_until_complete(server.serve())
-            
-        except Exception as e:
-            logger.error(f"Error in server thread: {e}")
-            self.server.is_running = False
-    
     async def _stop_server(self, e: ft.ControlEvent) -> None:
-        """Остановка сервера"""
+        """Остановка процесса сервера"""
         try:
-            # Останавливаем сервер
-            if hasattr(self.server, '_server_instance') and self.server._server_instance:
-                self.server._server_instance.should_exit = True
-                self.server.is_running = False
-                logger.info("Server stop signal sent")
-            else:
-                logger.warning("No server instance found")
-            
-            # Удаляем всех клиентов при остановке сервера
-            try:
-                await self.client_manager.cleanup_all_clients()
-                logger.info("All clients removed after server stop")
-            except Exception as ex:
-                logger.error(f"Error cleaning up clients: {ex}")
+            # Процесс сам отключает клиентов и удаляет устройства
+            await self.server.stop()
+            await self._close_status()
             
             # Обновляем UI
             await self._update_server_status(False)
             await self._clear_qr_code()
-            await self._update_client_list()
+            await self._update_client_list_direct([])
+            await self._render_latency(None)
             logger.info("Server stopped successfully")
             
         except Exception as ex:
             logger.error(f"Failed to stop server: {ex}")
             await self._show_error(f"Ошибка остановки сервера: {ex}")
     
+    async def _watch_status(self) -> None:
+        """Опрос снимка статуса: список перерисовывается только при изменении"""
+        next_latency = 0.0
+        try:
+            while self.server.is_running:
+                if self._status_reader is None:
+                    self._status_reader = self.server.open_status()
+                elif self._status_reader.changed():
+                    snapshot = self._status_reader.read()
+                    if snapshot:
+                        await self._update_client_list_direct(self._clients_from_snapshot(snapshot))
+                if time.monotonic() >= next_latency:
+                    next_latency = time.monotonic() + LATENCY_POLL_INTERVAL
+                    await self._update_latency()
+                await asyncio.sleep(STATUS_POLL_INTERVAL)
+        except asyncio.CancelledError:
+            return
+        except Exception as ex:
+            logger.error(f"Error watching server status: {ex}")
+        
+        # Процесс сервера завершился сам
+        if not self.server.is_running:
+            logger.warning("Server process is gone")
+            await self.server.stop()
+            await self._close_status(cancel=False)
+            await self._update_server_status(False)
+            await self._clear_qr_code()
+            await self._update_client_list_direct([])
+            await self._render_latency(None)
+    
+    async def _close_status(self, cancel: bool = True) -> None:
+        """Остановка опроса и отключение от снимка статуса"""
+        if cancel and self._status_task and not self._status_task.done():
+            self._status_task.cancel()
+        self._status_task = None
+        if self._status_reader:
+            self._status_reader.close()
+            self._status_reader = None
+    
+    @staticmethod
+    def _clients_from_snapshot(snapshot: dict) -> list:
+        """Клиенты из снимка статуса"""
+        clients = []
+        for data in snapshot.get("clients", []):
+            data = dict(data)
+            data["status"] = ClientStatus(data["status"])
+            clients.append(ClientInfo(**data))
+        return clients
+    
     async def _open_settings(self, e: ft.ControlEvent) -> None:
         """Открытие настроек"""
         # TODO: Реализовать окно настроек
@@ -433,9 +439,7 @@ class RemoteGamepadApp:
         """Принудительное обновление списка клиентов"""
         logger.info("Manual refresh of client list requested")
         try:
-            # Получаем клиентов напрямую без await
-            clients = self.client_manager._clients.values()
-            await self._update_client_list_direct(list(clients))
+            await self._update_client_list()
         except Exception as ex:
             logger.error(f"Error refreshing client list: {ex}")
             await self._show_error(f"Ошибка обновления: {ex}")
@@ -466,37 +470,19 @@ class RemoteGamepadApp:
             
         logger.info(f"Server status updated: {'running' if is_running else 'stopped'}")
     
-    async def _on_client_connected(self, client_info) -> None:
-        """Обработчик подключения клиента"""
-        profile_name = getattr(client_info, 'profile_name', None) or 'Без имени'
-        logger.info(f"🟢 Клиент подключился: {client_info.client_id} ({client_info.ip_address}) - {profile_name}")
-        await self._update_client_list()
-        logger.debug(f"Client connected event handled: {client_info.client_id}")
-    
-    async def _on_client_disconnected(self, client_info) -> None:
-        """Обработчик отключения клиента"""
-        profile_name = getattr(client_info, 'profile_name', None) or 'Без имени'
-        logger.info(f"🔴 Клиент отключился: {client_info.client_id} ({client_info.ip_address}) - {profile_name}")
-        await self._update_client_list()
-        logger.debug(f"Client disconnected event handled: {client_info.client_id}")
-    
-    async def _on_client_profile_updated(self, client_info) -> None:
-        """Обработчик обновления профиля клиента"""
-        profile_name = getattr(client_info, 'profile_name', None) or 'Без имени'
-        logger.info(f"🔄 Профиль клиента обновлен: {client_info.client_id} -> {profile_name}")
-        await self._update_client_list()
-        logger.debug(f"Client profile updated event handled: {client_info.client_id}")
-    
     async def _update_client_list(self) -> None:
         """Обновление списка клиентов"""
         if not self.client_list:
             return
         
         try:
-            # Получаем клиентов напрямую без await
-            clients = list(self.client_manager._clients.values())
+            # Снимок запрашивается у процесса сервера через канал управления
+            clients = []
+            if self.server.is_running:
+                snapshot = await self.server.control.request("status")
+                clients = self._clients_from_snapshot(snapshot)
             await self._update_client_list_direct(clients)
-        except Exception as ex:
+        except (ControlError, OSError) as ex:
             logger.error(f"Error updating client list: {ex}")
             # Fallback - показываем ошибку
             if self.client_list:
@@ -506,8 +492,73 @@ class RemoteGamepadApp:
                 )
                 self.client_list.update()
     
+    async def _refresh_latency(self, e: ft.ControlEvent) -> None:
+        """Принудительное обновление задержек кадров"""
+        await self._update_latency()
+    
+    async def _update_latency(self) -> None:
+        """Задержки кадров из процесса сервера"""
+        if not self.server.is_running:
+            await self._render_latency(None)
+            return
+        try:
+            latency = await self.server.control.request("latency", limit=LATENCY_SLOW_FRAMES)
+        except (ControlError, OSError, asyncio.TimeoutError) as ex:
+            logger.debug(f"Latency request failed: {ex}")
+            return
+        await self._render_latency(latency)
+    
+    async def _render_latency(self, latency: Optional[dict]) -> None:
+        """
+        Перерисовка задержек: p50/p99 стадий по клиентам и медленные кадры
+        
+        Если сервер обработал медленный кадр быстро, а интервал с предыдущим
+        кадром большой, задержка возникла в сети или на телефоне.
+        """
+        if not self.latency_list:
+            return
+        
+        self.latency_list.controls.clear()
+        
+        if not latency or not latency.get("enabled"):
+            text = "Трассировка выключена" if latency else "Сервер остановлен"
+            self.latency_list.controls.append(ft.Text(text, italic=True))
+        elif not latency["clients"]:
+            self.latency_list.controls.append(ft.Text("Кадров пока не было", italic=True))
+        else:
+            def fmt(value: Optional[float]) -> str:
+                return f"{value:.2f}" if value is not None else "-"
+            
+            stages = [stage for stage in latency["stages"] if stage != "total"]
+            for client_id, data in latency["clients"].items():
+                total = data["stages"]["total"]
+                breakdown = "  ".join(f"{stage} {fmt(data['stages'][stage]['p99_ms'])}" for stage in stages)
+                self.latency_list.controls.append(ft.Column([
+                    ft.Text(
+                        f"🔗 {client_id[:8]}  кадров: {data['frames']}  "
+                        f"p50 {fmt(total['p50_ms'])}  p99 {fmt(total['p99_ms'])}  "
+                        f"макс. интервал {data['max_gap_ms']:.0f}",
+                        size=12, color=Colors.WHITE
+                    ),
+                    ft.Text(f"p99 по стадиям: {breakdown}", size=10, color=Colors.GREY_400),
+                ], spacing=2))
+            
+            if latency["slowest"]:
+                self.latency_list.controls.append(ft.Divider())
+                self.latency_list.controls.append(ft.Text("🐢 Самые медленные кадры", size=12, weight=ft.FontWeight.BOLD))
+            for frame in latency["slowest"]:
+                stages_ms = frame["stages_ms"]
+                breakdown = "  ".join(f"{stage} {fmt(stages_ms[stage])}" for stage in stages)
+                self.latency_list.controls.append(ft.Text(
+                    f"{self._format_time(frame['received_at'])}  {frame['client_id'][:8]} ({frame['transport']}): "
+                    f"{fmt(stages_ms['total'])}  [{breakdown}]  интервал {fmt(frame['gap_ms'])}",
+                    size=10, color=Colors.GREY_300
+                ))
+        
+        self.latency_list.update()
+    
     async def _update_client_list_direct(self, clients: list) -> None:
-        """Прямое обновление списка клиентов без обращения к ClientManager"""
+        """Перерисовка списка клиентов"""
         if not self.client_list:
             return
         
@@ -522,6 +573,7 @@ class RemoteGamepadApp:
                 status_color = {
                     "connected": Colors.GREEN_400,
                     "active": Colors.BLUE_400,
+                    "parked": Colors.AMBER_400,
                     "disconnected": Colors.RED_400,
                     "error": Colors.ORANGE_400
                 }.get(client.status.value, Colors.GREY_400)
@@ -590,22 +642,15 @@ class RemoteGamepadApp:
     async def _update_qr_code(self) -> None:
         """Обновление QR-кодов"""
         try:
-            import qrcode
-            import socket
-            import os
-            
-            # Создаем временную папку
-            os.makedirs("temp", exist_ok=True)
-            
             # QR-код для сервера
             server_ip = self.server_ip_field.value if self.server_ip_field.value else "0.0.0.0"
             server_url = f"http://{server_ip}:{settings.server.port}"
-            await self._generate_qr_code(server_url, "temp/server_qr.png", self.server_qr_container, "сервера")
+            await self._generate_qr_code(server_url, self.server_qr_container, "сервера")
             
             # QR-код для клиентов
             qr_ip = self.qr_ip_field.value if self.qr_ip_field.value else "100.102.5.118"
             client_url = f"http://{qr_ip}:{settings.server.port}"
-            await self._generate_qr_code(client_url, "temp/client_qr.png", self.client_qr_container, "клиентов")
+            await self._generate_qr_code(client_url, self.client_qr_container, "клиентов")
             
             # Принудительно обновляем страницу после генерации всех QR-кодов
             if self.page:
@@ -618,31 +663,20 @@ class RemoteGamepadApp:
             logger.error(f"Failed to generate QR codes: {ex}")
             await self._show_error(f"Ошибка генерации QR-кодов: {ex}")
     
-    async def _generate_qr_code(self, url: str, file_path: str, container, description: str) -> None:
+    async def _generate_qr_code(self, url: str, container, description: str) -> None:
         """Генерация отдельного QR-кода"""
         try:
-            import qrcode
-            
             logger.info(f"Generating QR code for {description}: {url}")
             
-            # Генерируем QR код
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(url)
-            qr.make(fit=True)
-            
-            # Создаем изображение
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Сохраняем изображение
-            img.save(file_path)
-            logger.info(f"QR code for {description} saved to: {file_path}")
+            # Отрисовка в пуле потоков (повторный запуск берет код из кэша)
+            image = await get_qr(url, QR_GUI_SIZE, "png")
             
             # Обновляем UI
             if container:
                 try:
                     # Создаем изображение QR кода
                     qr_img = ft.Image(
-                        src=file_path,
+                        src_base64=base64.b64encode(image.data).decode(),
                         width=120,
                         height=120,
                         fit=ft.ImageFit.CONTAIN,
@@ -712,19 +746,14 @@ class RemoteGamepadApp:
 
 async def run_gui_app() -> None:
     """Запуск GUI приложения"""
-    # Настройка DI контейнера
-    event_bus = EventBus()
-    client_manager = ClientManagerImpl(event_bus, settings.server.max_clients)
-    gamepad_manager = GamepadManagerImpl(event_bus)
-    fastapi_server = FastAPIServer(event_bus, client_manager, gamepad_manager)
-    
-    container.register_singleton(EventBus, event_bus)
-    container.register_singleton(ClientManager, client_manager)
-    container.register_singleton(GamepadManager, gamepad_manager)
-    container.register_singleton(FastAPIServer, fastapi_server)
+    # Настройка DI контейнера: менеджеры клиентов и геймпадов живут в процессе сервера
+    container.register_singleton(ServerProcessHandle, ServerProcessHandle())
     
     # Создание и запуск приложения
     app = RemoteGamepadApp()
     
-    # Запуск Flet приложения
-    await ft.app_async(target=app.main)
\ No newline at end of file
+    try:
+        # Запуск Flet приложения
+        await ft.app_async(target=app.main)
+    finally:
+        await app.server.stop()
@@ -0,0 +1,144 @@
+"""
+Логирование без дискового ввода-вывода в цикле событий
+
+Корневой логгер получает только QueueHandler: запись попадает в очередь,
+а консоль и файл с ротацией обслуживает отдельный поток QueueListener.
+Для горячих путей (кадры ввода, отклоненные пакеты) есть помощники,
+которые пишут не чаще заданного интервала или каждое N-е сообщение.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional
+
+from ..config.settings import settings
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Состояние помощников: ключ -> [время последней записи, пропущено]
+_throttled: Dict[Hashable, List[float]] = {}
+# Ключ -> счетчик вызовов
+_sampled: Dict[Hashable, int] = {}
+
+
+def parse_size(value: str) -> int:
+    """Размер из строки вида "1 MB", "512KB" или "1048576" в байтах"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", value.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    number, unit = match.groups()
+    if unit in ("K", "M", "G"):
+        unit += "B"
+    return int(float(number) * _SIZE_UNITS[unit])
+
+
+def log_path(name: Optional[str] = None) -> Path:
+    """Файл лога процесса: имя процесса добавляется перед расширением"""
+    path = settings.logs_dir / settings.log_file
+    name = settings.log_name if name is None else name
+    return path.with_name(f"{path.stem}.{name}{path.suffix}") if name else path
+
+
+def setup_logging(name: Optional[str] = None) -> logging.handlers.QueueListener:
+    """
+    Настройка логирования процесса
+
+    У каждого процесса (GUI, сервер, шарды) свой файл, поэтому ротация
+    не конфликтует между процессами.
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    handlers: List[logging.Handler] = [console]
+
+    try:
+        settings.logs_dir.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_path(name),
+            maxBytes=parse_size(settings.log_rotation),
+            backupCount=settings.log_retention,
+            encoding="utf-8",
+            delay=True
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).warning(f"File logging disabled: {e}")
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(getattr(logging, settings.server.log_level))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    """Запись оставшихся сообщений и остановка потока логирования"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_throttled(logger: logging.Logger, level: int, key: Hashable, msg: str, *args: Any,
+                  interval: float = 5.0) -> None:
+    """
+    Сообщение не чаще раза в interval секунд на ключ
+
+    Аргументы форматируются только при записи; число пропущенных
+    сообщений добавляется к следующему записанному.
+    """
+    if not logger.isEnabledFor(level):
+        return
+
+    now = time.monotonic()
+    state = _throttled.get(key)
+    if state is None:
+        _throttled[key] = [now, 0]
+    elif now - state[0] < interval:
+        state[1] += 1
+        return
+    else:
+        suppressed = int(state[1])
+        state[0], state[1] = now, 0
+        if suppressed:
+            msg = f"{msg} (+{suppressed} similar suppressed)"
+
+    logger.log(level, msg, *args)
+
+
+def log_sampled(logger: logging.Logger, level: int, key: Hashable, every: int, msg: str, *args: Any) -> None:
+    """Каждое every-е сообщение с ключом (первое записывается всегда)"""
+    if not logger.isEnabledFor(level):
+        return
+
+    count = _sampled.get(key, 0)
+    _sampled[key] = count + 1
+    if count % every == 0:
+        logger.log(level, f"{msg} [1/{every} sampled, #{count + 1}]", *args)
+
+
+def forget_log_key(key: Hashable) -> None:
+    """Сброс состояния помощников для ключа (например, при отключении клиента)"""
+    _throttled.pop(key, None)
+    _sampled.pop(key, None)
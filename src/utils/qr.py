@@ -0,0 +1,102 @@
+"""
+Генерация QR-кодов с кэшем и отрисовкой вне цикла событий
+"""
+import asyncio
+import hashlib
+import io
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import qrcode
+
+logger = logging.getLogger(__name__)
+
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+QR_MIN_SIZE = 64
+QR_MAX_SIZE = 2048
+QR_BORDER = 4
+QR_CACHE_SIZE = 32
+
+_cache: "OrderedDict[Tuple[str, int, str], QRImage]" = OrderedDict()
+
+
+@dataclass(frozen=True)
+class QRImage:
+    """Готовое изображение QR-кода"""
+    data: bytes
+    media_type: str
+    etag: str
+
+
+def _matrix(url: str) -> List[List[bool]]:
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=QR_BORDER)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _render_svg(matrix: List[List[bool]], size: int) -> bytes:
+    modules = len(matrix)
+    path = "".join(
+        f"M{x} {y}h1v1h-1z"
+        for y, row in enumerate(matrix)
+        for x, dark in enumerate(row) if dark
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="#fff"/>'
+        f'<path d="{path}" fill="#000"/></svg>'
+    ).encode()
+
+
+def _render_png(matrix: List[List[bool]], size: int) -> bytes:
+    from PIL import Image
+
+    modules = len(matrix)
+    image = Image.new("1", (modules, modules), 1)
+    image.putdata([0 if dark else 1 for row in matrix for dark in row])
+    # Увеличение без сглаживания: модули остаются четкими квадратами
+    image = image.resize((size, size), Image.NEAREST)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def render_qr(url: str, size: int, fmt: str) -> QRImage:
+    """Синхронная отрисовка QR-кода (вызывается в пуле потоков)"""
+    matrix = _matrix(url)
+    data = _render_svg(matrix, size) if fmt == "svg" else _render_png(matrix, size)
+    etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+    return QRImage(data, QR_FORMATS[fmt], etag)
+
+
+def validate_qr_request(size: int, fmt: str) -> Tuple[int, str]:
+    """Проверка формата и приведение размера к допустимым границам"""
+    fmt = fmt.lower()
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Unsupported QR format: {fmt}")
+    return max(QR_MIN_SIZE, min(QR_MAX_SIZE, int(size))), fmt
+
+
+async def get_qr(url: str, size: int = 200, fmt: str = "png") -> QRImage:
+    """QR-код из кэша или отрисованный в пуле потоков"""
+    size, fmt = validate_qr_request(size, fmt)
+    key = (url, size, fmt)
+
+    image = _cache.get(key)
+    if image is not None:
+        _cache.move_to_end(key)
+        return image
+
+    image = await asyncio.get_running_loop().run_in_executor(None, render_qr, url, size, fmt)
+    _cache[key] = image
+    if len(_cache) > QR_CACHE_SIZE:
+        _cache.popitem(last=False)
+    logger.debug(f"QR code rendered for {url} ({size}px, {fmt}, {len(image.data)} bytes)")
+    return image
@@ -2,8 +2,8 @@
 Типы данных для RemoteGamepad
 """
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Protocol, Callable, Any
-from enum import Enum
+from typing import Dict, List, Optional, Protocol, Callable, Any, Union
+from enum import Enum, IntEnum
 import asyncio
 
 
@@ -12,6 +12,7 @@ class ClientStatus(Enum):
     CONNECTING = "connecting"
     CONNECTED = "connected"
     ACTIVE = "active"
+    PARKED = "parked"  # соединение потеряно, геймпад ждет возобновления сессии
     DISCONNECTED = "disconnected"
     ERROR = "error"
 
@@ -22,6 +23,129 @@ class GamepadEventType(Enum):
     BUTTON_RELEASE = "button_release"
     AXIS_MOVE = "axis_move"
     DPAD = "dpad"
+    
+    @property
+    def topic(self) -> "Topic":
+        """Тема EventBus для события"""
+        return Topic[self.name]
+
+
+class GamepadControl(IntEnum):
+    """
+    Контролы геймпада
+    
+    Строковые имена из пакетов клиента ("BtnA", "AxisLx") переводятся в коды
+    один раз на входе (GamepadControl.parse), дальше события несут целые
+    коды: сравнение и поиск в словарях не трогают строки.
+    """
+    # Кнопки
+    BTN_A = 1
+    BTN_B = 2
+    BTN_X = 3
+    BTN_Y = 4
+    BTN_BACK = 5
+    BTN_START = 6
+    BTN_THUMB_L = 7
+    BTN_THUMB_R = 8
+    BTN_SHOULDER_L = 9
+    BTN_SHOULDER_R = 10
+    
+    # Оси
+    AXIS_LX = 32
+    AXIS_LY = 33
+    AXIS_RX = 34
+    AXIS_RY = 35
+    TRIGGER_L = 36
+    TRIGGER_R = 37
+    
+    # Крестовина (закрепление за клиентом - обе оси сразу)
+    DPAD = 48
+    
+    @property
+    def label(self) -> str:
+        """Имя контрола в пакетах клиента"""
+        return CONTROL_NAMES[self]
+    
+    @property
+    def is_trigger(self) -> bool:
+        return self is GamepadControl.TRIGGER_L or self is GamepadControl.TRIGGER_R
+    
+    @classmethod
+    def parse(cls, name: str) -> Optional["GamepadControl"]:
+        """Контрол по имени из пакета клиента (None - неизвестное имя)"""
+        return _CONTROLS_BY_NAME.get(name)
+
+
+CONTROL_NAMES: Dict[GamepadControl, str] = {
+    GamepadControl.BTN_A: "BtnA",
+    GamepadControl.BTN_B: "BtnB",
+    GamepadControl.BTN_X: "BtnX",
+    GamepadControl.BTN_Y: "BtnY",
+    GamepadControl.BTN_BACK: "BtnBack",
+    GamepadControl.BTN_START: "BtnStart",
+    GamepadControl.BTN_THUMB_L: "BtnThumbL",
+    GamepadControl.BTN_THUMB_R: "BtnThumbR",
+    GamepadControl.BTN_SHOULDER_L: "BtnShoulderL",
+    GamepadControl.BTN_SHOULDER_R: "BtnShoulderR",
+    GamepadControl.AXIS_LX: "AxisLx",
+    GamepadControl.AXIS_LY: "AxisLy",
+    GamepadControl.AXIS_RX: "AxisRx",
+    GamepadControl.AXIS_RY: "AxisRy",
+    GamepadControl.TRIGGER_L: "TriggerL",
+    GamepadControl.TRIGGER_R: "TriggerR",
+    GamepadControl.DPAD: "Dpad",
+}
+
+_CONTROLS_BY_NAME: Dict[str, GamepadControl] = {name: control for control, name in CONTROL_NAMES.items()}
+
+
+class Topic(IntEnum):
+    """
+    Реестр тем EventBus
+    
+    Темы - небольшие целые числа: обработчики хранятся в массивах по индексу
+    темы, а строковое имя (например, "client_connected") проверяется один раз
+    при подписке, так что опечатка сразу вызывает ошибку.
+    """
+    # События клиентов
+    CLIENT_CONNECTED = 1
+    CLIENT_DISCONNECTED = 2
+    CLIENT_STATUS_CHANGED = 3
+    CLIENT_GAMEPAD_ASSIGNED = 4
+    CLIENT_PROFILE_UPDATED = 5
+    
+    # События геймпада
+    BUTTON_PRESS = 16
+    BUTTON_RELEASE = 17
+    AXIS_MOVE = 18
+    DPAD = 19
+    GAMEPAD_STATE = 20
+    GAMEPAD_REMOVED = 21
+    
+    @property
+    def label(self) -> str:
+        """Строковое имя темы"""
+        return self.name.lower()
+    
+    @property
+    def is_client(self) -> bool:
+        """Тема событий клиентов"""
+        return self < Topic.BUTTON_PRESS
+    
+    @classmethod
+    def resolve(cls, topic: Union["Topic", str]) -> "Topic":
+        """Тема по имени или значению, неизвестное имя - ValueError"""
+        if isinstance(topic, cls):
+            return topic
+        try:
+            return cls[str(topic).upper()]
+        except KeyError:
+            raise ValueError(f"Unknown event topic: {topic!r}") from None
+
+
+TOPIC_COUNT = max(Topic) + 1
+
+TopicLike = Union[Topic, str]
 
 
 @dataclass
@@ -36,25 +160,36 @@ class ClientInfo:
     profile_name: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class GamepadEvent:
     """Событие геймпада"""
     client_id: str
     event_type: GamepadEventType
-    button_code: Optional[str] = None
-    axis_name: Optional[str] = None
+    button_code: Optional[GamepadControl] = None
+    axis_code: Optional[GamepadControl] = None
     value: float = 0.0
     value_x: Optional[int] = None  # Для D-PAD X координата
     value_y: Optional[int] = None  # Для D-PAD Y координата
     timestamp: float = 0.0
 
 
+@dataclass(frozen=True)
+class GamepadStateSnapshot:
+    """Снимок итогового состояния виртуального геймпада"""
+    gamepad_id: int
+    client_ids: List[str]
+    buttons: Dict[str, int]
+    axes: Dict[str, int]
+    timestamp: float
+
+
 @dataclass
 class ServerConfig:
     """Конфигурация сервера"""
     host: str = "0.0.0.0"
     port: int = 5002
     max_clients: int = 4
+    max_clients_per_ip: int = 0  # 0 - без ограничения
     debug: bool = False
     log_level: str = "INFO"
     pin_code: Optional[str] = None
@@ -73,15 +208,19 @@ class ClientManager(Protocol):
     async def get_client(self, client_id: str) -> Optional[ClientInfo]: ...
     async def generate_client_id(self, ip_address: str) -> str: ...
     async def assign_gamepad(self, client_id: str, gamepad_id: int) -> bool: ...
+    def status_counts(self) -> Dict[ClientStatus, int]: ...
 
 
 class GamepadManager(Protocol):
     """Протокол для менеджера геймпадов"""
     async def create_gamepad(self, client_id: str) -> Optional[int]: ...
+    async def bind_client(self, client_id: str, gamepad_id: int) -> bool: ...
+    async def release_client(self, client_id: str) -> bool: ...
     async def remove_gamepad(self, gamepad_id: int) -> bool: ...
     async def send_event(self, gamepad_id: int, event: GamepadEvent) -> None: ...
     async def get_gamepad_for_client(self, client_id: str) -> Optional[int]: ...
     async def get_gamepad_count(self) -> int: ...
+    def gamepad_count(self) -> int: ...
     async def get_gamepad_info(self) -> List[Dict]: ...
     async def cleanup(self) -> None: ...
 
@@ -18,71 +18,137 @@ const buttonMap = {
     7: 'TriggerR'
 };
 
-let lastData = null;
-let lastSentTime = performance.now();
-const sendDelay = 50;
+// Подробный лог в консоль: ?debug в адресе или localStorage.debug = '1'
+const DEBUG = new URLSearchParams(window.location.search).has('debug') || localStorage.getItem('debug') === '1';
 
-function getGamepadData() {
-    const gamepads = navigator.getGamepads();
-    console.log("Gamepads found:", gamepads.length);
-    
-    if (gamepads[0]) {
-        console.log("Gamepad 0:", gamepads[0]);
-        console.log("Gamepad connected:", gamepads[0].connected);
-        console.log("Axes count:", gamepads[0].axes.length);
-        console.log("Buttons count:", gamepads[0].buttons.length);
-        
-        const axes = {
-            left_stick: {
-                x: gamepads[0].axes[0],
-                y: gamepads[0].axes[1]
-            },
-            right_stick: {
-                x: gamepads[0].axes[2],
-                y: gamepads[0].axes[3]
-            }
-        };
-        const buttons = gamepads[0].buttons.map((button, index) => ({
-            name: buttonMap[index] || `Button${index}`,
-            pressed: button.pressed,
-            value: button.value,
-            index: index
-        }));
-        return { type: "axis", axes: axes, buttons: buttons };
-    } else {
-        console.log("No gamepad found at index 0");
+function debugLog(...args) {
+    if (DEBUG) console.log(...args);
+}
+
+// ================== Состояние геймпада ==================
+// Опрос идет на каждом кадре анимации, поэтому состояние живет в заранее
+// выделенных типизированных массивах и сравнивается поэлементно с последним
+// отправленным. Пакет собирается только при изменении или раз в
+// keepaliveInterval мс (чтобы сервер видел, что клиент жив). Если кадры
+// анимации не идут (нет геймпада, вкладка в фоне), о живости напоминает
+// таймер heartbeat - пакетом без ввода.
+const AXIS_COUNT = 4;
+const MAX_BUTTONS = 20;
+const keepaliveInterval = 1000;
+
+const axes = new Float64Array(AXIS_COUNT);
+const buttonValues = new Float64Array(MAX_BUTTONS);
+const buttonPressed = new Uint8Array(MAX_BUTTONS);
+const sentAxes = new Float64Array(AXIS_COUNT);
+const sentButtonValues = new Float64Array(MAX_BUTTONS);
+const sentButtonPressed = new Uint8Array(MAX_BUTTONS);
+let buttonCount = 0;
+let sentButtonCount = -1;
+let lastSentTime = 0;
+
+// Пакет переиспользуется между отправками, меняются только значения
+const payload = {
+    type: 'axis',
+    axes: {
+        left_stick: { x: 0, y: 0 },
+        right_stick: { x: 0, y: 0 }
+    },
+    buttons: [],
+    client_id: null,
+    timestamp: 0
+};
+
+function readGamepad() {
+    const gamepad = navigator.getGamepads()[0];
+    if (!gamepad) return false;
+
+    const padAxes = gamepad.axes;
+    for (let i = 0; i < AXIS_COUNT; i++) {
+        axes[i] = padAxes[i] || 0;
+    }
+
+    const padButtons = gamepad.buttons;
+    buttonCount = Math.min(padButtons.length, MAX_BUTTONS);
+    for (let i = 0; i < buttonCount; i++) {
+        buttonValues[i] = padButtons[i].value;
+        buttonPressed[i] = padButtons[i].pressed ? 1 : 0;
     }
-    return null;
+    return true;
 }
 
-function sendGamepadData(data) {
-    // Добавляем client_id если есть
-    const clientId = localStorage.getItem('client_id') || 'web_client';
-    const gamepadData = {
-        ...data,
-        client_id: clientId,
-        timestamp: Date.now()
-    };
-    
-    console.log('🎮 Sending gamepad data:', gamepadData);
-    
-    fetch('/gamepad_data', {
+function stateChanged() {
+    if (buttonCount !== sentButtonCount) return true;
+    for (let i = 0; i < AXIS_COUNT; i++) {
+        if (axes[i] !== sentAxes[i]) return true;
+    }
+    for (let i = 0; i < buttonCount; i++) {
+        if (buttonPressed[i] !== sentButtonPressed[i] || buttonValues[i] !== sentButtonValues[i]) return true;
+    }
+    return false;
+}
+
+function rememberSentState() {
+    sentAxes.set(axes);
+    sentButtonValues.set(buttonValues);
+    sentButtonPressed.set(buttonPressed);
+    sentButtonCount = buttonCount;
+}
+
+function fillPayload() {
+    payload.axes.left_stick.x = axes[0];
+    payload.axes.left_stick.y = axes[1];
+    payload.axes.right_stick.x = axes[2];
+    payload.axes.right_stick.y = axes[3];
+
+    const buttons = payload.buttons;
+    // Объекты кнопок создаются один раз, когда геймпад сообщает их количество
+    while (buttons.length < buttonCount) {
+        const index = buttons.length;
+        buttons.push({ name: buttonMap[index] || `Button${index}`, pressed: false, value: 0, index: index });
+    }
+    buttons.length = buttonCount;
+    for (let i = 0; i < buttonCount; i++) {
+        buttons[i].pressed = buttonPressed[i] === 1;
+        buttons[i].value = buttonValues[i];
+    }
+}
+
+// Адрес шарда, выданный /connect (при шардированном вводе); иначе - текущий сервер
+function apiUrl(path) {
+    const endpoint = localStorage.getItem('endpoint');
+    return endpoint ? endpoint + path : path;
+}
+
+function wsUrl(path) {
+    const endpoint = localStorage.getItem('endpoint');
+    if (endpoint) {
+        return endpoint.replace(/^http/, 'ws') + path;
+    }
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    return `${protocol}://${window.location.host}${path}`;
+}
+
+function sendGamepadData() {
+    payload.client_id = localStorage.getItem('client_id') || 'web_client';
+    payload.timestamp = Date.now();
+    debugLog('🎮 Sending gamepad data:', payload);
+
+    fetch(apiUrl('/gamepad_data'), {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify(gamepadData)
+        body: JSON.stringify(payload)
     }).then(response => {
-        console.log('📡 Response status:', response.status);
+        debugLog('📡 Response status:', response.status);
+        if (response.status === 409) {
+            // Сессия припаркована (например, оборвался WebSocket) - возобновляем ее
+            connectToServer();
+            return;
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return response.json();
-    }).then(result => {
-        console.log('✅ Response from server:', result);
-        // После отправки данных снова проверяем состояние
-        updateJoystickData(data);
-        checkForChanges();
     }).catch(error => {
         console.error('❌ Error sending gamepad data:', error);
         // Показываем ошибку пользователю
@@ -90,41 +156,83 @@ function sendGamepadData(data) {
     });
 }
 
-function checkForChanges() {
-    const data = getGamepadData();
-    const now = performance.now();
-
-    if (data) {
-        // Отправляем данные, если они изменились или если прошло достаточно времени
-        if (JSON.stringify(data) !== JSON.stringify(lastData) || (now - lastSentTime >= sendDelay)) {
-            lastData = data; // Обновляем последнее состояние
-            sendGamepadData(data); // Отправляем данные
-            lastSentTime = now; // Обновляем время последней отправки
+function checkForChanges(now) {
+    if (!readGamepad()) return;
+
+    // Отправляем данные, если они изменились или пора напомнить о себе серверу
+    const changed = stateChanged();
+    if (changed || now - lastSentTime >= keepaliveInterval) {
+        fillPayload();
+        sendGamepadData();
+        lastSentTime = now;
+        if (changed) {
+            rememberSentState();
+            updateJoystickData();
         }
     }
 }
 
+// Heartbeat: пакет без осей и кнопок только отмечает клиента живым и не
+// меняет ввод; ответ 409 так же возобновляет припаркованную сессию
+let heartbeatTimer = null;
+
+function sendHeartbeat() {
+    const clientId = localStorage.getItem('client_id');
+    if (!clientId || performance.now() - lastSentTime < keepaliveInterval) return;
+    lastSentTime = performance.now();
+
+    fetch(apiUrl('/gamepad_data'), {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ type: 'heartbeat', client_id: clientId, timestamp: Date.now() })
+    }).then(response => {
+        if (response.status === 409) connectToServer();
+    }).catch(error => console.error('❌ Error sending heartbeat:', error));
+}
+
+function startHeartbeat() {
+    if (!heartbeatTimer) heartbeatTimer = setInterval(sendHeartbeat, keepaliveInterval);
+}
+
+function stopHeartbeat() {
+    if (heartbeatTimer) {
+        clearInterval(heartbeatTimer);
+        heartbeatTimer = null;
+    }
+}
+
 // Используем requestAnimationFrame для проверки изменений
-function update() {
-    checkForChanges();
+function update(now) {
+    checkForChanges(now);
     requestAnimationFrame(update);
 }
 
-// Обновление данных джойстика на странице
-function updateJoystickData(data) {
-    document.getElementById('left-stick-x').textContent = data.axes.left_stick.x.toFixed(2);
-    document.getElementById('left-stick-y').textContent = data.axes.left_stick.y.toFixed(2);
-    document.getElementById('right-stick-x').textContent = data.axes.right_stick.x.toFixed(2);
-    document.getElementById('right-stick-y').textContent = data.axes.right_stick.y.toFixed(2);
+// Обновление данных джойстика на странице (только при изменении состояния)
+const stickLabels = ['left-stick-x', 'left-stick-y', 'right-stick-x', 'right-stick-y']
+    .map(id => document.getElementById(id));
+const buttonItems = [];
 
-    const buttonsList = document.getElementById('buttons-list');
-    buttonsList.innerHTML = ''; // Очищаем список кнопок
+function updateJoystickData() {
+    for (let i = 0; i < AXIS_COUNT; i++) {
+        stickLabels[i].textContent = axes[i].toFixed(2);
+    }
 
-    data.buttons.forEach(button => {
+    const buttonsList = document.getElementById('buttons-list');
+    // Элементы списка создаются один раз и дальше только меняют текст
+    while (buttonItems.length < buttonCount) {
         const li = document.createElement('li');
-        li.textContent = `${button.name} ${button.pressed ? '⚡️' : '💤'} (${button.value.toFixed(2)})`;
         buttonsList.appendChild(li);
-    });
+        buttonItems.push(li);
+    }
+    while (buttonItems.length > buttonCount) {
+        buttonItems.pop().remove();
+    }
+    for (let i = 0; i < buttonCount; i++) {
+        const name = buttonMap[i] || `Button${i}`;
+        buttonItems[i].textContent = `${name} ${buttonPressed[i] ? '⚡️' : '💤'} (${buttonValues[i].toFixed(2)})`;
+    }
 }
 
 // ================== Система тем ==================
@@ -157,7 +265,7 @@ async function handleNicknameSave() {
     try {
         const clientId = localStorage.getItem('client_id');
         if (clientId) {
-            await fetch('/update_profile', {
+            await fetch(apiUrl('/update_profile'), {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -200,33 +308,47 @@ window.addEventListener('load', async () => {
 
 // ================== Обработка геймпада ==================
 window.addEventListener('gamepadconnected', (e) => {
-    console.log('🎮 Gamepad connected:', e.gamepad);
+    debugLog('🎮 Gamepad connected:', e.gamepad);
     showStatusMessage('🎮 Геймпад подключен', 'success');
 });
 
 window.addEventListener('gamepaddisconnected', (e) => {
-    console.log('🎮 Gamepad disconnected:', e.gamepad);
+    debugLog('🎮 Gamepad disconnected:', e.gamepad);
     showStatusMessage('🎮 Геймпад отключен', 'error');
 });
 
 // ================== Обработка отключения ==================
-window.addEventListener('beforeunload', async () => {
-    await disconnectFromServer();
+// Уход страницы в фон не отключает клиента: сессия паркуется, геймпад
+// остается в нейтрали и при возвращении подключается заново тот же.
+window.addEventListener('beforeunload', () => {
+    suspendSession();
 });
 
-window.addEventListener('pagehide', async () => {
-    await disconnectFromServer();
+window.addEventListener('pagehide', () => {
+    suspendSession();
 });
 
 // Обработка потери фокуса (мобильные устройства)
 document.addEventListener('visibilitychange', async () => {
     if (document.visibilityState === 'hidden') {
-        await disconnectFromServer();
+        suspendSession();
+    } else {
+        await connectToServer();
     }
 });
 
 // ================== Подключение к серверу ==================
-async function connectToServer() {
+let connecting = null;
+
+function connectToServer() {
+    // Одновременные вызовы (загрузка, возврат на вкладку, ответ 409) ждут одного запроса
+    if (!connecting) {
+        connecting = requestConnection().finally(() => { connecting = null; });
+    }
+    return connecting;
+}
+
+async function requestConnection() {
     try {
         const response = await fetch('/connect', {
             method: 'POST',
@@ -236,7 +358,10 @@ async function connectToServer() {
             body: JSON.stringify({
                 ip_address: window.location.hostname,
                 user_agent: navigator.userAgent,
-                profile_name: localStorage.getItem('nickname') || 'Guest'
+                profile_name: localStorage.getItem('nickname') || 'Guest',
+                // Прежняя сессия, если она еще не истекла
+                client_id: localStorage.getItem('client_id'),
+                resume_token: localStorage.getItem('resume_token')
             })
         });
         
@@ -244,8 +369,20 @@ async function connectToServer() {
             const data = await response.json();
             if (data.success) {
                 localStorage.setItem('client_id', data.client_id);
-                console.log('Connected to server with ID:', data.client_id);
-                showStatusMessage('✅ Подключен к серверу', 'success');
+                if (data.endpoint) {
+                    localStorage.setItem('endpoint', data.endpoint);
+                } else {
+                    localStorage.removeItem('endpoint');
+                }
+                if (data.resume_token) {
+                    localStorage.setItem('resume_token', data.resume_token);
+                } else {
+                    localStorage.removeItem('resume_token');
+                }
+                console.log(data.resumed ? 'Session resumed with ID:' : 'Connected to server with ID:', data.client_id);
+                startMotionStreaming(data.client_id);
+                startHeartbeat();
+                showStatusMessage(data.resumed ? '✅ Сессия восстановлена' : '✅ Подключен к серверу', 'success');
             } else {
                 throw new Error(data.message || 'Connection failed');
             }
@@ -258,11 +395,32 @@ async function connectToServer() {
     }
 }
 
+function suspendSession() {
+    const clientId = localStorage.getItem('client_id');
+    const resumeToken = localStorage.getItem('resume_token');
+    if (clientId && resumeToken) {
+        // keepalive: запрос доживает до сервера и после закрытия страницы
+        fetch(apiUrl('/suspend'), {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                client_id: clientId,
+                resume_token: resumeToken
+            }),
+            keepalive: true
+        }).catch(error => console.error('Error suspending session:', error));
+    }
+    stopHeartbeat();
+    stopMotionStreaming();
+}
+
 async function disconnectFromServer() {
     try {
         const clientId = localStorage.getItem('client_id');
         if (clientId) {
-            await fetch('/disconnect', {
+            await fetch(apiUrl('/disconnect'), {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -272,8 +430,12 @@ async function disconnectFromServer() {
                 })
             });
             localStorage.removeItem('client_id');
+            localStorage.removeItem('endpoint');
+            localStorage.removeItem('resume_token');
             console.log('Disconnected from server');
         }
+        stopHeartbeat();
+        stopMotionStreaming();
     } catch (error) {
         console.error('Error disconnecting from server:', error);
     }
@@ -309,6 +471,102 @@ document.body.addEventListener('htmx:afterSwap', function(evt) {
     setTimeout(() => main.classList.remove('fade-in'), 500);
 });
 
+// ================== Датчики движения ==================
+// Сэмплы DeviceMotionEvent копятся в заранее выделенном буфере и уходят
+// по WebSocket одним бинарным кадром раз в motionFlushInterval мс.
+// Формат кадра: u8 тип, u8 версия, u16 число сэмплов, затем по 7 float32
+// на сэмпл (t_ms, ax, ay, az в м/с², gx, gy, gz в °/с), little-endian.
+const MOTION_FRAME_TYPE = 0x01;
+const MOTION_FRAME_VERSION = 1;
+const MOTION_SAMPLE_FIELDS = 7;
+const MOTION_MAX_SAMPLES = 64;
+const MOTION_HEADER_SIZE = 4;
+const motionFlushInterval = 50;
+
+const motionBuffer = new ArrayBuffer(MOTION_HEADER_SIZE + MOTION_MAX_SAMPLES * MOTION_SAMPLE_FIELDS * 4);
+const motionHeader = new DataView(motionBuffer, 0, MOTION_HEADER_SIZE);
+const motionSamples = new Float32Array(motionBuffer, MOTION_HEADER_SIZE);
+let motionCount = 0;
+let motionFlushTimer = null;
+let motionSocket = null;
+let motionEpoch = 0;
+
+function onDeviceMotion(event) {
+    const accel = event.accelerationIncludingGravity;
+    const rate = event.rotationRate;
+    if (!accel || !rate) return;
+
+    const offset = motionCount * MOTION_SAMPLE_FIELDS;
+    // Время от начала потока, чтобы float32 не терял точность
+    motionSamples[offset] = performance.now() - motionEpoch;
+    motionSamples[offset + 1] = accel.x || 0;
+    motionSamples[offset + 2] = accel.y || 0;
+    motionSamples[offset + 3] = accel.z || 0;
+    motionSamples[offset + 4] = rate.beta || 0;
+    motionSamples[offset + 5] = rate.gamma || 0;
+    motionSamples[offset + 6] = rate.alpha || 0;
+    motionCount++;
+
+    if (motionCount === MOTION_MAX_SAMPLES) flushMotion();
+}
+
+function flushMotion() {
+    if (motionCount === 0) return;
+    if (motionSocket && motionSocket.readyState === WebSocket.OPEN) {
+        motionHeader.setUint8(0, MOTION_FRAME_TYPE);
+        motionHeader.setUint8(1, MOTION_FRAME_VERSION);
+        motionHeader.setUint16(2, motionCount, true);
+        // send() копирует данные, поэтому буфер можно переиспользовать
+        motionSocket.send(new Uint8Array(motionBuffer, 0, MOTION_HEADER_SIZE + motionCount * MOTION_SAMPLE_FIELDS * 4));
+    }
+    motionCount = 0;
+}
+
+function openMotionSocket(clientId) {
+    closeMotionSocket();
+    // Токен сессии доказывает владение: только тогда обрыв сокета паркует сессию
+    const token = localStorage.getItem('resume_token');
+    const query = token ? `?resume_token=${encodeURIComponent(token)}` : '';
+    motionSocket = new WebSocket(wsUrl(`/ws/${clientId}${query}`));
+    motionSocket.binaryType = 'arraybuffer';
+}
+
+function closeMotionSocket() {
+    if (motionSocket) {
+        motionSocket.close();
+        motionSocket = null;
+    }
+}
+
+async function startMotionStreaming(clientId) {
+    if (typeof DeviceMotionEvent === 'undefined') return;
+
+    // iOS требует разрешения, выданного по жесту пользователя
+    if (typeof DeviceMotionEvent.requestPermission === 'function') {
+        try {
+            if (await DeviceMotionEvent.requestPermission() !== 'granted') return;
+        } catch (error) {
+            document.addEventListener('click', () => startMotionStreaming(clientId), { once: true });
+            return;
+        }
+    }
+
+    openMotionSocket(clientId);
+    motionEpoch = performance.now();
+    window.addEventListener('devicemotion', onDeviceMotion);
+    if (!motionFlushTimer) motionFlushTimer = setInterval(flushMotion, motionFlushInterval);
+}
+
+function stopMotionStreaming() {
+    window.removeEventListener('devicemotion', onDeviceMotion);
+    if (motionFlushTimer) {
+        clearInterval(motionFlushTimer);
+        motionFlushTimer = null;
+    }
+    motionCount = 0;
+    closeMotionSocket();
+}
+
 // ================== Проверка соединения ==================
 const testConnectionButton = document.getElementById('test-connection');
 const connectionStatus = document.getElementById('connection-status');
@@ -351,4 +609,4 @@ testConnectionButton.addEventListener('click', checkServerConnection);
 document.addEventListener('DOMContentLoaded', () => {
     const fab = document.querySelector('.fixed-action-btn');
     M.FloatingActionButton.init(fab, {});
-});
\ No newline at end of file
+});
@@ -0,0 +1,12 @@
+"""
+Общие настройки тестов
+
+Виртуальные устройства заменяются заглушкой (RG_DEVICE_BACKEND=null), поэтому
+тесты не требуют /dev/uinput. Переменная задается до импорта настроек.
+"""
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("RG_DEVICE_BACKEND", "null")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
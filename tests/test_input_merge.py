@@ -0,0 +1,117 @@
+"""
+Слияние ввода нескольких источников (InputMerger)
+"""
+from src.core.input_merge import AxisMergePolicy, InputMerger
+
+
+def make_merger(policy: AxisMergePolicy = AxisMergePolicy.MAX_MAGNITUDE) -> InputMerger:
+    merger = InputMerger(button_count=4, axis_count=2, max_sources=2, axis_policy=policy)
+    merger.add_source("a")
+    merger.add_source("b")
+    return merger
+
+
+def test_buttons_merge_by_or():
+    merger = make_merger()
+    a, b = merger.slot_of("a"), merger.slot_of("b")
+
+    assert merger.update_button(a, 0, 1)
+    # Кнопка уже нажата: второй источник не меняет итог
+    assert not merger.update_button(b, 0, 1)
+    assert not merger.update_button(a, 0, 0)
+    assert merger.merged_buttons[0] == 1
+    assert merger.update_button(b, 0, 0)
+    assert merger.merged_buttons[0] == 0
+
+
+def test_repeated_value_is_not_a_change():
+    merger = make_merger()
+    a = merger.slot_of("a")
+
+    assert merger.update_axis(a, 0, 1000)
+    assert not merger.update_axis(a, 0, 1000)
+
+
+def test_axes_max_magnitude_wins():
+    merger = make_merger()
+    a, b = merger.slot_of("a"), merger.slot_of("b")
+
+    merger.update_axis(a, 0, 1000)
+    merger.update_axis(b, 0, -20000)
+    assert merger.merged_axes[0] == -20000
+    merger.update_axis(b, 0, 0)
+    assert merger.merged_axes[0] == 1000
+
+
+def test_axes_priority_prefers_first_non_neutral_source():
+    merger = make_merger(AxisMergePolicy.PRIORITY)
+    a, b = merger.slot_of("a"), merger.slot_of("b")
+
+    merger.update_axis(b, 0, -20000)
+    assert merger.merged_axes[0] == -20000
+    merger.update_axis(a, 0, 1000)
+    assert merger.merged_axes[0] == 1000
+
+
+def test_owner_overrides_other_sources():
+    merger = make_merger()
+    a, b = merger.slot_of("a"), merger.slot_of("b")
+
+    assert merger.set_button_owner(1, "b")
+    assert merger.set_axis_owner(0, "b")
+    merger.update_button(a, 1, 1)
+    merger.update_axis(a, 0, 30000)
+    assert merger.merged_buttons[1] == 0
+    assert merger.merged_axes[0] == 0
+
+    merger.update_axis(b, 0, 500)
+    assert merger.merged_axes[0] == 500
+
+    # Снятие владельца возвращает обычное слияние
+    assert merger.set_axis_owner(0, None)
+    assert merger.merged_axes[0] == 30000
+
+
+def test_owner_must_be_a_source():
+    merger = make_merger()
+
+    assert not merger.set_button_owner(0, "stranger")
+
+
+def test_remove_source_releases_slot_and_ownership():
+    merger = make_merger()
+    b = merger.slot_of("b")
+    merger.set_axis_owner(0, "b")
+    merger.update_axis(b, 0, 7000)
+    merger.update_button(b, 2, 1)
+
+    changed_buttons, changed_axes = merger.remove_source("b")
+    assert (changed_buttons, changed_axes) == ([2], [0])
+    assert merger.slot_of("b") is None
+    assert merger.sources == ["a"]
+
+    # Освободившийся слот достается новому источнику без чужого ввода и владения
+    slot = merger.add_source("c")
+    assert slot == b
+    merger.update_axis(merger.slot_of("a"), 0, 100)
+    assert merger.merged_axes[0] == 100
+
+
+def test_clear_source_keeps_slot_and_owner():
+    merger = make_merger()
+    b = merger.slot_of("b")
+    merger.set_axis_owner(0, "b")
+    merger.update_axis(b, 0, 7000)
+
+    assert merger.clear_source("b") == ([], [0])
+    assert merger.slot_of("b") == b
+    # Владелец в нейтрали, ввод остальных по-прежнему не учитывается
+    merger.update_axis(merger.slot_of("a"), 0, 100)
+    assert merger.merged_axes[0] == 0
+
+
+def test_no_free_slots():
+    merger = make_merger()
+
+    assert merger.add_source("c") is None
+    assert merger.add_source("a") == merger.slot_of("a")
@@ -0,0 +1,31 @@
+"""
+Учет живости клиентов (LivenessTracker)
+"""
+from src.core.liveness import LivenessTracker
+
+
+def test_idle_in_order_of_silence(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.core.liveness.time.monotonic", lambda: now[0])
+    tracker = LivenessTracker(idle_timeout=10)
+
+    for client_id in ("a", "b", "c"):
+        tracker.seen_frame(client_id)
+        now[0] += 1
+    tracker.seen_ping("a")
+    tracker.seen_ping("unknown")
+
+    assert tracker.idle(now=111.5) == ["b"]
+    assert tracker.idle(now=120) == ["b", "c", "a"]
+    assert tracker.last_seen("unknown") is None
+
+
+def test_forget_and_disabled_timeout():
+    tracker = LivenessTracker(idle_timeout=10)
+    tracker.seen_frame("a")
+    tracker.seen_frame("b")
+    tracker.forget("a")
+
+    assert tracker.idle(now=float("inf")) == ["b"]
+    tracker.idle_timeout = 0
+    assert tracker.idle(now=float("inf")) == []
@@ -0,0 +1,46 @@
+"""
+Разбор бинарных кадров датчиков движения
+"""
+import pytest
+
+from src.core.motion import (
+    MAX_SAMPLES_PER_FRAME, MOTION_FRAME_TYPE, MOTION_FRAME_VERSION, MOTION_HEADER, MOTION_SAMPLE,
+    decode_motion_frame
+)
+
+
+def make_frame(samples, frame_type: int = MOTION_FRAME_TYPE, version: int = MOTION_FRAME_VERSION,
+               count: int = None) -> bytes:
+    header = MOTION_HEADER.pack(frame_type, version, len(samples) if count is None else count)
+    return header + b"".join(MOTION_SAMPLE.pack(*sample) for sample in samples)
+
+
+def test_decode_round_trip():
+    samples = [(1.0, 0.5, -9.75, 0.25, 10.0, -20.0, 30.0), (2.0, 0.0, 0.0, 9.5, 0.0, 0.0, -1.5)]
+
+    batch = decode_motion_frame(make_frame(samples))
+
+    assert batch.count == 2
+    assert batch.sample(0) == samples[0]
+    assert batch.last() == samples[1]
+
+
+def test_decode_max_samples():
+    samples = [(float(i), 0, 0, 0, 0, 0, 0) for i in range(MAX_SAMPLES_PER_FRAME)]
+
+    assert decode_motion_frame(make_frame(samples)).count == MAX_SAMPLES_PER_FRAME
+
+
+@pytest.mark.parametrize("frame", [
+    b"",
+    MOTION_HEADER.pack(MOTION_FRAME_TYPE, MOTION_FRAME_VERSION, 1)[:3],
+    make_frame([(0,) * 7], frame_type=0x02),
+    make_frame([(0,) * 7], version=MOTION_FRAME_VERSION + 1),
+    make_frame([]),
+    make_frame([(0,) * 7] * (MAX_SAMPLES_PER_FRAME + 1)),
+    make_frame([(0,) * 7], count=2),
+    make_frame([(0,) * 7]) + b"\x00",
+], ids=["empty", "short_header", "type", "version", "no_samples", "too_many", "truncated", "trailing"])
+def test_decode_rejects_malformed_frames(frame):
+    with pytest.raises(ValueError):
+        decode_motion_frame(frame)
@@ -0,0 +1,204 @@
+"""
+Возобновляемые сессии: токены, парковка и проверки владения в API
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from src.api.server import FastAPIServer, parse_gamepad_id
+from src.core.client_manager import ClientManagerImpl
+from src.core.events import EventBus
+from src.core.gamepad_manager import GamepadManagerImpl
+from src.core.sessions import SessionStore
+from src.utils.types import ClientStatus, GamepadControl, GamepadEvent, GamepadEventType
+
+
+def test_token_checks():
+    sessions = SessionStore(grace=30)
+    token = sessions.issue("a")
+
+    assert sessions.verify("a", token)
+    assert not sessions.verify("a", None)
+    assert not sessions.verify("a", "")
+    assert not sessions.verify("a", token + "x")
+    assert not sessions.verify("b", token)
+
+
+def test_park_resume_and_expiry():
+    sessions = SessionStore(grace=30)
+    token = sessions.issue("a")
+
+    assert sessions.park("a")
+    assert not sessions.resume("a", "wrong")
+    assert sessions.is_parked("a")
+    assert sessions.resume("a", token)
+    assert not sessions.is_parked("a")
+
+    sessions.park("a")
+    assert sessions.expired() == []
+    assert sessions.expired(now=float("inf")) == ["a"]
+    assert not sessions.verify("a", token)
+
+
+def test_disabled_sessions_never_park():
+    sessions = SessionStore(grace=0)
+    sessions.issue("a")
+
+    assert not sessions.park("a")
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), (3, 3), ("2", 2)])
+def test_parse_gamepad_id(value, expected):
+    assert parse_gamepad_id(value) == expected
+
+
+@pytest.mark.parametrize("value", ["abc", "", True, [1], 1.5j])
+def test_parse_gamepad_id_rejects(value):
+    with pytest.raises(HTTPException) as error:
+        parse_gamepad_id(value)
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def server():
+    bus = EventBus()
+    client_manager = ClientManagerImpl(bus, max_clients=4)
+    server = FastAPIServer(bus, client_manager, GamepadManagerImpl(bus))
+    server.sessions.grace = 30
+    with TestClient(server.app) as client:
+        yield server, client
+
+
+def connect(client: TestClient, **info) -> dict:
+    response = client.post("/connect", json=info)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def eventually(predicate, timeout: float = 2.0) -> bool:
+    """Закрытие WebSocket обрабатывается сервером уже после выхода из websocket_connect"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_connect_rejects_bad_gamepad_id_without_leaking_client(server):
+    server, client = server
+
+    assert client.post("/connect", json={"gamepad_id": "abc"}).status_code == 400
+    assert server.client_manager.snapshot() == {}
+
+
+def test_resume_requires_token(server):
+    server, client = server
+    first = connect(client)
+
+    other = connect(client, client_id=first["client_id"], resume_token="wrong")
+    assert not other.get("resumed")
+    assert other["client_id"] != first["client_id"]
+
+    resumed = connect(client, client_id=first["client_id"], resume_token=first["resume_token"])
+    assert resumed["resumed"]
+    assert resumed["client_id"] == first["client_id"]
+    assert resumed["gamepad_id"] == first["gamepad_id"]
+
+
+def test_suspend_requires_token(server):
+    server, client = server
+    first = connect(client)
+
+    assert client.post("/suspend", json={"client_id": first["client_id"]}).status_code == 400
+    assert client.post("/suspend", json={"client_id": first["client_id"], "resume_token": "wrong"}).status_code == 404
+    assert not server.sessions.is_parked(first["client_id"])
+    response = client.post("/suspend", json={"client_id": first["client_id"], "resume_token": first["resume_token"]})
+    assert response.status_code == 200
+    assert server.sessions.is_parked(first["client_id"])
+
+
+def test_parked_client_input_is_rejected_until_resume(server):
+    server, client = server
+    first = connect(client)
+    client.post("/suspend", json={"client_id": first["client_id"], "resume_token": first["resume_token"]})
+
+    heartbeat = {"type": "heartbeat", "client_id": first["client_id"]}
+    assert client.post("/gamepad_data", json=heartbeat).status_code == 409
+    connect(client, client_id=first["client_id"], resume_token=first["resume_token"])
+    assert client.post("/gamepad_data", json=heartbeat).status_code == 200
+
+
+def test_websocket_close_parks_only_with_token(server):
+    server, client = server
+    first = connect(client)
+    client_id = first["client_id"]
+
+    for query in ("", "?resume_token=wrong"):
+        with client.websocket_connect(f"/ws/{client_id}{query}") as websocket:
+            websocket.send_json({"type": "ping"})
+            assert websocket.receive_json()["type"] == "pong"
+        assert eventually(lambda: client_id not in server.connection_manager.active_connections)
+        assert not server.sessions.is_parked(client_id)
+
+    with client.websocket_connect(f"/ws/{client_id}?resume_token={first['resume_token']}") as websocket:
+        websocket.send_json({"type": "ping"})
+        websocket.receive_json()
+    assert eventually(lambda: server.sessions.is_parked(client_id))
+    assert server.client_manager.snapshot()[client_id].status == ClientStatus.PARKED
+
+
+def test_old_socket_close_does_not_park_resumed_session(server):
+    server, client = server
+    first = connect(client)
+    client_id, token = first["client_id"], first["resume_token"]
+
+    with client.websocket_connect(f"/ws/{client_id}?resume_token={token}") as websocket:
+        websocket.send_json({"type": "ping"})
+        websocket.receive_json()
+        client.post("/suspend", json={"client_id": client_id, "resume_token": token})
+        assert connect(client, client_id=client_id, resume_token=token)["resumed"]
+    # Старый сокет отвязан при возобновлении, его закрытие ничего не меняет
+    assert eventually(lambda: server.connection_manager.active_connections == {})
+    time.sleep(0.05)
+    assert not server.sessions.is_parked(client_id)
+
+
+def test_gamepad_owner_requires_attached_requester(server):
+    server, client = server
+    first = connect(client)
+    second = connect(client, gamepad_id=first["gamepad_id"])
+    outsider = connect(client)
+    request = {"gamepad_id": first["gamepad_id"], "control": "BtnA", "client_id": second["client_id"]}
+
+    assert client.post("/gamepad_owner", json={
+        **request, "requester_id": first["client_id"], "resume_token": "wrong"
+    }).status_code == 403
+    assert client.post("/gamepad_owner", json={
+        **request, "requester_id": outsider["client_id"], "resume_token": outsider["resume_token"]
+    }).status_code == 403
+    assert client.post("/gamepad_owner", json={
+        **request, "client_id": outsider["client_id"],
+        "requester_id": first["client_id"], "resume_token": first["resume_token"]
+    }).status_code == 403
+    assert client.post("/gamepad_owner", json={
+        **request, "requester_id": first["client_id"], "resume_token": first["resume_token"]
+    }).status_code == 200
+
+
+def test_input_from_non_source_is_dropped():
+    async def run():
+        manager = GamepadManagerImpl(EventBus())
+        gamepad_id = await manager.create_gamepad("owner")
+        for client_id, value in (("owner", 0.5), ("stranger", -1.0)):
+            await manager.send_event(gamepad_id, GamepadEvent(
+                client_id=client_id, event_type=GamepadEventType.AXIS_MOVE,
+                axis_code=GamepadControl.AXIS_LX, value=value
+            ))
+        merger = manager._mergers[gamepad_id]
+        return merger.merged_axes[manager._axis_index[GamepadControl.AXIS_LX]]
+
+    assert asyncio.run(run()) == int(0.5 * 32767)